@@ -1,20 +1,37 @@
 
-import re
-from src.utils import fetch_coinbase, fetch_coingecko, get_recommended_token_allocations, get_near_account_balance
-
-USD_PORTFOLIO_GOAL_REGEX = re.compile(r"portfolio:\s*(\d+)")
-USD_ALLOWANCE_GOAL_REGEX = re.compile(r"allowance:\s*(\d+)")
+from loguru import logger
+
+from src.amounts import Amount
+from src.assets import ASSETS
+from src.balances import NATIVE_NEAR, get_portfolio_balances, symbol_balances
+from src.completion import stream_completion
+from src.conversation import CONVERSATIONS
+from src.sessions import ANONYMOUS, SESSIONS, Session
+from src.telemetry import instrument
+from src.utils import fetch_prices, get_recommended_token_allocations
+
+PRICED_TOKENS = ["near", "btc", "eth", "sol"]
+# the reply to tools that need the user's balances before the conversation names the account
+ACCOUNT_PROMPT = "Please tell me your NEAR account first, in the format near: <account_id>"
+
+# deterministic commands -> the Agent method that answers them, without a model call
+COMMANDS = {
+    "recommend swaps": "recommend_token_allocations_to_swap_for_stablecoins",
+    "suggest tokens to swap": "recommend_token_allocations_to_swap_for_stablecoins",
+    "show allowance goal": "get_allowance_goal",
+    "show growth goal": "get_growth_goal",
+    "fetch prices": "fetch_token_prices",
+}
 
 class Agent:
 
     def __init__(self, env):
         self.env = env
-        self.growth_goal = None
-        self.allowance_goal = None
-        self.prices = None
-        self.recommended_tokens = None
-        self.near_account_id = None
-        self.near_account_balance = None
+        # the runtime builds a new Agent every turn; the thread's parsed history outlives it
+        self.conversation = CONVERSATIONS.get(getattr(env, "_thread_id", None), COMMANDS)
+        # goals, prices, balances and recommendations live in the user's
+        # session, shared with every other Agent serving the same account
+        self._session = Session(ANONYMOUS)
         tool_registry = self.env.get_tool_registry()
         tool_registry.register_tool(self.recommend_token_allocations_to_swap_for_stablecoins)
         tool_registry.register_tool(self.get_allowance_goal)
@@ -22,114 +39,138 @@ class Agent:
 
 
     def find_growth_goal(self, chat_history):
-        for message in reversed(chat_history):
-            match = USD_PORTFOLIO_GOAL_REGEX.match(message['content'])
-            if message['role'] == 'user' and match:
-                return match.group(1)
-        return ''
+        return self.conversation.update(chat_history).growth_goal or ''
 
     def find_allowance_goal(self, chat_history):
-        for message in reversed(chat_history):
-            match = USD_ALLOWANCE_GOAL_REGEX.match(message['content'])
-            if message['role'] == 'user' and match:
-                return match.group(1)
-        return ''
+        return self.conversation.update(chat_history).allowance_goal or ''
 
     def get_last_search_term(self, chat_history):
-        for message in reversed(chat_history):
-           if message['role'] == 'user':
-               return message['content']
-        return ''
-
+        return self.conversation.update(chat_history).last_user_message or ''
+
+    @property
+    def session(self) -> Session:
+        """
+        The user's session, switched to the account's stored one once the
+        conversation names it. Reads the conversation as last updated, without
+        listing the messages again.
+        """
+        if self._session.account_id == ANONYMOUS and self.conversation.near_account_id:
+            self._session = SESSIONS.adopt(self._session, self.conversation.near_account_id)
+        return self._session
+
+    @property
+    def near_account_id(self):
+        return self.session.account_id or None
+
+    def _session_balances(self, session: Session):
+        """The account's balances, fetched again once the session's copy expires."""
+        balances = session.fresh_balances()
+        if balances is None and session.account_id:
+            balances = get_portfolio_balances(session.account_id)
+            # a balance that failed to load is None; keep those out of the session so the next turn retries
+            if None not in balances.values():
+                session.set_balances(balances)
+        return balances
+
+    def _session_prices(self, session: Session, symbols):
+        """Prices for PRICED_TOKENS and `symbols`, fetched again once the session's copy expires or lacks one."""
+        symbols = list(dict.fromkeys(PRICED_TOKENS + [symbol.lower() for symbol in symbols]))
+        prices = session.fresh_prices(symbols=symbols)
+        if prices is None:
+            prices = fetch_prices(symbols)
+            session.set_prices(prices)
+        return prices
+
+    @instrument("agent_turn")
     def run(self):
+        # pick up edits to src/assets.json without restarting the agent
+        ASSETS.reload_if_changed()
+
         # A system message guides an agent to solve specific tasks.
         prompt = {"role": "system", "content": "You are an assistant that helps people set goals for growth in the USD value of their crypto assets such that when that percentage in growth has been reached or surpassed, you look at their tokens and determine the tokens and quantities of each to swap for USDT stablecoins or USDC stablecoins"}
 
-        # Use the model set in the metadata to generate a response
-        result = self.env.completion([prompt] + self.env.list_messages())
-
         chat_history = self.env.list_messages()
-        last_user_query = self.get_last_search_term(chat_history)
-        if last_user_query == "recommend swaps" or last_user_query == "suggest tokens to swap":
-          result = self.recommend_token_allocations_to_swap_for_stablecoins()
-        elif last_user_query == "show allowance goal":
-          result = self.get_allowance_goal()
-        elif last_user_query == "show growth goal":
-          result = self.get_growth_goal()
-        elif last_user_query == "fetch prices":
-          result = self.fetch_token_prices()
-
-        self.env.add_reply(result)
+        command = self.conversation.update(chat_history).command
+        if command:
+            self.env.add_reply(getattr(self, COMMANDS[command])())
+        else:
+            # Use the model set in the metadata to generate a response, streamed back as it is generated
+            stream_completion(self.env, [prompt] + chat_history)
 
         # Give the prompt back to the user
         self.env.request_user_input()
 
+    @instrument("agent_tool", tool="find_near_account_id")
     def find_near_account_id(self):
         """Save the NEAR account ID of the user from chat history format 'near: <account_id>'"""
-        if not self.near_account_id:
-            for message in reversed(self.env.list_messages()):
-                if message['role'] == 'user' and message['content'].startswith("near:"):
-                    self.near_account_id = message['content'].split("near:")[1].strip()
-                    self.env.add_reply(f"Saving your NEAR account ID: {self.near_account_id}")
+        self.conversation.update(self.env.list_messages())
+        if self._session.account_id == ANONYMOUS and self.near_account_id:
+            self.env.add_reply(f"Saving your NEAR account ID: {self.near_account_id}")
         return self.near_account_id
 
+    @instrument("agent_tool", tool="fetch_token_prices")
     def fetch_token_prices(self):
         """Fetch the current prices of the tokens"""
-        print("Fetching the current prices of the tokens in your wallet...")
+        logger.info("Fetching the current prices of the tokens in your wallet...")
         self.find_near_account_id()
-        balance = get_near_account_balance(self.near_account_id)
-        if balance:
-            if len(balance) > 23:
-                length = len(balance)
-                chars_remaining = length - 23
-                # TODO improve the yocoto to Near conversion
-                self.near_account_balance = float(str(balance[0:chars_remaining-1]) + '.' + ''.join(balance[chars_remaining-1:length]))
-
-        print(f"Found NEAR balance: {self.near_account_balance}")
-        near_price = fetch_coinbase("near")
-        near_price = fetch_coingecko("near") if isinstance(near_price, bool) else near_price
-
-        btc_price = fetch_coinbase("btc")
-        btc_price = fetch_coingecko("btc") if isinstance(btc_price, bool) else btc_price
-
-        eth_price = fetch_coinbase("eth")
-        eth_price = fetch_coingecko("eth") if isinstance(eth_price, bool) else eth_price
-
-        sol_price = fetch_coinbase("sol")
-        sol_price = fetch_coingecko("sol") if isinstance(sol_price, bool) else sol_price
-        self.prices = ["NEAR:", near_price, "BTC:", btc_price, "ETH:", eth_price, "SOL:", sol_price]
+        session = self.session
+        if session.account_id == ANONYMOUS:
+            return ACCOUNT_PROMPT
+        balances = self._session_balances(session)
+        near_account_balance = (Amount.from_units(balances[NATIVE_NEAR], "NEAR")
+                                if balances[NATIVE_NEAR] is not None else "unavailable")
+
+        logger.info("Found NEAR balance: {balance}", balance=str(near_account_balance))
+        prices = self._session_prices(session, symbol_balances(balances))
+        SESSIONS.save(session)
+        price_list = []
+        for token in PRICED_TOKENS:
+            price_list += [f"{token.upper()}:", prices.get(token, False)]
 
         self.env.add_reply("Fetching the current prices of the tokens in your wallet...")
-        return str(self.prices +  [f" Near account balance: {self.near_account_balance}"])
+        return str(price_list + [f" Near account balance: {near_account_balance}"])
 
 
+    @instrument("agent_tool", tool="get_growth_goal")
     def get_growth_goal(self):
         """Given user prompts referring to portfolio growth, token growth, find their USD growth goal"""
-        chat_history = self.env.list_messages()
-        growth_goal = self.find_growth_goal(chat_history)
-        if not self.growth_goal and growth_goal:
-            self.growth_goal = growth_goal
-        return self.growth_goal
+        growth_goal = self.find_growth_goal(self.env.list_messages())
+        session = self.session
+        session.set_goals(growth_goal=growth_goal)
+        SESSIONS.save(session)
+        return session.growth_goal
 
+    @instrument("agent_tool", tool="get_allowance_goal")
     def get_allowance_goal(self):
         """Given user prompts referring to goals, goal, usd, allowance, and target, find the allowance goal"""
-        chat_history = self.env.list_messages()
-
-        allowance_goal = self.find_allowance_goal(chat_history)
-        if not self.allowance_goal and allowance_goal:
-            self.allowance_goal = allowance_goal
-        return self.allowance_goal
+        allowance_goal = self.find_allowance_goal(self.env.list_messages())
+        session = self.session
+        # a new allowance goal drops the session's recommendation
+        session.set_goals(allowance_goal=allowance_goal)
+        SESSIONS.save(session)
+        return session.allowance_goal
 
 
+    @instrument("agent_tool", tool="recommend_token_allocations_to_swap_for_stablecoins")
     def recommend_token_allocations_to_swap_for_stablecoins(self):
         """Given a input of a target USD amount, recommend the tokens and quantities of each to swap for USDT stablecoins or USDC stablecoins"""
-        if not self.recommended_tokens:
+        self.get_allowance_goal()
+        session = self.session
+        if session.account_id == ANONYMOUS:
+            return ACCOUNT_PROMPT
+        # refreshing expired balances and prices drops the recommendation if either changed
+        balances = self._session_balances(session)
+        token_balances = {symbol: float(amount) for symbol, amount in symbol_balances(balances).items()
+                          if amount is not None}
+        prices = self._session_prices(session, token_balances)
+        if not session.has_recommendation():
             self.env.add_reply(f"Considering your options with a preference for holding BTC...")
-            self.get_allowance_goal()
-            self.recommended_tokens = get_recommended_token_allocations(int(self.allowance_goal))
+            session.set_recommendation(
+                get_recommended_token_allocations(int(session.allowance_goal), token_balances, prices))
+        SESSIONS.save(session)
 
         self.env.add_reply(f"We can sell this quantity of your tokens to realize your target USD in stablecoin...")
-        return str(self.recommended_tokens) if self.recommended_tokens else ""
+        return str(session.recommended_tokens) if session.recommended_tokens else ""
 
 if globals().get('env', None):
     agent = Agent(globals().get('env', {}))
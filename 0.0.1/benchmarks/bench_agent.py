@@ -0,0 +1,154 @@
+from agent import Agent
+
+
+class BenchEnv:
+    """Minimal stand-in for the near.ai environment an Agent runs in."""
+
+    def __init__(self, messages):
+        self.messages = list(messages)
+        self.replies = []
+        self.completion_calls = 0
+
+    def get_tool_registry(self):
+        return self
+
+    def register_tool(self, tool):
+        pass
+
+    def list_messages(self):
+        return self.messages
+
+    def completion(self, messages, **kwargs):
+        self.completion_calls += 1
+        return "ok"
+
+    def add_reply(self, message):
+        self.replies.append(message)
+
+    def request_user_input(self):
+        pass
+
+
+class StreamingBenchEnv(BenchEnv):
+    """An environment whose completions stream OpenAI-style chunks when asked to, as near.ai's do."""
+
+    TEXT = "First paragraph of the answer.\n\nSecond paragraph of the answer."
+
+    def completions(self, messages, model="", stream=False, **kwargs):
+        self.completion_calls += 1
+        if not stream:
+            return {"choices": [{"message": {"role": "assistant", "content": self.TEXT}}]}
+        return ({"choices": [{"delta": {"content": word + " "}}]} for word in self.TEXT.split(" "))
+
+
+HISTORY = [
+    {"role": "user", "content": "near: bench.near"},
+    {"role": "user", "content": "portfolio: 20000"},
+    {"role": "user", "content": "allowance: 500"},
+]
+
+
+def run_turn(command):
+    env = BenchEnv(HISTORY + [{"role": "user", "content": command}])
+    Agent(env).run()
+    return env.replies
+
+
+def test_agent_turn_fetch_prices(latency):
+    replies = latency(run_turn, "fetch prices")
+    assert "NEAR:" in replies[-1]
+
+
+def test_agent_turn_show_allowance_goal(latency):
+    assert latency(run_turn, "show allowance goal")[-1] == "500"
+
+
+def test_agent_command_skips_completion():
+    env = BenchEnv(HISTORY + [{"role": "user", "content": "show growth goal"}])
+    Agent(env).run()
+    assert env.completion_calls == 0 and env.replies == ["20000"]
+
+
+def test_agent_turn_free_form_streamed(latency):
+    def turn():
+        env = StreamingBenchEnv(HISTORY + [{"role": "user", "content": "what can you do?"}])
+        Agent(env).run()
+        return env.replies
+
+    assert latency(turn) == ["First paragraph of the answer.", "Second paragraph of the answer."]
+
+
+def test_agent_turn_streamed_calls_model_once():
+    env = StreamingBenchEnv(HISTORY + [{"role": "user", "content": "what can you do?"}])
+    Agent(env).run()
+    assert env.completion_calls == 1
+
+
+def test_agent_turn_free_form(latency):
+    assert latency(run_turn, "what can you do?")[-1] == "ok"
+
+
+def test_conversation_state_long_history(latency):
+    # one agent across many turns: each turn should only parse the newest message
+    env = BenchEnv(HISTORY + [{"role": "user", "content": f"message {i}"} for i in range(5000)])
+    agent = Agent(env)
+
+    def turn():
+        env.messages.append({"role": "user", "content": "show growth goal"})
+        return agent.conversation.update(env.list_messages()).command
+
+    assert latency(turn) == "show growth goal"
+
+
+def test_agent_per_turn_shares_thread_history(latency):
+    # the runtime builds a new Agent every turn; only the newest message should be parsed
+    env = BenchEnv(HISTORY + [{"role": "user", "content": f"message {i}"} for i in range(5000)])
+    env._thread_id = "bench-thread"
+    Agent(env).conversation.update(env.list_messages())
+
+    def turn():
+        env.messages.append({"role": "user", "content": "show growth goal"})
+        agent = Agent(env)
+        assert agent.conversation._scanned == len(env.messages) - 1
+        agent.run()
+        return env.replies[-1]
+
+    assert latency(turn) == "20000"
+
+
+def test_agent_turn_recommend_swaps(latency):
+    replies = latency(run_turn, "recommend swaps")
+    assert replies[-1].startswith("{")
+
+
+def test_agent_recommend_swaps_asks_for_account():
+    env = BenchEnv([{"role": "user", "content": "allowance: 500"}, {"role": "user", "content": "recommend swaps"}])
+    Agent(env).run()
+    assert env.replies[-1].startswith("Please tell me your NEAR account")
+
+
+def test_agent_fetch_prices_asks_for_account():
+    env = BenchEnv([{"role": "user", "content": "fetch prices"}])
+    Agent(env).run()
+    assert env.replies[-1].startswith("Please tell me your NEAR account")
+
+
+def test_agent_serves_the_watcher_recommendation(monkeypatch):
+    import asyncio
+
+    import agent as agent_module
+    from src import utils, watcher
+
+    portfolio = watcher.WatchedPortfolio("watched", "watched.near", 1000.0, 500.0)
+    portfolio.holdings = {"NEAR": 200.0}
+    monkeypatch.setattr(utils, "get_recommended_token_allocations", lambda *args, **kwargs: {"NEAR": 100.0})
+    asyncio.run(watcher.recommend_swaps_trigger(portfolio))
+
+    def recompute(*args, **kwargs):
+        raise AssertionError("the watcher's recommendation must be served as stored")
+
+    monkeypatch.setattr(agent_module, "get_recommended_token_allocations", recompute)
+    env = BenchEnv([{"role": "user", "content": "near: watched.near"},
+                    {"role": "user", "content": "recommend swaps"}])
+    Agent(env).run()
+    assert env.replies[-1] == str({"NEAR": 100.0})
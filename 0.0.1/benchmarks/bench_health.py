@@ -0,0 +1,39 @@
+import time
+
+import pytest
+
+from src.health import CircuitOpenError, EndpointHealth, ProviderHealth
+
+SLOW_PRIMARY = 0.2
+HEDGE_DELAY = 0.01
+
+
+def test_hedged_call_with_slow_primary(latency):
+    health = ProviderHealth(default_timeout=1.0)
+
+    def primary():
+        time.sleep(SLOW_PRIMARY)
+        return "primary"
+
+    def secondary():
+        time.sleep(0.002)
+        return "secondary"
+
+    # the caller stops at the first answer, so the tail is the hedge delay plus
+    # the secondary's latency rather than the slow primary's
+    result = latency(lambda: next(health.hedge(primary, secondary, HEDGE_DELAY)))
+    assert result == "secondary"
+    if latency.stats is not None:
+        assert max(latency.stats.stats.data) < SLOW_PRIMARY
+
+
+def test_open_circuit_fails_fast(latency):
+    endpoint = EndpointHealth("http://down.invalid", default_timeout=10.0, reset_timeout=60.0)
+    for _ in range(endpoint.failure_threshold):
+        endpoint.record_failure()
+
+    def rejected():
+        with pytest.raises(CircuitOpenError):
+            endpoint.check()
+
+    latency(rejected)
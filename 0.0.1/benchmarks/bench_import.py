@@ -0,0 +1,36 @@
+import json
+import os
+import subprocess
+import sys
+
+# cold import of the agent entry point, excluding interpreter startup
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", 750))
+# signing, RPC and solver dependencies that a read-only turn must not load
+LAZY_MODULES = ("py_near", "near_api", "numpy", "dotenv")
+IMPORT_SCRIPT = f"""
+import json, sys, time
+start = time.perf_counter()
+import agent
+elapsed = time.perf_counter() - start
+print(json.dumps({{"ms": elapsed * 1000, "loaded": [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))
+"""
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def cold_import() -> dict:
+    # without signing keys: importing must not need them
+    env = {name: value for name, value in os.environ.items()
+           if name not in ("ACCOUNT_ID", "FA_PRIV_KEY", "FA_PUB_KEY")}
+    result = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_agent_cold_import(latency):
+    result = latency(cold_import)
+    assert result["loaded"] == []
+
+
+def test_agent_cold_import_budget():
+    best = min(cold_import()["ms"] for _ in range(3))
+    assert best <= IMPORT_BUDGET_MS, f"importing agent took {best:.0f} ms, budget {IMPORT_BUDGET_MS:.0f} ms"
@@ -0,0 +1,60 @@
+import base64
+import json
+import secrets
+from datetime import datetime, timedelta, timezone
+
+from src.amounts import REFERRAL_FEE_BPS, Amount
+from src.intents import get_intent_template
+
+INTENTS = 2000
+SIGNER_ID = "bench.near"
+TOKEN_IN = "nep141:wrap.near"
+TOKEN_OUT = "nep141:17208628f84f5d6ad33f0da3bbbeb27ffcb398eac501a31bd6ad2011e36133a1"
+QUOTES = [{"token_in": TOKEN_IN, "token_out": TOKEN_OUT,
+           "amount_in": str((i + 1) * 10 ** 23), "amount_out": str((i + 1) * 497_123)}
+          for i in range(INTENTS)]
+
+
+def build_intent_from_scratch(best_quote: dict) -> bytes:
+    """The swap payload as it used to be built for every intent."""
+    deadline = (datetime.now(timezone.utc) + timedelta(minutes=2)).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+    nonce = base64.b64encode(secrets.randbits(256).to_bytes(32, byteorder='big')).decode('utf-8')
+    fee, amount_out_less_fee = Amount.from_units(
+        best_quote["amount_out"], best_quote["token_out"]).split_fee(REFERRAL_FEE_BPS)
+    payload = {"signer_id": SIGNER_ID, "nonce": nonce, "verifying_contract": "intents.near", "deadline": deadline,
+               "intents": [{"intent": "token_diff",
+                            "diff": {best_quote["token_in"]: "-" + str(best_quote["amount_in"]),
+                                     best_quote["token_out"]: str(amount_out_less_fee.units)},
+                            "referral": "benevio-labs.near"},
+                           {"intent": "transfer", "receiver_id": "benevio-labs.near",
+                            "tokens": {best_quote["token_out"]: str(fee.units)}, "memo": "referral_fee"}]}
+    return json.dumps(payload).encode("utf-8")
+
+
+def build_intent_from_template(best_quote: dict) -> bytes:
+    template = get_intent_template(SIGNER_ID, best_quote["token_in"], best_quote["token_out"])
+    return template.render_quote(best_quote).encode("utf-8")
+
+
+def test_template_matches_json_dumps():
+    for best_quote in QUOTES[:50]:
+        built = build_intent_from_template(best_quote)
+        payload = json.loads(built)
+        assert json.dumps(payload).encode("utf-8") == built
+        assert payload["intents"][1]["tokens"][TOKEN_OUT] == str(int(best_quote["amount_out"]) // 100)
+
+
+def test_build_intents_from_scratch(latency):
+    latency(lambda: [build_intent_from_scratch(best_quote) for best_quote in QUOTES])
+
+
+def test_build_intents_from_template(latency):
+    intents = latency(lambda: [build_intent_from_template(best_quote) for best_quote in QUOTES])
+    # every intent gets its own nonce from the pool
+    assert len({json.loads(intent)["nonce"] for intent in intents}) == INTENTS
+
+
+def test_build_and_sign_intents(latency):
+    from src.utils import build_swap_intent, sign_quotes
+
+    latency(lambda: sign_quotes([build_swap_intent(best_quote) for best_quote in QUOTES]))
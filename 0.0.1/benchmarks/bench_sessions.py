@@ -0,0 +1,61 @@
+import time
+
+from src.sessions import Session, SessionStore
+
+ACCOUNTS = 1000
+PRICES = {"near": 5.0, "btc": 95000.0, "eth": 3500.0, "sol": 200.0}
+BALANCES = {"NEAR": 330 * 10 ** 24, "nep141:wrap.near": 10 ** 24}
+
+
+def fill(store: SessionStore):
+    for i in range(ACCOUNTS):
+        session = store.get(f"user{i}.near")
+        session.set_goals("20000", "500")
+        session.set_prices(PRICES)
+        session.set_balances(BALANCES)
+        session.set_recommendation({"SOL": 2.5})
+        store.save(session)
+
+
+def test_session_store_save_many_accounts(latency, tmp_path):
+    store = SessionStore(str(tmp_path / "sessions.sqlite3"))
+    latency(fill, store)
+
+
+def test_session_store_load_from_sqlite(latency, tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    fill(SessionStore(path))
+
+    def load():
+        # a fresh store, as in a restarted agent process: every session comes from SQLite
+        store = SessionStore(path)
+        return [store.get(f"user{i}.near") for i in range(ACCOUNTS)]
+
+    sessions = latency(load)
+    assert sessions[-1].allowance_goal == "500" and sessions[-1].recommended_tokens == {"SOL": 2.5}
+    assert sessions[-1].fresh_prices(ttl=60) == PRICES
+
+
+def test_session_recommendation_invalidation():
+    session = Session("user.near")
+    session.set_goals(allowance_goal="500")
+    session.set_prices(PRICES)
+    session.set_balances(BALANCES)
+    session.set_recommendation({"SOL": 2.5})
+
+    session.set_prices({**PRICES, "near": 5.01})
+    assert session.has_recommendation(), "moves within the tolerance keep the recommendation"
+    session.set_prices({**PRICES, "near": 5.5})
+    assert not session.has_recommendation()
+
+    session.set_recommendation({"SOL": 2.5})
+    session.set_balances({**BALANCES, "NEAR": 1})
+    assert not session.has_recommendation()
+
+    session.set_recommendation({"SOL": 2.5})
+    session.set_goals(allowance_goal="600")
+    assert not session.has_recommendation()
+
+    session.set_recommendation({"SOL": 2.5})
+    session.recommended_at = time.time() - 3600
+    assert not session.has_recommendation()
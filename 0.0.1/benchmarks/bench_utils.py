@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from src import utils
+from src.balances import NATIVE_NEAR, BalanceService
+from src.batcher import SwapBatcher
+
+NEAR = "nep141:wrap.near"
+PORTFOLIO = {
+    "nep141:wrap.near": 5 * utils.ONE_NEAR,
+    "nep141:eth.omft.near": 10 ** 18,
+    "nep141:sol.omft.near": 10 ** 9,
+}
+PRICED_TOKENS = ["near", "btc", "eth", "sol"]
+
+
+@pytest.fixture
+def event_loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def test_get_quotes(latency):
+    quotes, best_quote = latency(utils.get_quotes, [NEAR], [utils.ONE_NEAR], utils.get_usdc_token_out_type(NEAR))
+    assert best_quote["quote_hash"]
+
+
+def test_get_usdc_quotes_fan_out(latency):
+    results = latency(utils.get_usdc_quotes, PORTFOLIO)
+    assert len(results) == len(PORTFOLIO)
+
+
+def test_get_stablecoin_quotes_fan_out(latency, event_loop):
+    results = latency(lambda: event_loop.run_until_complete(utils.get_stablecoin_quotes_async(PORTFOLIO)))
+    assert set(results) == {"USDC", "USDT"}
+
+
+def test_get_usdc_route(latency, event_loop):
+    # a fresh curve each round, so every round quotes all tiers
+    def route():
+        utils.ROUTER.clear()
+        return event_loop.run_until_complete(utils.get_usdc_route_async(NEAR, 5 * utils.ONE_NEAR))
+
+    result = latency(route)
+    assert result.amount_out >= result.single_quote_amount_out > 0
+
+
+def test_fetch_coinbase(latency):
+    assert latency(utils.fetch_coinbase, "near") > 0
+
+
+def test_fetch_prices(latency):
+    prices = latency(utils.fetch_prices, PRICED_TOKENS)
+    assert set(prices) == set(PRICED_TOKENS)
+
+
+def test_get_near_account_balance(latency):
+    assert int(latency(utils.get_near_account_balance, "bench.near")) > 0
+
+
+def test_fetch_balances_many_accounts(latency):
+    accounts = [f"user{i}.near" for i in range(20)]
+    tokens = [NATIVE_NEAR] + list(PORTFOLIO)
+    # a fresh service each round, so every round pays for every query
+    balances = latency(lambda: BalanceService().fetch_sync(accounts, tokens))
+    assert len(balances) == len(accounts)
+
+
+def test_sign_quote(latency):
+    commitment = latency(utils.sign_quote, {"signer_id": "bench.near", "nonce": "", "intents": []})
+    assert commitment["signature"].startswith("ed25519:")
+
+
+def test_sign_quotes_batch(latency):
+    quotes = [{"signer_id": "bench.near", "nonce": str(i), "intents": []} for i in range(100)]
+    commitments = latency(utils.sign_quotes, quotes)
+    assert len(commitments) == len(quotes)
+
+
+def test_publish_intent(latency):
+    commitment = utils.sign_quote({"signer_id": "bench.near", "nonce": "", "intents": []})
+    result = latency(utils.publish_intent, utils.PublishIntent(signed_data=commitment, quote_hashes=["hash"]))
+    assert result["result"]["status"] == "OK"
+
+
+def test_deposit_near(latency, event_loop):
+    result = latency(lambda: event_loop.run_until_complete(utils.deposit_near(utils.ONE_NEAR)))
+    assert result.status == {"SuccessValue": ""}
+
+
+def test_batched_publish_and_deposit(latency, event_loop):
+    commitments = utils.sign_quotes([{"signer_id": "bench.near", "nonce": str(i), "intents": []} for i in range(20)])
+    intents = [utils.PublishIntent(signed_data=commitment, quote_hashes=[f"hash{i}"])
+               for i, commitment in enumerate(commitments)]
+
+    async def submit_all():
+        batcher = SwapBatcher(window=0.01, on_flush=None)
+        results = await asyncio.gather(*(batcher.submit(intent, utils.ONE_NEAR) for intent in intents))
+        return batcher.reports, results
+
+    reports, results = latency(lambda: event_loop.run_until_complete(submit_all()))
+    assert [(report.items, report.transactions) for report in reports] == [(len(intents), 1)]
+    assert len(results[0]["result"]["intent_hashes"]) == len(intents)
@@ -0,0 +1,37 @@
+import asyncio
+import itertools
+
+import pytest
+
+from src.watcher import GoalWatcher
+
+PORTFOLIOS = 5000
+HOLDINGS = {"NEAR": 100.0, "ETH": 1.0, "SOL": 10.0}
+
+
+@pytest.fixture
+def event_loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def test_watcher_tick_many_portfolios(latency, event_loop):
+    triggered = []
+    prices = itertools.cycle([{"NEAR": 5.0, "ETH": 3500.0, "SOL": 200.0},
+                              {"NEAR": 5.5, "ETH": 3500.0, "SOL": 200.0}])
+
+    async def price_source(symbols):
+        return next(prices)
+
+    async def on_trigger(portfolio):
+        triggered.append(portfolio.portfolio_id)
+
+    watcher = GoalWatcher(on_trigger=on_trigger, price_source=price_source, balance_source=None)
+    for i in range(PORTFOLIOS):
+        watcher.watch(f"p{i}", f"user{i}.near", 6000.0 + i % 100, 500.0, HOLDINGS)
+
+    # only NEAR moves between ticks, so every tick revalues through one symbol's holders
+    latency(lambda: event_loop.run_until_complete(watcher.tick()))
+    assert watcher.tick_latency()["count"] > 0
+    assert triggered
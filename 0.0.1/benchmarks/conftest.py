@@ -0,0 +1,77 @@
+import os
+import statistics
+
+import base58
+import pytest
+from nacl.signing import SigningKey
+
+from src.stub_server import StubServer
+
+# The stub must be listening, and the environment pointed at it, before any
+# benchmark module imports src.utils (which reads both at import time).
+STUB = StubServer(latency=float(os.getenv("STUB_LATENCY", 0.005)),
+                  jitter=float(os.getenv("STUB_JITTER", 0.002)),
+                  error_rate=float(os.getenv("STUB_ERROR_RATE", 0.0)),
+                  quote_count=int(os.getenv("STUB_QUOTE_COUNT", 3)),
+                  seed=0)
+LATENCY_REPORT = []
+
+
+def _bench_key_pair():
+    signing_key = SigningKey.generate()
+    secret = bytes(signing_key) + bytes(signing_key.verify_key)
+    return ("ed25519:" + base58.b58encode(secret).decode("utf-8"),
+            "ed25519:" + base58.b58encode(bytes(signing_key.verify_key)).decode("utf-8"))
+
+
+def pytest_configure(config):
+    STUB.start()
+    os.environ.update(STUB.env())
+    priv_key, pub_key = _bench_key_pair()
+    os.environ["ACCOUNT_ID"] = "bench.near"
+    os.environ["FA_PRIV_KEY"] = priv_key
+    os.environ["FA_PUB_KEY"] = pub_key
+    # measure the network paths themselves: no recording, no price cache hits
+    os.environ["QUOTE_LOG_PATH"] = ""
+    os.environ["PRICE_CACHE_TTL"] = "0"
+    os.environ["PRICE_CACHE_MAX_STALE"] = "0"
+    # agent sessions stay in memory, and re-fetch prices and balances every turn
+    os.environ["SESSION_STORE_PATH"] = ""
+    os.environ["SESSION_PRICES_TTL"] = "0"
+    os.environ["SESSION_BALANCES_TTL"] = "0"
+
+
+def pytest_unconfigure(config):
+    STUB.stop()
+
+
+@pytest.fixture
+def stub_server():
+    return STUB
+
+
+@pytest.fixture
+def latency(benchmark, request):
+    """Adds p50/p99 latency and throughput to a benchmark's extra_info and the end-of-run report."""
+    yield benchmark
+    if benchmark.stats is None:
+        # --benchmark-disable runs each benchmark once without collecting stats
+        return
+    data = sorted(benchmark.stats.stats.data)
+    if not data:
+        return
+    p50 = statistics.median(data)
+    p99 = data[min(len(data) - 1, int(round(0.99 * (len(data) - 1))))]
+    throughput = len(data) / sum(data)
+    benchmark.extra_info.update({"p50_ms": p50 * 1000, "p99_ms": p99 * 1000, "ops_per_s": throughput})
+    LATENCY_REPORT.append((request.node.name, len(data), p50, p99, throughput))
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not LATENCY_REPORT:
+        return
+    terminalreporter.section("latency (stub server)")
+    terminalreporter.write_line(f"{'benchmark':<48} {'rounds':>7} {'p50 ms':>9} {'p99 ms':>9} {'ops/s':>9}")
+    for name, rounds, p50, p99, throughput in LATENCY_REPORT:
+        terminalreporter.write_line(
+            f"{name:<48} {rounds:>7} {p50 * 1000:>9.2f} {p99 * 1000:>9.2f} {throughput:>9.1f}")
@@ -0,0 +1,86 @@
+from typing import Dict, Mapping, Optional
+
+import numpy as np
+
+from src.amounts import Amount
+
+# Extra cost, as a fraction of the USD realized, charged for selling a token the
+# user would rather keep: at 0.05, selling BTC is ranked as if it cost 5% more
+# slippage than it does, so BTC is sold only once cheaper tokens run out.
+DEFAULT_HOLD_PREFERENCES = {"BTC": 0.05}
+
+
+def quote_slippage(best_quote: Optional[dict], price: float) -> float:
+    """
+    Fraction of a token's USD value lost when selling it for a stablecoin at a quote.
+
+    Args:
+        best_quote: Best quote for selling the token, as returned by get_quotes
+        price: USD price of the token
+
+    Returns:
+        float: 1 - (stablecoin out / USD value in), 0 if the quote is unusable
+    """
+    if not best_quote or not best_quote.get("amount_in") or not best_quote.get("amount_out"):
+        return 0.0
+    value_in = float(Amount.from_units(best_quote["amount_in"], best_quote["token_in"])) * price
+    value_out = float(Amount.from_units(best_quote["amount_out"], best_quote["token_out"]))
+    return max(0.0, 1.0 - value_out / value_in) if value_in else 0.0
+
+
+def solve_allocations(target_usd_amount: float,
+                      token_balances: Mapping[str, float],
+                      prices: Mapping[str, float],
+                      slippage: Optional[Mapping[str, float]] = None,
+                      hold_preferences: Optional[Mapping[str, float]] = None) -> Optional[Dict[str, float]]:
+    """
+    Chooses the quantities of each token to sell so that the stablecoins
+    received reach a USD target at the least cost.
+
+    Each token's cost per USD received is its slippage plus its hold
+    preference. Tokens are sold cheapest first, and only the last one
+    partially (a fractional knapsack), so the result is optimal for these
+    linear costs. Ties are broken by symbol, so equal inputs always give
+    equal output.
+
+    Args:
+        target_usd_amount: USD to realize in stablecoins
+        token_balances: Upper-cased symbol to quantity held, in whole tokens
+        prices: Symbol (any case) to USD price, as returned by fetch_prices
+        slippage: Upper-cased symbol to fraction lost when selling, 0 if absent
+        hold_preferences: Upper-cased symbol to extra cost of selling it
+
+    Returns:
+        dict: Symbol to quantity to sell, in the order they should be sold,
+        or None if the whole portfolio cannot reach the target
+    """
+    prices = {symbol.upper(): price for symbol, price in prices.items()}
+    slippage = slippage or {}
+    hold_preferences = DEFAULT_HOLD_PREFERENCES if hold_preferences is None else hold_preferences
+    symbols = sorted(symbol for symbol, quantity in token_balances.items()
+                     if quantity > 0 and prices.get(symbol.upper()))
+    if target_usd_amount <= 0:
+        return {}
+    if not symbols:
+        return None
+
+    quantity = np.array([token_balances[symbol] for symbol in symbols], dtype=float)
+    price = np.array([prices[symbol.upper()] for symbol in symbols], dtype=float)
+    kept = 1.0 - np.clip(np.array([slippage.get(symbol, 0.0) for symbol in symbols], dtype=float), 0.0, 1.0)
+    cost = (1.0 - kept) + np.array([hold_preferences.get(symbol, 0.0) for symbol in symbols], dtype=float)
+
+    # USD received for selling each whole balance, cheapest tokens first
+    received = quantity * price * kept
+    order = np.lexsort((np.arange(len(symbols)), cost))
+    order = order[received[order] > 0]
+    received = received[order]
+    cumulative = np.cumsum(received)
+    if not len(cumulative) or cumulative[-1] < target_usd_amount:
+        return None
+
+    still_needed = np.clip(target_usd_amount - (cumulative - received), 0.0, None)
+    sold_usd = np.minimum(received, still_needed)
+    # balances sold whole are returned exactly, without a float round trip through USD
+    sold = np.where(sold_usd >= received, quantity[order],
+                    np.minimum(sold_usd / (price[order] * kept[order]), quantity[order]))
+    return {symbols[i]: float(amount) for i, amount in zip(order, sold) if amount > 0}
@@ -0,0 +1,190 @@
+from decimal import Decimal, localcontext
+from functools import lru_cache
+from typing import Dict, Mapping, Tuple, Union
+
+from src.assets import ASSETS
+
+BPS_DENOMINATOR = 10_000
+# 1% of amount_out goes to the referral account
+REFERRAL_FEE_BPS = 100
+
+Numeric = Union[int, str, Decimal, float]
+# enough significant digits for a u128 amount times a price, so valuation never rounds
+VALUATION_PRECISION = 80
+
+
+@lru_cache(maxsize=None)
+def scale(decimals: int) -> int:
+    return 10 ** decimals
+
+
+def _decimals_for(token: Union[str, int]) -> int:
+    return token if isinstance(token, int) else ASSETS.decimals(token)
+
+
+def parse_units(value: Numeric, decimals: int) -> int:
+    """
+    Converts a human-readable amount (e.g. '1.5') to the token's smallest
+    unit with integer arithmetic only.
+
+    Args:
+        value: Decimal string, int, Decimal, or a float, which is read as the
+            shortest decimal that round-trips to it (repr), not its binary value
+        decimals: Token decimals
+
+    Returns:
+        int: Amount in the smallest unit
+
+    Raises:
+        ValueError: If value has more fractional digits than the token supports
+    """
+    if isinstance(value, int):
+        return value * scale(decimals)
+    if isinstance(value, float):
+        value = Decimal(repr(value))
+    text = format(value, "f") if isinstance(value, Decimal) else str(value).strip()
+    negative = text.startswith("-")
+    whole, _, fraction = text.lstrip("+-").partition(".")
+    fraction = fraction.rstrip("0")
+    if len(fraction) > decimals:
+        raise ValueError(f"{text} has more than {decimals} decimal places")
+    units = int(whole or "0") * scale(decimals) + int(fraction.ljust(decimals, "0") or "0")
+    return -units if negative else units
+
+
+def format_units(units: int, decimals: int) -> str:
+    """Formats an amount in the smallest unit as a decimal string, without trailing zeros."""
+    sign = "-" if units < 0 else ""
+    whole, fraction = divmod(abs(units), scale(decimals))
+    if not fraction:
+        return f"{sign}{whole}"
+    return f"{sign}{whole}.{str(fraction).rjust(decimals, '0').rstrip('0')}"
+
+
+class Amount:
+    """
+    Exact fixed-point token amount: an integer count of the token's smallest
+    unit (e.g. yoctoNEAR) plus the token's decimals from the asset registry.
+    """
+
+    __slots__ = ("units", "decimals")
+
+    def __init__(self, units: int, decimals: int):
+        self.units = int(units)
+        self.decimals = decimals
+
+    @classmethod
+    def from_units(cls, units: Union[int, str], token: Union[str, int]) -> "Amount":
+        """
+        Args:
+            units: Amount in the smallest unit, e.g. a yoctoNEAR balance string
+            token: Registry symbol or defuse asset id, or the decimals themselves
+        """
+        return cls(int(units), _decimals_for(token))
+
+    @classmethod
+    def parse(cls, value: Numeric, token: Union[str, int]) -> "Amount":
+        """Parses a human-readable amount such as '330.42928' for a token."""
+        decimals = _decimals_for(token)
+        return cls(parse_units(value, decimals), decimals)
+
+    def to_decimal(self) -> Decimal:
+        return Decimal(self.units).scaleb(-self.decimals)
+
+    def split_fee(self, fee_bps: int = REFERRAL_FEE_BPS) -> Tuple["Amount", "Amount"]:
+        """
+        Splits off a fee of `fee_bps` basis points, rounding the fee down so
+        that fee + remainder always equals the original amount.
+
+        Returns:
+            tuple: (fee, amount less fee)
+        """
+        fee = self.units * fee_bps // BPS_DENOMINATOR
+        return Amount(fee, self.decimals), Amount(self.units - fee, self.decimals)
+
+    def usd_value(self, price: Union[float, str, Decimal]) -> Decimal:
+        """Exact USD value at `price` per whole token."""
+        with localcontext() as context:
+            context.prec = VALUATION_PRECISION
+            return self.units * Decimal(str(price)) / scale(self.decimals)
+
+    def _check(self, other: "Amount"):
+        if not isinstance(other, Amount):
+            raise TypeError(f"Expected an Amount, got {type(other).__name__}")
+        if other.decimals != self.decimals:
+            raise ValueError(f"Cannot combine amounts with {self.decimals} and {other.decimals} decimals")
+
+    def __add__(self, other: "Amount") -> "Amount":
+        self._check(other)
+        return Amount(self.units + other.units, self.decimals)
+
+    def __sub__(self, other: "Amount") -> "Amount":
+        self._check(other)
+        return Amount(self.units - other.units, self.decimals)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Amount) and (self.units, self.decimals) == (other.units, other.decimals)
+
+    def __lt__(self, other: "Amount") -> bool:
+        self._check(other)
+        return self.units < other.units
+
+    def __le__(self, other: "Amount") -> bool:
+        self._check(other)
+        return self.units <= other.units
+
+    def __hash__(self):
+        return hash((self.units, self.decimals))
+
+    def __bool__(self) -> bool:
+        return self.units != 0
+
+    def __float__(self) -> float:
+        return self.units / scale(self.decimals)
+
+    def __str__(self) -> str:
+        return format_units(self.units, self.decimals)
+
+    def __repr__(self) -> str:
+        return f"Amount({self.units}, decimals={self.decimals})"
+
+
+def amounts_from_units(balances: Mapping[str, Union[int, str]]) -> Dict[str, Amount]:
+    """
+    Converts a whole portfolio of smallest-unit balances to Amounts in one
+    pass, resolving each token's decimals only once.
+
+    Args:
+        balances: Token symbol or defuse asset id to balance in the smallest unit
+
+    Returns:
+        dict: Token to Amount
+    """
+    decimals = {token: _decimals_for(token) for token in balances}
+    return {token: Amount(int(units), decimals[token]) for token, units in balances.items()}
+
+
+def units_from_amounts(amounts: Mapping[str, Numeric]) -> Dict[str, int]:
+    """Converts human-readable amounts per token to smallest-unit integers in one pass."""
+    return {token: parse_units(value, _decimals_for(token)) for token, value in amounts.items()}
+
+
+def portfolio_usd_value(balances: Mapping[str, Amount], prices: Mapping[str, Union[float, str, Decimal]]) -> Decimal:
+    """
+    Exact USD value of a portfolio.
+
+    Args:
+        balances: Token symbol to Amount
+        prices: Lower-cased token symbol to USD price, as returned by fetch_prices
+
+    Returns:
+        Decimal: Sum of the USD values of the tokens that have a price
+    """
+    total = Decimal(0)
+    with localcontext() as context:
+        context.prec = VALUATION_PRECISION
+        for token, amount in balances.items():
+            price = prices.get(token.lower())
+            if price is not None:
+                total += amount.usd_value(price)
+    return total
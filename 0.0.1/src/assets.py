@@ -0,0 +1,159 @@
+import json
+import os
+import threading
+from typing import Dict, FrozenSet, NamedTuple, Optional, Tuple
+
+from loguru import logger
+
+from src.telemetry import count
+
+DEFAULT_ASSETS_PATH = os.getenv("ASSET_REGISTRY_PATH",
+                                os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets.json"))
+
+
+class Asset(NamedTuple):
+    symbol: str
+    defuse_asset_id: str
+    decimals: int
+    chain: str
+    coingecko_id: Optional[str]
+
+
+class AssetIndex(NamedTuple):
+    """Immutable lookup tables built from one version of the registry file."""
+    by_symbol: Dict[str, Asset]
+    by_defuse_asset_id: Dict[str, Asset]
+    # (token_in defuse asset id, stablecoin symbol) -> token_out defuse asset id
+    routes: Dict[Tuple[str, str], str]
+    # stablecoin symbol -> token_out defuse asset id for token_ins without a route
+    default_routes: Dict[str, str]
+    # defuse asset ids of every stablecoin variant a route can resolve to
+    stablecoin_asset_ids: FrozenSet[str]
+
+
+def build_index(registry: dict) -> AssetIndex:
+    """
+    Precomputes every lookup the quote builders need from the registry JSON.
+
+    Args:
+        registry: Parsed registry file with 'tokens' and 'stablecoins' sections
+
+    Returns:
+        AssetIndex: Symbol, defuse id and (token_in, stablecoin) route tables
+    """
+    by_symbol = {}
+    for symbol, token in registry["tokens"].items():
+        by_symbol[symbol.upper()] = Asset(symbol=symbol,
+                                          defuse_asset_id=token["defuse_asset_id"],
+                                          decimals=int(token["decimals"]),
+                                          chain=token.get("chain", "near"),
+                                          coingecko_id=token.get("coingecko_id"))
+    by_defuse_asset_id = {asset.defuse_asset_id: asset for asset in by_symbol.values()}
+
+    routes = {}
+    default_routes = {}
+    for stablecoin, config in registry["stablecoins"].items():
+        stablecoin = stablecoin.upper()
+        default_routes[stablecoin] = by_symbol[config["default"].upper()].defuse_asset_id
+        for asset in by_symbol.values():
+            token_out = config.get("routes", {}).get(asset.symbol, config["default"])
+            routes[(asset.defuse_asset_id, stablecoin)] = by_symbol[token_out.upper()].defuse_asset_id
+    stablecoin_asset_ids = frozenset(routes.values()) | frozenset(default_routes.values())
+    return AssetIndex(by_symbol, by_defuse_asset_id, routes, default_routes, stablecoin_asset_ids)
+
+
+class AssetRegistry:
+    """
+    Token metadata and stablecoin routes, loaded once from a JSON file and
+    served from precomputed dicts. reload_if_changed() picks up edits to the
+    file without restarting the agent.
+    """
+
+    def __init__(self, path: str = DEFAULT_ASSETS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._index: AssetIndex = None
+        self.reload()
+
+    def reload(self) -> AssetIndex:
+        """
+        Re-reads the registry file and swaps in a freshly built index. If
+        the file cannot be parsed, e.g. while it is half-written, the current
+        index is kept until the file changes again.
+
+        Raises:
+            OSError, ValueError, KeyError: If the file cannot be read or parsed on the first load
+        """
+        with self._lock:
+            mtime = os.path.getmtime(self.path)
+            try:
+                with open(self.path) as f:
+                    index = build_index(json.load(f))
+            except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+                if self._index is None:
+                    raise
+                logger.warning("Keeping the previous asset registry, {path} failed to load: {error}",
+                               path=self.path, error=repr(e))
+                count("asset_registry_reload_failures_total")
+                self._mtime = mtime
+                return self._index
+            # a single assignment, so concurrent lookups see either the old or the new index
+            self._index = index
+            self._mtime = mtime
+            return index
+
+    def reload_if_changed(self) -> bool:
+        """Reloads the registry if its file was modified since the last load."""
+        try:
+            if os.path.getmtime(self.path) == self._mtime:
+                return False
+        except OSError:
+            return False
+        self.reload()
+        return True
+
+    def token_out(self, token_in: str, stablecoin: str) -> str:
+        """
+        Resolves the stablecoin asset that token_in is quoted against.
+
+        Args:
+            token_in: Defuse asset identifier, e.g. 'nep141:eth.omft.near'
+            stablecoin: 'USDC' or 'USDT'
+
+        Returns:
+            str: Defuse asset identifier of the stablecoin to buy
+        """
+        index = self._index
+        token_out = index.routes.get((token_in, stablecoin))
+        return token_out if token_out is not None else index.default_routes[stablecoin]
+
+    def asset(self, symbol_or_defuse_asset_id: str) -> Optional[Asset]:
+        index = self._index
+        return (index.by_defuse_asset_id.get(symbol_or_defuse_asset_id)
+                or index.by_symbol.get(symbol_or_defuse_asset_id.upper()))
+
+    def decimals(self, symbol_or_defuse_asset_id: str) -> int:
+        asset = self.asset(symbol_or_defuse_asset_id)
+        if asset is None:
+            raise KeyError(f"Unknown asset {symbol_or_defuse_asset_id}")
+        return asset.decimals
+
+    def defuse_asset_id(self, symbol: str) -> str:
+        return self._index.by_symbol[symbol.upper()].defuse_asset_id
+
+    def symbol(self, defuse_asset_id: str) -> str:
+        return self._index.by_defuse_asset_id[defuse_asset_id].symbol
+
+    def assets(self) -> Dict[str, Asset]:
+        return dict(self._index.by_symbol)
+
+    def is_stablecoin(self, symbol_or_defuse_asset_id: str) -> bool:
+        asset = self.asset(symbol_or_defuse_asset_id)
+        return asset is not None and asset.defuse_asset_id in self._index.stablecoin_asset_ids
+
+    def stablecoins(self):
+        return list(self._index.default_routes)
+
+
+ASSETS = AssetRegistry()
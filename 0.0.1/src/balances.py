@@ -0,0 +1,183 @@
+import asyncio
+import base64
+import json
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import httpx
+from loguru import logger
+
+from src.amounts import Amount
+from src.assets import ASSETS
+from src.quote_engine import run_sync
+from src.telemetry import count
+from src.transport import FASTNEAR_RPC_URL, get_transport
+
+# pseudo token id for the account's native NEAR balance (as opposed to wNEAR)
+NATIVE_NEAR = "near"
+DEFAULT_MAX_CONCURRENCY = 32
+DEFAULT_CACHED_BLOCKS = 4
+
+# account id -> token -> balance in the token's smallest unit, None if it could not be fetched
+Balances = Dict[str, Dict[str, Optional[int]]]
+
+
+def ft_contract_id(token: str) -> str:
+    """'nep141:eth.omft.near' -> 'eth.omft.near'"""
+    return token.split(":", 1)[1] if token.startswith("nep141:") else token
+
+
+class BalanceService:
+    """
+    Fetches native NEAR and NEP-141 balances for many accounts and tokens
+    at once, sending every view_account / ft_balance_of query concurrently
+    over the shared pooled transport.
+
+    All queries of one call are pinned to the same final block, and results
+    are cached per block height, so repeated calls within a block cost only
+    the block lookup.
+    """
+
+    def __init__(self,
+                 rpc_url: str = FASTNEAR_RPC_URL,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 cached_blocks: int = DEFAULT_CACHED_BLOCKS):
+        self.rpc_url = rpc_url
+        self.max_concurrency = max_concurrency
+        self.cached_blocks = cached_blocks
+        # block height -> (account id, token) -> balance
+        self._cache: "OrderedDict[int, Dict[Tuple[str, str], int]]" = OrderedDict()
+
+    async def _rpc(self, method: str, params) -> dict:
+        response = await get_transport().apost(self.rpc_url, json={
+            "jsonrpc": "2.0",
+            "id": "dontcare",
+            "method": method,
+            "params": params,
+        })
+        response.raise_for_status()
+        body = response.json()
+        if "error" in body:
+            raise ValueError(body["error"])
+        return body["result"]
+
+    async def final_block_height(self) -> int:
+        block = await self._rpc("block", {"finality": "final"})
+        return block["header"]["height"]
+
+    async def _fetch_balance(self, semaphore: asyncio.Semaphore, block_height: int, account_id: str,
+                             token: str) -> Optional[int]:
+        async with semaphore:
+            try:
+                if token == NATIVE_NEAR:
+                    result = await self._rpc("query", {
+                        "request_type": "view_account",
+                        "block_id": block_height,
+                        "account_id": account_id,
+                    })
+                    return int(result["amount"])
+                result = await self._rpc("query", {
+                    "request_type": "call_function",
+                    "block_id": block_height,
+                    "account_id": ft_contract_id(token),
+                    "method_name": "ft_balance_of",
+                    "args_base64": base64.b64encode(json.dumps({"account_id": account_id}).encode("utf-8")).decode("utf-8"),
+                })
+                return int(json.loads(bytes(result["result"])))
+            except (httpx.HTTPError, ValueError, KeyError) as e:
+                logger.warning("Error fetching {token} balance for {account_id}: {error}",
+                               token=token, account_id=account_id, error=str(e))
+                count("balance_fetch_failures_total", token=token)
+                return None
+
+    async def fetch(self, account_ids: Iterable[str], tokens: Iterable[str]) -> Balances:
+        """
+        Fetches every account x token balance at the latest final block.
+
+        Args:
+            account_ids: NEAR account ids
+            tokens: NATIVE_NEAR and/or NEP-141 defuse asset ids (e.g. 'nep141:wrap.near')
+
+        Returns:
+            dict: Account id to token to balance in the token's smallest unit.
+            Balances that could not be fetched are None, and are not cached,
+            so the next call asks for them again.
+        """
+        account_ids = list(dict.fromkeys(account_ids))
+        tokens = list(dict.fromkeys(tokens))
+        block_height = await self.final_block_height()
+        cached = self._cache.get(block_height)
+        if cached is None:
+            cached = self._cache[block_height] = {}
+            while len(self._cache) > self.cached_blocks:
+                self._cache.popitem(last=False)
+
+        missing = [(account_id, token) for account_id in account_ids for token in tokens
+                   if (account_id, token) not in cached]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        fetched = await asyncio.gather(*(self._fetch_balance(semaphore, block_height, account_id, token)
+                                         for account_id, token in missing))
+        failed = {}
+        for key, balance in zip(missing, fetched):
+            if balance is None:
+                failed[key] = None
+            else:
+                cached[key] = balance
+
+        return {account_id: {token: cached[(account_id, token)] if (account_id, token) in cached
+                             else failed.get((account_id, token)) for token in tokens}
+                for account_id in account_ids}
+
+    def fetch_sync(self, account_ids: Iterable[str], tokens: Iterable[str]) -> Balances:
+        """Synchronous counterpart of fetch."""
+        return run_sync(self.fetch(account_ids, tokens))
+
+
+BALANCES = BalanceService()
+
+
+def get_portfolio_balances(account_id: str, tokens: Optional[List[str]] = None) -> Dict[str, int]:
+    """
+    Fetches one account's native NEAR and token balances in a single pass.
+
+    Args:
+        account_id: NEAR account id
+        tokens: Tokens to fetch, NATIVE_NEAR plus every NEP-141 token in the
+            asset registry by default
+
+    Returns:
+        dict: Token to balance in the token's smallest unit, None if it could not be fetched
+    """
+    if tokens is None:
+        tokens = [NATIVE_NEAR] + [asset.defuse_asset_id for asset in ASSETS.assets().values()]
+    return BALANCES.fetch_sync([account_id], tokens)[account_id]
+
+
+def symbol_balances(balances: Dict[str, Optional[int]]) -> Dict[str, Optional[Amount]]:
+    """
+    Keys an account's balances by registry symbol, summing native NEAR with
+    wNEAR and leaving stablecoins out.
+
+    Args:
+        balances: Token (NATIVE_NEAR or defuse asset id) to smallest-unit balance, or None if unknown
+
+    Returns:
+        dict: Upper-cased symbol to Amount, or None if any balance behind it is unknown
+    """
+    token_balances = {}
+    unknown = set()
+    for token, units in balances.items():
+        if token == NATIVE_NEAR:
+            asset = ASSETS.asset("NEAR")
+        else:
+            asset = ASSETS.asset(token)
+            if asset is None or ASSETS.is_stablecoin(token):
+                continue
+        symbol = asset.symbol.upper()
+        if units is None:
+            unknown.add(symbol)
+            continue
+        amount = Amount(units, asset.decimals)
+        token_balances[symbol] = token_balances[symbol] + amount if symbol in token_balances else amount
+    token_balances.update(dict.fromkeys(unknown))
+    return token_balances
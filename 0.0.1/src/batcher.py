@@ -0,0 +1,128 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, List, NamedTuple, Optional
+
+from loguru import logger
+
+from src.amounts import Amount
+from src.telemetry import count
+
+DEFAULT_WINDOW = 0.25
+DEFAULT_MAX_BATCH = 64
+DEFAULT_REPORT_SAMPLES = 1024
+
+# signed intents -> relay response
+Publisher = Callable[[List[dict]], Awaitable[Any]]
+# yoctoNEAR -> transaction result
+Depositor = Callable[[int], Awaitable[Any]]
+
+
+class FlushReport(NamedTuple):
+    items: int
+    # yoctoNEAR wrapped and transferred to intents.near in the bundled deposit
+    deposit: int
+    transactions: int
+    duration: float
+
+
+async def publish_intents_source(signed_intents: List[dict]):
+    # imported on first use, keeping the batcher cheap to import
+    from src.utils import publish_intents_async
+    return await publish_intents_async(signed_intents)
+
+
+async def deposit_near_source(deposit_amount: int):
+    from src.utils import deposit_near
+    return await deposit_near(deposit_amount)
+
+
+def print_report(report: FlushReport):
+    logger.info("Flushed {items} swaps ({deposit} NEAR deposited, {transactions} transactions) in {duration_ms:.1f} ms",
+                items=report.items, deposit=str(Amount.from_units(report.deposit, "NEAR")),
+                transactions=report.transactions, duration_ms=report.duration * 1000)
+
+
+class SwapBatcher:
+    """
+    Collects signed swap intents for `window` seconds (or until `max_batch`
+    are pending) and then flushes them together: the NEAR every swap needs
+    deposited into intents.near goes out as one near_deposit +
+    ft_transfer_call transaction, and all intents, with their quote hashes,
+    go to the solver relay in one publish_intents call.
+    """
+
+    def __init__(self,
+                 window: float = DEFAULT_WINDOW,
+                 max_batch: int = DEFAULT_MAX_BATCH,
+                 publish: Publisher = publish_intents_source,
+                 deposit: Depositor = deposit_near_source,
+                 on_flush: Optional[Callable[[FlushReport], None]] = print_report,
+                 report_samples: int = DEFAULT_REPORT_SAMPLES):
+        self.window = window
+        self.max_batch = max_batch
+        self.publish = publish
+        self.deposit = deposit
+        self.on_flush = on_flush
+        self.reports = deque(maxlen=report_samples)
+        self._pending: List[tuple] = []
+        self._timer: Optional[asyncio.Task] = None
+
+    async def submit(self, signed_intent: dict, deposit: int = 0):
+        """
+        Queues a signed intent for the next flush.
+
+        Args:
+            signed_intent: PublishIntent with signed_data and quote_hashes
+            deposit: yoctoNEAR that must be in intents.near before the intent can settle
+
+        Returns:
+            The relay's publish_intents response for the batch the intent went out in
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((signed_intent, deposit, future))
+        if len(self._pending) >= self.max_batch:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_after_window())
+        return await future
+
+    async def _flush_after_window(self):
+        await asyncio.sleep(self.window)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self) -> Optional[FlushReport]:
+        """Sends everything pending now. Returns None if nothing was pending or the flush failed."""
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return None
+
+        start = time.perf_counter()
+        total_deposit = sum(deposit for _, deposit, _ in pending)
+        try:
+            transactions = 0
+            if total_deposit:
+                await self.deposit(total_deposit)
+                transactions = 1
+            result = await self.publish([signed_intent for signed_intent, _, _ in pending])
+        except Exception as e:
+            # every submitter of the batch sees the failure through its own future
+            logger.warning("Error flushing {items} swaps: {error}", items=len(pending), error=repr(e))
+            count("batcher_flush_failures_total")
+            for _, _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return None
+        for _, _, future in pending:
+            if not future.done():
+                future.set_result(result)
+
+        report = FlushReport(len(pending), total_deposit, transactions, time.perf_counter() - start)
+        self.reports.append(report)
+        if self.on_flush is not None:
+            self.on_flush(report)
+        return report
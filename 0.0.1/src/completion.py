@@ -0,0 +1,99 @@
+from typing import Iterable, Iterator, List, Optional
+
+# replies are flushed at paragraph breaks, or once this many characters are buffered
+DEFAULT_FLUSH_CHARS = 400
+
+
+def chunk_text(chunk) -> str:
+    """
+    Text of one streamed completion chunk: a plain string, an OpenAI-style
+    ChatCompletionChunk, or its dict form.
+    """
+    if isinstance(chunk, str):
+        return chunk
+    choices = chunk.get("choices") if isinstance(chunk, dict) else getattr(chunk, "choices", None)
+    if not choices:
+        return ""
+    choice = choices[0]
+    delta = choice.get("delta") if isinstance(choice, dict) else getattr(choice, "delta", None)
+    if delta is None:
+        return ""
+    content = delta.get("content") if isinstance(delta, dict) else getattr(delta, "content", None)
+    return content or ""
+
+
+def buffer_chunks(chunks: Iterable, flush_chars: int = DEFAULT_FLUSH_CHARS) -> Iterator[str]:
+    """
+    Groups streamed completion chunks into reply-sized pieces, so the user
+    sees the first paragraph as soon as it is generated without getting one
+    chat message per token.
+    """
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk_text(chunk)
+        while True:
+            cut = buffer.find("\n\n")
+            if cut == -1 and len(buffer) >= flush_chars:
+                cut = buffer.rfind(" ", 0, flush_chars)
+                cut = flush_chars if cut <= 0 else cut
+            if cut == -1:
+                break
+            piece, buffer = buffer[:cut].strip(), buffer[cut:].lstrip()
+            if piece:
+                yield piece
+    if buffer.strip():
+        yield buffer.strip()
+
+
+def response_text(response) -> Optional[str]:
+    """
+    Text of a whole, non-streamed completion: a plain string, or an
+    OpenAI-style ModelResponse or its dict form. None if `response` is a stream.
+    """
+    if response is None or isinstance(response, str):
+        return response
+    choices = response.get("choices") if isinstance(response, dict) else getattr(response, "choices", None)
+    if not choices:
+        return None
+    choice = choices[0]
+    message = choice.get("message") if isinstance(choice, dict) else getattr(choice, "message", None)
+    if message is None:
+        return None
+    content = message.get("content") if isinstance(message, dict) else getattr(message, "content", None)
+    return content or ""
+
+
+def stream_completion(env, messages: List[dict], flush_chars: int = DEFAULT_FLUSH_CHARS) -> Optional[str]:
+    """
+    Runs one completion and sends it to the user through env.add_reply,
+    piece by piece when the environment streams it.
+
+    Environments with env.completions are asked for a stream; those with
+    only env.completion, which returns the whole text, are not. Either way
+    the model is called exactly once.
+
+    Args:
+        env: The near.ai environment
+        messages: Prompt and chat history
+        flush_chars: Longest piece sent before a paragraph break
+
+    Returns:
+        str: The full completion text
+    """
+    if callable(getattr(env, "completions", None)):
+        response = env.completions(messages, stream=True)
+    else:
+        response = env.completion(messages)
+
+    text = response_text(response)
+    if text is not None or isinstance(response, dict):
+        # the environment answered with the whole completion at once
+        if text:
+            env.add_reply(text)
+        return text
+
+    pieces = []
+    for piece in buffer_chunks(response, flush_chars):
+        env.add_reply(piece)
+        pieces.append(piece)
+    return "\n\n".join(pieces)
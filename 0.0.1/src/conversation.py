@@ -0,0 +1,105 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Hashable, Iterable, List, Optional
+
+CONVERSATION_MAX_ENTRIES = int(os.getenv("CONVERSATION_MAX_ENTRIES", 10000))
+
+# one pass over a user message recognizes every structured input the agent understands
+USER_MESSAGE_REGEX = re.compile(
+    r"portfolio:\s*(?P<growth_goal>\d+)"
+    r"|allowance:\s*(?P<allowance_goal>\d+)"
+    r"|near:(?P<near_account_id>.*)",
+    re.DOTALL)
+
+
+class ConversationState:
+    """
+    Latest growth goal, allowance goal, NEAR account id and user message of a
+    chat history, kept up to date incrementally.
+
+    Each update() only parses the messages appended since the previous call,
+    so a turn costs the same however long the conversation already is.
+    """
+
+    def __init__(self, commands: Iterable[str] = ()):
+        self.commands = frozenset(commands)
+        self.growth_goal: Optional[str] = None
+        self.allowance_goal: Optional[str] = None
+        self.near_account_id: Optional[str] = None
+        self.last_user_message: Optional[str] = None
+        self._scanned = 0
+        self._last_scanned: Optional[dict] = None
+
+    def update(self, messages: List[dict]) -> "ConversationState":
+        """
+        Parses the messages appended since the last update.
+
+        Args:
+            messages: The full chat history, as returned by env.list_messages()
+        """
+        if self._scanned and (len(messages) < self._scanned or messages[self._scanned - 1] != self._last_scanned):
+            # a different or edited conversation: start over
+            self.__init__(self.commands)
+        for message in messages[self._scanned:]:
+            if message['role'] == 'user':
+                self._parse_user_message(message['content'])
+        self._scanned = len(messages)
+        self._last_scanned = messages[-1] if messages else None
+        return self
+
+    def _parse_user_message(self, content: str):
+        self.last_user_message = content
+        match = USER_MESSAGE_REGEX.match(content)
+        if match is None:
+            return
+        if match.group('growth_goal') is not None:
+            self.growth_goal = match.group('growth_goal')
+        elif match.group('allowance_goal') is not None:
+            self.allowance_goal = match.group('allowance_goal')
+        else:
+            self.near_account_id = match.group('near_account_id').strip()
+
+    @property
+    def command(self) -> Optional[str]:
+        """The latest user message if it is one of the known commands, else None."""
+        return self.last_user_message if self.last_user_message in self.commands else None
+
+
+class ConversationStore:
+    """
+    ConversationStates of the chat threads an agent process serves, in a
+    bounded LRU keyed by thread id.
+
+    The runtime builds a new Agent for every turn, so the parsed state is
+    kept here rather than on the Agent: the next turn of a thread only
+    parses the messages appended since the previous one.
+    """
+
+    def __init__(self, max_entries: int = CONVERSATION_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._states: "OrderedDict[Hashable, ConversationState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, thread_id: Optional[Hashable], commands: Iterable[str] = ()) -> ConversationState:
+        """Returns the thread's state, created on first use; without a thread id, a new unstored state."""
+        commands = frozenset(commands)
+        if thread_id is None:
+            return ConversationState(commands)
+        with self._lock:
+            state = self._states.get(thread_id)
+            if state is not None and state.commands == commands:
+                self._states.move_to_end(thread_id)
+                return state
+            state = self._states[thread_id] = ConversationState(commands)
+            while len(self._states) > self.max_entries:
+                self._states.popitem(last=False)
+            return state
+
+    def clear(self):
+        with self._lock:
+            self._states.clear()
+
+
+CONVERSATIONS = ConversationStore()
@@ -0,0 +1,193 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import httpx
+import requests
+
+from src.telemetry import count
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", 5))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", 30.0))
+ADAPTIVE_TIMEOUT_MIN = float(os.getenv("ADAPTIVE_TIMEOUT_MIN", 0.5))
+ADAPTIVE_TIMEOUT_MULTIPLIER = float(os.getenv("ADAPTIVE_TIMEOUT_MULTIPLIER", 3.0))
+# latencies needed before timeouts adapt and hedging starts
+HEALTH_MIN_SAMPLES = int(os.getenv("HEALTH_MIN_SAMPLES", 20))
+HEALTH_SAMPLES = 256
+HEDGE_MAX_WORKERS = 8
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(requests.ConnectionError, httpx.TransportError):
+    """
+    Raised instead of sending a request to an endpoint whose circuit is open.
+    It is both a requests and an httpx error, so every existing
+    `except requests.RequestException` / `except httpx.HTTPError` treats it
+    like any other failed request.
+    """
+
+    def __init__(self, endpoint: str):
+        super().__init__(f"circuit open for {endpoint}")
+        self.endpoint = endpoint
+
+
+class EndpointHealth:
+    """
+    Recent latencies and failures of one endpoint, with a circuit breaker.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    requests fail fast for `reset_timeout` seconds; then one probe request is
+    let through, and its outcome closes the circuit or opens it again. A probe
+    that is cancelled, or that never reports back within `reset_timeout`, is
+    replaced by the next request.
+    """
+
+    def __init__(self,
+                 endpoint: str,
+                 default_timeout: float,
+                 failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.endpoint = endpoint
+        self.default_timeout = default_timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started_at = 0.0
+        self._latencies = deque(maxlen=HEALTH_SAMPLES)
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now. Moves an expired open circuit to half-open."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = time.monotonic()
+            if (self.state == OPEN and now - self._opened_at >= self.reset_timeout
+                    or self.state == HALF_OPEN and now - self._probe_started_at >= self.reset_timeout):
+                # let exactly one probe through
+                self.state = HALF_OPEN
+                self._probe_started_at = now
+                return True
+            return False
+
+    def check(self):
+        """Raises CircuitOpenError if a request may not be sent now."""
+        if not self.allow():
+            count("circuit_rejections_total", endpoint=self.endpoint)
+            raise CircuitOpenError(self.endpoint)
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+            self._failures = 0
+            self.state = CLOSED
+
+    def record_cancelled(self):
+        """
+        Records a request given up before it finished, which says nothing
+        about the endpoint. A cancelled probe hands its slot back, so the next
+        request probes again.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.state = OPEN
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    count("circuit_opened_total", endpoint=self.endpoint)
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+
+    def percentile(self, q: float) -> Optional[float]:
+        """The q-th (0-1) percentile of recent successful latencies, None until enough are known."""
+        with self._lock:
+            if len(self._latencies) < HEALTH_MIN_SAMPLES:
+                return None
+            samples = sorted(self._latencies)
+        return samples[min(len(samples) - 1, int(round(q * (len(samples) - 1))))]
+
+    def timeout(self) -> float:
+        """
+        Request timeout adapted to the endpoint: a multiple of its p99
+        latency, between ADAPTIVE_TIMEOUT_MIN and the default timeout.
+        """
+        p99 = self.percentile(0.99)
+        if p99 is None:
+            return self.default_timeout
+        return min(self.default_timeout, max(ADAPTIVE_TIMEOUT_MIN, p99 * ADAPTIVE_TIMEOUT_MULTIPLIER))
+
+    def hedge_delay(self) -> Optional[float]:
+        """How long to wait for this endpoint before hedging: its p95 latency."""
+        return self.percentile(0.95)
+
+
+class ProviderHealth:
+    """EndpointHealth per endpoint (scheme://host[:port]), created on first use."""
+
+    def __init__(self, default_timeout: float):
+        self.default_timeout = default_timeout
+        self._endpoints: Dict[str, EndpointHealth] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def endpoint(self, endpoint: str) -> EndpointHealth:
+        health = self._endpoints.get(endpoint)
+        if health is None:
+            with self._lock:
+                health = self._endpoints.setdefault(endpoint, EndpointHealth(endpoint, self.default_timeout))
+        return health
+
+    def clear(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def hedge(self,
+              primary: Callable[[], Any],
+              secondary: Callable[[], Any],
+              delay: Optional[float]) -> Iterator[Any]:
+        """
+        Runs `primary`, and also `secondary` if primary has not finished
+        after `delay` seconds (or has failed), yielding their results in
+        completion order. A failed call is skipped; if both fail, the last
+        error is raised. With delay None, secondary runs only after primary
+        fails.
+
+        The caller may stop iterating once it has what it needs; a call
+        still running then finishes in the background.
+        """
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=HEDGE_MAX_WORKERS, thread_name_prefix="hedge")
+        pending = {self._executor.submit(primary)}
+        started_secondary = False
+        succeeded = False
+        error: Optional[BaseException] = None
+        while pending:
+            timeout = delay if not started_secondary else None
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                succeeded = True
+                yield result
+            if not started_secondary and not succeeded:
+                started_secondary = True
+                count("hedged_requests_total", reason="slow" if not done else "failed")
+                pending.add(self._executor.submit(secondary))
+        if not succeeded and error is not None:
+            raise error
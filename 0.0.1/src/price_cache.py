@@ -0,0 +1,196 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple, Union
+
+from loguru import logger
+
+from src.telemetry import count
+
+DEFAULT_TTL = float(os.getenv("PRICE_CACHE_TTL", 60.0))
+DEFAULT_MAX_STALE = float(os.getenv("PRICE_CACHE_MAX_STALE", 900.0))
+DEFAULT_MAX_ENTRIES = int(os.getenv("PRICE_CACHE_MAX_ENTRIES", 256))
+DEFAULT_CACHE_FILE = os.getenv("PRICE_CACHE_FILE")
+
+# (provider, symbol), e.g. ("coinbase", "near")
+PriceKey = Tuple[str, str]
+# (price, unix time it was fetched at)
+PriceEntry = Tuple[float, float]
+
+FRESH = "fresh"
+STALE = "stale"
+MISSING = "missing"
+
+
+class PriceCache:
+    """
+    Bounded LRU cache of USD prices keyed by (provider, symbol).
+
+    Entries younger than `ttl` are served directly. Entries older than `ttl`
+    but younger than `max_stale` are served immediately while a background
+    refresh fetches a new price (stale-while-revalidate). Older entries, and
+    misses, are fetched synchronously. Failed fetches (False) are never cached.
+
+    If `path` is set the cache is loaded from and persisted to that JSON file,
+    so a cold agent start comes up with the last known prices.
+    """
+
+    def __init__(self,
+                 ttl: float = DEFAULT_TTL,
+                 max_stale: float = DEFAULT_MAX_STALE,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 path: Optional[str] = DEFAULT_CACHE_FILE):
+        self.ttl = ttl
+        self.max_stale = max(max_stale, ttl)
+        self.max_entries = max_entries
+        self.path = path
+        self._entries: "OrderedDict[PriceKey, PriceEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._refreshing = set()
+        self._executor = None
+        if path:
+            self.load()
+
+    def get(self, provider: str, symbol: str) -> Optional[PriceEntry]:
+        """Returns the cached (price, fetched_at) entry, regardless of age."""
+        key = (provider, symbol.lower())
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, provider: str, symbol: str, price: float, fetched_at: Optional[float] = None):
+        key = (provider, symbol.lower())
+        with self._lock:
+            self._entries[key] = (price, fetched_at if fetched_at is not None else time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        if self.path:
+            self.save()
+
+    def lookup(self, provider: str, symbol: str) -> Tuple[str, Optional[float]]:
+        """
+        Classifies the cached price for (provider, symbol) by age.
+
+        Returns:
+            tuple: (FRESH or STALE, price), or (MISSING, None) when there is no
+            entry or it is older than `max_stale`
+        """
+        entry = self.get(provider, symbol)
+        if entry is None:
+            return MISSING, None
+        price, fetched_at = entry
+        age = time.time() - fetched_at
+        if age < self.ttl:
+            return FRESH, price
+        if age < self.max_stale:
+            return STALE, price
+        return MISSING, None
+
+    def put_many(self, provider: str, prices: Dict[str, float]):
+        """Stores several prices from one provider response, persisting once."""
+        fetched_at = time.time()
+        with self._lock:
+            for symbol, price in prices.items():
+                key = (provider, symbol.lower())
+                self._entries[key] = (price, fetched_at)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        if self.path and prices:
+            self.save()
+
+    def get_or_fetch(self,
+                     provider: str,
+                     symbol: str,
+                     fetch: Callable[[], Union[float, bool]]) -> Union[float, bool]:
+        """
+        Returns the price for (provider, symbol), calling `fetch` only when
+        the cached entry is missing or too old.
+
+        Args:
+            provider: Price provider name, e.g. 'coinbase'
+            symbol: Token symbol, e.g. 'near'
+            fetch: Fetches the current price, returning False on failure
+
+        Returns:
+            float: USD price if cached or fetched successfully
+            bool: False if there is no usable cached price and the fetch fails
+        """
+        state, price = self.lookup(provider, symbol)
+        if state == FRESH:
+            return price
+        if state == STALE:
+            self.refresh_in_background((provider, symbol.lower()),
+                                       lambda: self._fetch_and_put(provider, symbol, fetch))
+            return price
+        return self._fetch_and_put(provider, symbol, fetch)
+
+    def _fetch_and_put(self, provider: str, symbol: str, fetch: Callable[[], Union[float, bool]]) -> Union[float, bool]:
+        price = fetch()
+        if not isinstance(price, bool):
+            self.put(provider, symbol, price)
+        return price
+
+    def refresh_in_background(self, key, refresh: Callable[[], object]):
+        """
+        Runs `refresh` on the background refresh pool unless a refresh with the
+        same `key` is already in flight. `refresh` is responsible for put()-ing
+        the prices it fetches.
+        """
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="price-refresh")
+
+        def run():
+            try:
+                refresh()
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._executor.submit(run)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def load(self):
+        """Loads entries from `path`, ignoring a missing or unreadable file."""
+        try:
+            with open(self.path) as f:
+                stored: Dict[str, PriceEntry] = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            for key, (price, fetched_at) in sorted(stored.items(), key=lambda item: item[1][1]):
+                provider, symbol = key.split(":", 1)
+                self._entries[(provider, symbol)] = (price, fetched_at)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def save(self):
+        """Atomically writes the entries to `path`."""
+        with self._lock:
+            stored = {f"{provider}:{symbol}": entry for (provider, symbol), entry in self._entries.items()}
+        tmp_path = f"{self.path}.tmp"
+        with self._save_lock:
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump(stored, f)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.warning("Error saving price cache to {path}: {error}", path=self.path, error=str(e))
+                count("price_cache_save_failures_total")
+
+
+PRICE_CACHE = PriceCache()
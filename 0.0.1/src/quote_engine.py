@@ -0,0 +1,364 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Coroutine, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import httpx
+from loguru import logger
+
+from src.quote_log import QUOTE_LOG
+from src.telemetry import COUNT_BUCKETS, observe, span
+from src.transport import get_transport, host_key
+
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_REQUEST_TIMEOUT = 10.0
+MIN_DEADLINE_MS = 60000
+
+# (token_in, quantity, token_out) for a single solver relay quote request
+QuoteRequest = Tuple[str, int, str]
+
+
+def build_quote_request(token_in: str, quantity, token_out: str) -> dict:
+    """
+    Builds the JSON-RPC body for a solver relay `quote` call.
+
+    Args:
+        token_in: Defuse asset identifier to sell
+        quantity: Exact amount of token_in, in the token's smallest unit
+        token_out: Defuse asset identifier to buy
+
+    Returns:
+        dict: JSON-RPC request body
+    """
+    return {
+        "method": "quote",
+        "params": [{
+            "defuse_asset_identifier_in": token_in,
+            "defuse_asset_identifier_out": token_out,
+            "exact_amount_in": str(quantity),
+            "min_deadline_ms": MIN_DEADLINE_MS
+        }],
+        "id": "dontcare",
+        "jsonrpc": "2.0"
+    }
+
+
+def parse_expiration_time(expiration_time: Optional[str]) -> Optional[datetime]:
+    """Parses a relay expiration_time such as '2025-01-20T12:00:00.000Z'."""
+    if not expiration_time:
+        return None
+    try:
+        return datetime.fromisoformat(expiration_time.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def is_expired(quote: dict, now: Optional[datetime] = None) -> bool:
+    """True if the quote's expiration_time has passed. Quotes without one never expire."""
+    expires_at = parse_expiration_time(quote.get("expiration_time"))
+    if expires_at is None:
+        return False
+    return expires_at <= (now or datetime.now(timezone.utc))
+
+
+def parse_quote(quote: dict) -> dict:
+    """Converts a raw relay quote into the best-quote shape used by the swap flow."""
+    return {
+        "quote_hash": quote.get("quote_hash"),
+        "amount_in": quote.get("amount_in"),
+        "token_in": quote.get("defuse_asset_identifier_in"),
+        "token_out": quote.get("defuse_asset_identifier_out"),
+        "amount_out": quote.get("amount_out"),
+        "usd_value": int(quote.get("amount_out", 0)),
+        "expiration_time": quote.get("expiration_time")}
+
+
+def collect_quotes(data, quotes: list, best_usd_value: dict) -> dict:
+    """
+    Appends the unexpired solver quotes in a relay `result` to `quotes` and
+    returns the best quote seen so far, ranked by amount_out.
+
+    Args:
+        data: The `result` field of a relay `quote` response
+        quotes: List that parsed quotes are appended to
+        best_usd_value: Best quote found before this response
+
+    Returns:
+        dict: The best quote after considering `data`
+    """
+    if not isinstance(data, list):
+        return best_usd_value
+
+    now = datetime.now(timezone.utc)
+    for quote in data:
+        if is_expired(quote, now):
+            continue
+        # every kept quote carries its quote_hash, so any of them can be published
+        parsed = parse_quote(quote)
+        quotes.append(parsed)
+        if parsed["usd_value"] > best_usd_value.get("usd_value"):
+            best_usd_value = parsed
+    return best_usd_value
+
+
+class QuoteEngine:
+    """
+    Fans out solver relay quote requests concurrently over one pooled HTTP
+    client, so that the latency of N quotes is roughly that of the slowest one.
+    """
+
+    def __init__(self,
+                 base_url: str,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 request_timeout: float = DEFAULT_REQUEST_TIMEOUT,
+                 client: Optional[httpx.AsyncClient] = None):
+        self.base_url = base_url
+        self.request_timeout = request_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._owns_client = client is None
+        self._client = client or httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_concurrency,
+                                max_keepalive_connections=max_concurrency),
+            timeout=request_timeout)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        if self._owns_client:
+            await self._client.aclose()
+
+    async def fetch_quote(self, token_in: str, quantity, token_out: str) -> tuple:
+        """
+        Requests quotes for a single token_in -> token_out swap.
+
+        Args:
+            token_in: Defuse asset identifier to sell
+            quantity: Exact amount of token_in
+            token_out: Defuse asset identifier to buy
+
+        Returns:
+            tuple: (quotes, best_quote), with an empty result on failure or
+            when the request misses its deadline
+        """
+        quotes = []
+        best_usd_value = collect_quotes(await self._fetch_raw(token_in, quantity, token_out),
+                                        quotes, {"usd_value": 0})
+        QUOTE_LOG.record_best_quote(best_usd_value)
+        return quotes, best_usd_value
+
+    async def _fetch_raw(self, token_in: str, quantity, token_out: str) -> list:
+        """
+        Returns the relay's raw quote list, or [] on failure, a missed
+        deadline or an open circuit. The deadline is request_timeout, or
+        less once the relay's latency is known (see src/health.py).
+        """
+        health = get_transport().health.endpoint(host_key(self.base_url))
+        async with self._semaphore:
+            if not health.allow():
+                logger.warning("Skipping quote for token {token_in}: circuit open for {endpoint}",
+                               token_in=token_in, endpoint=health.endpoint)
+                return []
+            timeout = min(self.request_timeout, health.timeout())
+            start = time.perf_counter()
+            try:
+                with span("quote_request"):
+                    response = await asyncio.wait_for(
+                        self._client.post(self.base_url,
+                                          json=build_quote_request(token_in, quantity, token_out)),
+                        timeout=timeout)
+                latency = time.perf_counter() - start
+                if response.status_code >= 500 or response.status_code == 429:
+                    health.record_failure()
+                    return []
+                # read before recording success, so that an unreadable body counts as a failure
+                data = response.json().get("result", []) if response.status_code == 200 else None
+                health.record_success(latency)
+                if isinstance(data, list):
+                    QUOTE_LOG.record_quotes(data)
+                    observe("quote_count", len(data), COUNT_BUCKETS)
+                    return data
+            except asyncio.TimeoutError:
+                health.record_failure()
+                logger.warning("Quote for token {token_in} timed out after {timeout}s",
+                               token_in=token_in, timeout=timeout)
+            except httpx.HTTPError as e:
+                health.record_failure()
+                logger.warning("Error fetching quote for token {token_in}: {error}", token_in=token_in, error=str(e))
+            except asyncio.CancelledError:
+                # e.g. by stream_quotes once it has enough quotes
+                health.record_cancelled()
+                raise
+            except Exception as e:
+                # e.g. a response that is not JSON
+                health.record_failure()
+                logger.warning("Error reading quote for token {token_in}: {error}", token_in=token_in, error=repr(e))
+        return []
+
+    async def fetch_quotes(self, quote_requests: Iterable[QuoteRequest]) -> List[tuple]:
+        """
+        Requests quotes for every (token_in, quantity, token_out) at once.
+
+        Returns:
+            list: One (quotes, best_quote) tuple per request, in request order
+        """
+        return list(await asyncio.gather(
+            *(self.fetch_quote(token_in, quantity, token_out)
+              for token_in, quantity, token_out in quote_requests)))
+
+    async def stream_quotes(self,
+                            quote_requests: Iterable[QuoteRequest],
+                            target_amount_out: Optional[int] = None,
+                            timeout: Optional[float] = None) -> AsyncIterator[dict]:
+        """
+        Yields unexpired quotes as each relay response arrives, across all
+        requests, instead of waiting for the slowest one.
+
+        Args:
+            quote_requests: (token_in, quantity, token_out) tuples to quote
+            target_amount_out: Stop after the first quote whose amount_out
+                reaches this amount
+            timeout: Stop once this many seconds have passed, yielding only
+                the quotes that arrived in time
+
+        Yields:
+            dict: Quotes in the best-quote shape, in arrival order. Requests
+            still in flight when the stream stops are cancelled.
+        """
+        stop_at = time.monotonic() + timeout if timeout is not None else None
+        pending = {asyncio.ensure_future(self._fetch_raw(token_in, quantity, token_out))
+                   for token_in, quantity, token_out in quote_requests}
+        try:
+            while pending:
+                wait_for = None if stop_at is None else stop_at - time.monotonic()
+                if wait_for is not None and wait_for <= 0:
+                    return
+                done, pending = await asyncio.wait(pending, timeout=wait_for,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    now = datetime.now(timezone.utc)
+                    for quote in task.result():
+                        if is_expired(quote, now):
+                            continue
+                        parsed = parse_quote(quote)
+                        yield parsed
+                        if target_amount_out is not None and parsed["usd_value"] >= target_amount_out:
+                            return
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+async def fan_out_quotes(base_url: str,
+                         quote_requests: Iterable[QuoteRequest],
+                         **engine_options) -> List[tuple]:
+    """Runs all quote requests concurrently on the shared transport's client for the relay."""
+    engine_options.setdefault("client", get_transport().async_client(base_url))
+    async with QuoteEngine(base_url, **engine_options) as engine:
+        return await engine.fetch_quotes(quote_requests)
+
+
+async def stream_quotes(base_url: str,
+                        quote_requests: Iterable[QuoteRequest],
+                        target_amount_out: Optional[int] = None,
+                        timeout: Optional[float] = None,
+                        **engine_options) -> AsyncIterator[dict]:
+    """Streams quotes on the shared transport's client for the relay. See QuoteEngine.stream_quotes."""
+    engine_options.setdefault("client", get_transport().async_client(base_url))
+    async with QuoteEngine(base_url, **engine_options) as engine:
+        async for quote in engine.stream_quotes(quote_requests, target_amount_out, timeout):
+            yield quote
+
+
+def iter_quotes(base_url: str,
+                quote_requests: Iterable[QuoteRequest],
+                target_amount_out: Optional[int] = None,
+                timeout: Optional[float] = None,
+                **engine_options) -> Iterator[dict]:
+    """
+    Generator counterpart of stream_quotes for synchronous callers. The
+    stream runs on the shared background loop (see run_sync).
+    """
+    stream = stream_quotes(base_url, quote_requests, target_amount_out, timeout, **engine_options)
+    try:
+        while True:
+            try:
+                yield run_sync(_anext(stream))
+            except StopAsyncIteration:
+                return
+    finally:
+        run_sync(stream.aclose())
+
+
+async def _anext(stream: AsyncIterator[dict]) -> dict:
+    return await stream.__anext__()
+
+
+async def fan_out_stablecoin_quotes(base_url: str,
+                                    token_to_quantities: Dict[str, int],
+                                    token_out_resolvers: Dict[str, callable],
+                                    **engine_options) -> Dict[str, List[tuple]]:
+    """
+    Requests every token_in x stablecoin quote in a single fan-out.
+
+    Args:
+        base_url: Solver relay RPC URL
+        token_to_quantities: Map of token_in to quantity
+        token_out_resolvers: Map of stablecoin symbol to a function resolving
+            the stablecoin's defuse asset identifier for a token_in
+
+    Returns:
+        dict: Stablecoin symbol to one (quotes, best_quote) tuple per token_in
+    """
+    quote_requests = [(token_in, quantity, resolve(token_in))
+                      for resolve in token_out_resolvers.values()
+                      for token_in, quantity in token_to_quantities.items()]
+    results = await fan_out_quotes(base_url, quote_requests, **engine_options)
+
+    n_tokens = len(token_to_quantities)
+    return {symbol: results[i * n_tokens:(i + 1) * n_tokens]
+            for i, symbol in enumerate(token_out_resolvers)}
+
+
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_loop_lock = threading.Lock()
+
+
+def background_loop() -> asyncio.AbstractEventLoop:
+    """
+    The event loop that synchronous callers run coroutines on, started on
+    first use in a daemon thread and kept for the life of the process, so
+    that the transport's async clients created on it, and their
+    connections, are reused by every call.
+    """
+    global _background_loop
+    if _background_loop is None:
+        with _background_loop_lock:
+            if _background_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="quote-engine-loop", daemon=True).start()
+                _background_loop = loop
+    return _background_loop
+
+
+def run_sync(coro: Coroutine) -> Any:
+    """
+    Runs a coroutine to completion on the background loop from synchronous
+    code, including when the caller is itself running inside an event loop.
+
+    Raises:
+        RuntimeError: If called from the background loop itself, which would deadlock
+    """
+    loop = background_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run_sync cannot be called from the background loop; await the coroutine instead")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
@@ -0,0 +1,299 @@
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from src.telemetry import count
+
+DEFAULT_QUOTE_LOG_PATH = "quote_log.sqlite3"
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_FLUSH_INTERVAL = 0.5
+# rows waiting for the writer beyond this are dropped rather than held in memory
+DEFAULT_MAX_QUEUE = int(os.getenv("QUOTE_LOG_MAX_QUEUE", 10000))
+# how long exit waits for queued rows to be written
+EXIT_FLUSH_TIMEOUT = float(os.getenv("QUOTE_LOG_EXIT_TIMEOUT", 5.0))
+# amount_out is stored zero-padded as well, so that the largest u128 sorts correctly as text
+AMOUNT_SORT_WIDTH = 40
+
+QUOTE = "quote"
+BEST_QUOTE = "best_quote"
+COMMITMENT = "commitment"
+PUBLISH_RESULT = "publish_result"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS quote_log (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    quote_hash TEXT,
+    token_in TEXT,
+    token_out TEXT,
+    amount_in TEXT,
+    amount_out TEXT,
+    amount_out_sort TEXT,
+    expiration_time TEXT,
+    payload TEXT
+);
+CREATE INDEX IF NOT EXISTS quote_log_quote_hash ON quote_log (quote_hash);
+CREATE INDEX IF NOT EXISTS quote_log_pair ON quote_log (token_in, token_out, recorded_at);
+CREATE INDEX IF NOT EXISTS quote_log_recorded_at ON quote_log (recorded_at);
+"""
+
+INSERT = """
+INSERT INTO quote_log (kind, recorded_at, quote_hash, token_in, token_out, amount_in,
+                       amount_out, amount_out_sort, expiration_time, payload)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+Row = Tuple[str, float, Optional[str], Optional[str], Optional[str], Optional[str],
+            Optional[str], Optional[str], Optional[str], Optional[str]]
+
+
+def _amount_sort_key(amount_out) -> Optional[str]:
+    try:
+        return str(int(amount_out)).zfill(AMOUNT_SORT_WIDTH)
+    except (TypeError, ValueError):
+        return None
+
+
+class QuoteLog:
+    """
+    Append-only SQLite log of quotes, chosen best quotes, signed commitments
+    and publish results, indexed by quote_hash and by token pair and time.
+
+    The record_* methods only enqueue a row; a background writer thread
+    inserts queued rows in batches, so recording never blocks a swap. Rows
+    beyond `max_queue` are dropped. A QuoteLog created without a path, or
+    whose database cannot be opened, records nothing.
+    """
+
+    def __init__(self,
+                 path: Optional[str],
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 max_queue: int = DEFAULT_MAX_QUEUE):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self._disabled = False
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path) and not self._disabled
+
+    def record_quotes(self, quotes: List[dict]):
+        """Records raw relay quotes (defuse_asset_identifier_in/out, amount_in, amount_out, ...)."""
+        if not self.enabled:
+            return
+        recorded_at = time.time()
+        for quote in quotes:
+            self._enqueue((QUOTE, recorded_at, quote.get("quote_hash"),
+                           quote.get("defuse_asset_identifier_in"), quote.get("defuse_asset_identifier_out"),
+                           quote.get("amount_in"), quote.get("amount_out"),
+                           _amount_sort_key(quote.get("amount_out")), quote.get("expiration_time"), None))
+
+    def record_best_quote(self, best_quote: dict):
+        """Records the quote chosen by get_quotes or the quote engine."""
+        if not self.enabled or not best_quote.get("quote_hash"):
+            return
+        self._enqueue((BEST_QUOTE, time.time(), best_quote.get("quote_hash"),
+                       best_quote.get("token_in"), best_quote.get("token_out"),
+                       best_quote.get("amount_in"), best_quote.get("amount_out"),
+                       _amount_sort_key(best_quote.get("amount_out")), best_quote.get("expiration_time"), None))
+
+    def record_commitment(self, commitment: dict):
+        """Records a signed commitment as returned by sign_quote."""
+        if not self.enabled:
+            return
+        self._enqueue((COMMITMENT, time.time(), None, None, None, None, None, None, None,
+                       json.dumps(commitment)))
+
+    def record_publish_result(self, signed_intent: dict, result):
+        """Records the relay's response to publish_intent, once per quote hash in the intent."""
+        if not self.enabled:
+            return
+        recorded_at = time.time()
+        payload = json.dumps({"signed_intent": signed_intent, "result": result})
+        for quote_hash in signed_intent.get("quote_hashes") or [None]:
+            self._enqueue((PUBLISH_RESULT, recorded_at, quote_hash,
+                           None, None, None, None, None, None, payload))
+
+    def _enqueue(self, row: Row):
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            count("quote_log_dropped_total")
+            return
+        if self._writer is None:
+            self._start_writer()
+
+    def _start_writer(self):
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="quote-log-writer", daemon=True)
+                self._writer.start()
+                atexit.register(self.flush, EXIT_FLUSH_TIMEOUT)
+
+    def _disable(self, error: Exception):
+        """Stops recording after the database failed to open, releasing every waiting flush."""
+        logger.error("Quote log {path} disabled: {error}", path=self.path, error=str(error))
+        count("quote_log_failures_total", stage="connect")
+        self._disabled = True
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if isinstance(item, threading.Event):
+                item.set()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(SCHEMA)
+        return connection
+
+    def _write_loop(self):
+        try:
+            connection = self._connect()
+        except sqlite3.Error as e:
+            self._disable(e)
+            return
+        while True:
+            rows = []
+            flushed = []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if isinstance(item, threading.Event):
+                    flushed.append(item)
+                else:
+                    rows.append(item)
+                if len(rows) >= self.batch_size or flushed:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if rows:
+                try:
+                    with connection:
+                        connection.executemany(INSERT, rows)
+                except sqlite3.Error as e:
+                    logger.warning("Error writing {rows} rows to quote log {path}: {error}",
+                                   rows=len(rows), path=self.path, error=str(e))
+                    count("quote_log_failures_total", stage="write")
+            for event in flushed:
+                event.set()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until every row recorded before the call has been written.
+
+        Returns:
+            bool: False if the rows were not written within `timeout`, or the log is disabled
+        """
+        if self._writer is None:
+            return True
+        if not self.enabled:
+            return False
+        event = threading.Event()
+        try:
+            self._queue.put(event, timeout=timeout)
+        except queue.Full:
+            return False
+        if not self.enabled:
+            # the writer gave up between the check above and the put
+            return False
+        return event.wait(timeout) and self.enabled
+
+    def best_amount_out(self,
+                        token_in: str,
+                        token_out: str,
+                        since: Optional[float] = None,
+                        until: Optional[float] = None) -> Optional[dict]:
+        """
+        Finds the quote with the highest amount_out for a token pair.
+
+        Args:
+            token_in: Defuse asset identifier sold
+            token_out: Defuse asset identifier bought
+            since: Window start, as a unix timestamp
+            until: Window end, as a unix timestamp
+
+        Returns:
+            dict: quote_hash, amount_in, amount_out and recorded_at of the best
+            quote, or None if no quote was recorded for the pair in the window
+        """
+        best = self.best_amount_out_by_pair(since, until, token_in, token_out)
+        return best.get((token_in, token_out))
+
+    def best_amount_out_by_pair(self,
+                                since: Optional[float] = None,
+                                until: Optional[float] = None,
+                                token_in: Optional[str] = None,
+                                token_out: Optional[str] = None) -> Dict[Tuple[str, str], dict]:
+        """
+        Finds the highest amount_out quote of every token pair in a window.
+
+        Returns:
+            dict: (token_in, token_out) to the best quote, as in best_amount_out
+        """
+        if not self.enabled:
+            return {}
+        self.flush()
+        query = """
+            SELECT token_in, token_out, quote_hash, amount_in, amount_out, MAX(amount_out_sort), recorded_at
+            FROM quote_log
+            WHERE kind = ? AND amount_out_sort IS NOT NULL AND recorded_at >= ? AND recorded_at <= ?
+        """
+        params = [QUOTE, since if since is not None else 0, until if until is not None else time.time()]
+        if token_in is not None and token_out is not None:
+            query += " AND token_in = ? AND token_out = ?"
+            params += [token_in, token_out]
+        query += " GROUP BY token_in, token_out"
+
+        rows = self._query(query, params)
+        return {(row[0], row[1]): {"quote_hash": row[2], "amount_in": row[3],
+                                   "amount_out": row[4], "recorded_at": row[6]}
+                for row in rows}
+
+    def find(self, quote_hash: str) -> List[dict]:
+        """Returns every record for a quote_hash, oldest first, for audit and replay."""
+        if not self.enabled:
+            return []
+        self.flush()
+        rows = self._query("SELECT * FROM quote_log WHERE quote_hash = ? ORDER BY recorded_at, id",
+                           (quote_hash,), sqlite3.Row)
+        return [dict(row) for row in rows]
+
+    def _query(self, query: str, params, row_factory=None) -> list:
+        """Runs a read query on its own connection, returning no rows if the database cannot be read."""
+        try:
+            connection = self._connect()
+        except sqlite3.Error as e:
+            logger.warning("Error reading quote log {path}: {error}", path=self.path, error=str(e))
+            count("quote_log_failures_total", stage="read")
+            return []
+        connection.row_factory = row_factory
+        try:
+            return connection.execute(query, params).fetchall()
+        except sqlite3.Error as e:
+            logger.warning("Error reading quote log {path}: {error}", path=self.path, error=str(e))
+            count("quote_log_failures_total", stage="read")
+            return []
+        finally:
+            connection.close()
+
+
+QUOTE_LOG = QuoteLog(os.getenv("QUOTE_LOG_PATH", DEFAULT_QUOTE_LOG_PATH) or None)
@@ -0,0 +1,169 @@
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from src.quote_engine import fan_out_quotes, is_expired
+from src.transport import SOLVER_RELAY_URL
+
+# a swap is split into this many equal parts ...
+DEFAULT_PARTS = 4
+# ... and quoted at these multiples of a part: 25%, 50% and 100% of the amount
+DEFAULT_TIERS = (1, 2, 4)
+ROUTE_CURVE_TTL = float(os.getenv("ROUTE_CURVE_TTL", 10))
+ROUTE_CURVE_MAX_ENTRIES = int(os.getenv("ROUTE_CURVE_MAX_ENTRIES", 256))
+
+
+class PriceImpactCurve(NamedTuple):
+    token_in: str
+    token_out: str
+    # the amount the tiers are fractions of, in token_in's smallest unit
+    amount_in: int
+    # tier (in parts) -> exact amount_in quoted at that tier
+    sizes: Dict[int, int]
+    # tier -> unexpired solver quotes at that size, in the best-quote shape
+    quotes: Dict[int, List[dict]]
+    fetched_at: float
+
+    def best_amount_out(self, tier: int) -> int:
+        return max((int(quote["amount_out"]) for quote in self.quotes.get(tier, ())), default=0)
+
+    def price_impact(self) -> Dict[int, float]:
+        """
+        Fraction of output lost per unit sold at each tier, relative to the
+        smallest tier that was quoted.
+        """
+        rates = {tier: self.best_amount_out(tier) / self.sizes[tier]
+                 for tier in sorted(self.sizes) if self.best_amount_out(tier)}
+        if not rates:
+            return {}
+        base = next(iter(rates.values()))
+        return {tier: 1.0 - rate / base for tier, rate in rates.items()}
+
+
+class Route(NamedTuple):
+    token_in: str
+    token_out: str
+    # the solver quotes to accept, one intent's worth each
+    legs: List[dict]
+    amount_in: int
+    amount_out: int
+    # what the single best quote for the whole amount would have paid
+    single_quote_amount_out: int
+
+    @property
+    def quote_hashes(self) -> List[str]:
+        return [leg["quote_hash"] for leg in self.legs]
+
+
+def best_split(legs: List[Tuple[int, int, dict]], parts: int) -> Optional[List[dict]]:
+    """
+    Picks the quotes whose sizes add up to exactly `parts` parts with the
+    largest total amount_out (a 0/1 knapsack over quote legs).
+
+    Args:
+        legs: (size in parts, amount_out, quote) per quote
+        parts: Number of parts the swap was split into
+
+    Returns:
+        list: The chosen quotes, or None if no combination covers every part
+    """
+    # parts filled -> (total amount_out, chosen quotes); larger legs are
+    # tried first and only a strictly better total replaces a combination,
+    # so ties go to the route with the fewest legs
+    best: List[Optional[Tuple[int, List[dict]]]] = [(0, [])] + [None] * parts
+    for size, amount_out, quote in sorted(legs, key=lambda leg: (-leg[0], -leg[1], leg[2]["quote_hash"] or "")):
+        for filled in range(parts, size - 1, -1):
+            previous = best[filled - size]
+            if previous is None:
+                continue
+            total = previous[0] + amount_out
+            if best[filled] is None or total > best[filled][0]:
+                best[filled] = (total, previous[1] + [quote])
+    return best[parts][1] if best[parts] is not None else None
+
+
+class QuoteRouter:
+    """
+    Splits a swap across solver quotes at several sizes when that pays more
+    than the single best quote for the whole amount.
+
+    Quotes for every tier are requested concurrently, and the resulting
+    price-impact curve is cached per (pair, amount) for `ttl` seconds so that
+    re-routing the same swap, e.g. after the user confirms it, costs no
+    further quote requests.
+    """
+
+    def __init__(self,
+                 base_url: str = SOLVER_RELAY_URL,
+                 parts: int = DEFAULT_PARTS,
+                 tiers: Tuple[int, ...] = DEFAULT_TIERS,
+                 ttl: float = ROUTE_CURVE_TTL,
+                 max_entries: int = ROUTE_CURVE_MAX_ENTRIES):
+        if parts not in tiers:
+            raise ValueError(f"tiers {tiers} must include the whole amount ({parts} parts)")
+        self.base_url = base_url
+        self.parts = parts
+        self.tiers = tuple(sorted(set(tiers)))
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._curves: "OrderedDict[Tuple[str, str, int], PriceImpactCurve]" = OrderedDict()
+
+    def tier_sizes(self, amount_in: int) -> Dict[int, int]:
+        """
+        Tier -> amount_in quoted. The whole-amount tier is exact; the others
+        round down, so a split route may leave fewer than `parts` smallest
+        units of token_in unsold.
+        """
+        part = amount_in // self.parts
+        return {tier: amount_in if tier == self.parts else tier * part
+                for tier in self.tiers if tier == self.parts or tier * part > 0}
+
+    async def curve(self, token_in: str, token_out: str, amount_in: int) -> PriceImpactCurve:
+        """Returns the cached price-impact curve for a swap, quoting every tier at once when stale."""
+        key = (token_in, token_out, amount_in)
+        curve = self._curves.get(key)
+        if curve is not None and time.monotonic() - curve.fetched_at < self.ttl:
+            self._curves.move_to_end(key)
+            return curve
+
+        sizes = self.tier_sizes(amount_in)
+        results = await fan_out_quotes(self.base_url, [(token_in, size, token_out) for size in sizes.values()])
+        now = datetime.now(timezone.utc)
+        curve = PriceImpactCurve(
+            token_in, token_out, amount_in, sizes,
+            {tier: [quote for quote in quotes if not is_expired(quote, now)]
+             for tier, (quotes, _) in zip(sizes, results)},
+            time.monotonic())
+        self._curves[key] = curve
+        while len(self._curves) > self.max_entries:
+            self._curves.popitem(last=False)
+        return curve
+
+    async def route(self, token_in: str, token_out: str, amount_in: int) -> Optional[Route]:
+        """
+        Finds the combination of quotes that sells `amount_in` of token_in
+        for the most token_out.
+
+        Returns:
+            Route: The chosen legs, or None if no tier was quoted
+        """
+        curve = await self.curve(token_in, token_out, amount_in)
+        now = datetime.now(timezone.utc)
+        legs = [(tier, int(quote["amount_out"]), quote)
+                for tier, quotes in curve.quotes.items()
+                for quote in quotes if not is_expired(quote, now)]
+        chosen = best_split(legs, self.parts)
+        if not chosen:
+            return None
+        return Route(token_in, token_out, chosen,
+                     sum(int(leg["amount_in"]) for leg in chosen),
+                     sum(int(leg["amount_out"]) for leg in chosen),
+                     curve.best_amount_out(self.parts))
+
+    def clear(self):
+        self._curves.clear()
+
+
+ROUTER = QuoteRouter()
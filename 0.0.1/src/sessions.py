@@ -0,0 +1,224 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from loguru import logger
+
+DEFAULT_SESSION_STORE_PATH = "sessions.sqlite3"
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", 10000))
+# how long fetched prices and balances are reused before an agent turn fetches them again
+SESSION_PRICES_TTL = float(os.getenv("SESSION_PRICES_TTL", 60.0))
+SESSION_BALANCES_TTL = float(os.getenv("SESSION_BALANCES_TTL", 300.0))
+# a recommendation is never reused for longer than this, even if nothing it depends on changed
+SESSION_RECOMMENDATION_TTL = float(os.getenv("SESSION_RECOMMENDATION_TTL", 300.0))
+# relative price move that invalidates a recommendation, e.g. 0.005 = 0.5%
+SESSION_PRICE_TOLERANCE = float(os.getenv("SESSION_PRICE_TOLERANCE", 0.005))
+
+# the session of a conversation that has not named its NEAR account yet; never stored
+ANONYMOUS = ""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    account_id TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL,
+    state TEXT NOT NULL
+);
+"""
+
+UPSERT = """
+INSERT INTO sessions (account_id, updated_at, state) VALUES (?, ?, ?)
+ON CONFLICT (account_id) DO UPDATE SET updated_at = excluded.updated_at, state = excluded.state
+"""
+
+
+def prices_moved(old: Dict[str, float], new: Dict[str, float], tolerance: float = SESSION_PRICE_TOLERANCE) -> bool:
+    """Whether any symbol was added, dropped, or moved by more than `tolerance` of its old price."""
+    if old.keys() != new.keys():
+        return True
+    return any(abs(new[symbol] - price) > tolerance * abs(price) for symbol, price in old.items())
+
+
+class Session:
+    """
+    One user's agent state: goals, last fetched prices and balances, and the
+    swap recommendation made from them.
+
+    Prices and balances expire after their TTLs. The recommendation expires
+    after its own TTL, and is dropped as soon as the allowance goal, the
+    balances or (beyond SESSION_PRICE_TOLERANCE) the prices change. A
+    recommendation made before the session held any balances or prices, as
+    the goal watcher's are, survives their being set for the first time.
+    """
+
+    __slots__ = ("account_id", "growth_goal", "allowance_goal", "prices", "prices_at",
+                 "balances", "balances_at", "recommended_tokens", "recommended_at", "updated_at")
+
+    STATE = __slots__[1:]
+
+    def __init__(self, account_id: str):
+        self.account_id = account_id
+        self.growth_goal: Optional[str] = None
+        self.allowance_goal: Optional[str] = None
+        # lower-cased symbol -> USD price
+        self.prices: Optional[Dict[str, float]] = None
+        self.prices_at = 0.0
+        # token (NATIVE_NEAR or defuse asset id) -> balance in its smallest unit
+        self.balances: Optional[Dict[str, int]] = None
+        self.balances_at = 0.0
+        # symbol -> quantity to sell; None is also a valid (unreachable) recommendation
+        self.recommended_tokens: Optional[Dict[str, float]] = None
+        self.recommended_at = 0.0
+        self.updated_at = 0.0
+
+    def fresh_prices(self, ttl: float = SESSION_PRICES_TTL, symbols: Iterable[str] = ()) -> Optional[Dict[str, float]]:
+        """The session's prices, or None once they expire or if any of `symbols` is missing from them."""
+        if self.prices is None or time.time() - self.prices_at >= ttl:
+            return None
+        return self.prices if all(symbol in self.prices for symbol in symbols) else None
+
+    def fresh_balances(self, ttl: float = SESSION_BALANCES_TTL) -> Optional[Dict[str, int]]:
+        return self.balances if self.balances is not None and time.time() - self.balances_at < ttl else None
+
+    def has_recommendation(self, ttl: float = SESSION_RECOMMENDATION_TTL) -> bool:
+        return bool(self.recommended_at) and time.time() - self.recommended_at < ttl
+
+    def invalidate_recommendation(self):
+        self.recommended_tokens = None
+        self.recommended_at = 0.0
+
+    def set_goals(self, growth_goal: Optional[str] = None, allowance_goal: Optional[str] = None):
+        """Records the goals the conversation stated; None leaves a goal as it is."""
+        if growth_goal:
+            self.growth_goal = growth_goal
+        if allowance_goal and allowance_goal != self.allowance_goal:
+            self.allowance_goal = allowance_goal
+            self.invalidate_recommendation()
+        self.updated_at = time.time()
+
+    def set_prices(self, prices: Dict[str, float]):
+        if self.prices is not None and prices_moved(self.prices, prices):
+            self.invalidate_recommendation()
+        self.prices = dict(prices)
+        self.prices_at = self.updated_at = time.time()
+
+    def set_balances(self, balances: Dict[str, int]):
+        if self.balances is not None and balances != self.balances:
+            self.invalidate_recommendation()
+        self.balances = dict(balances)
+        self.balances_at = self.updated_at = time.time()
+
+    def set_recommendation(self, recommended_tokens: Optional[Dict[str, float]]):
+        self.recommended_tokens = recommended_tokens
+        self.recommended_at = self.updated_at = time.time()
+
+    def merge(self, other: "Session"):
+        """Takes over whatever `other` knows that this session does not, or knows more recently."""
+        self.set_goals(other.growth_goal, other.allowance_goal)
+        if other.prices is not None and other.prices_at > self.prices_at:
+            self.set_prices(other.prices)
+            self.prices_at = other.prices_at
+        if other.balances is not None and other.balances_at > self.balances_at:
+            self.set_balances(other.balances)
+            self.balances_at = other.balances_at
+
+    def to_json(self) -> str:
+        return json.dumps({name: getattr(self, name) for name in self.STATE})
+
+    @classmethod
+    def from_json(cls, account_id: str, state: str) -> "Session":
+        session = cls(account_id)
+        for name, value in json.loads(state).items():
+            if name in cls.STATE:
+                setattr(session, name, value)
+        return session
+
+
+class SessionStore:
+    """
+    Sessions of every user an agent process serves, keyed by NEAR account id.
+
+    Sessions live in a bounded LRU in memory and are written through to
+    SQLite at `path` on save, so a new agent instance, or a restarted
+    process, picks a user's state back up without fetching everything again.
+    A SessionStore created without a path keeps sessions in memory only.
+    """
+
+    def __init__(self, path: Optional[str], max_entries: int = SESSION_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def get(self, account_id: str) -> Session:
+        """Returns the account's session, loading it from SQLite or creating it on first use."""
+        if account_id == ANONYMOUS:
+            return Session(ANONYMOUS)
+        with self._lock:
+            session = self._sessions.get(account_id)
+            if session is not None:
+                self._sessions.move_to_end(account_id)
+                return session
+            session = self._load(account_id) or Session(account_id)
+            self._sessions[account_id] = session
+            while len(self._sessions) > self.max_entries:
+                self._sessions.popitem(last=False)
+            return session
+
+    def _load(self, account_id: str) -> Optional[Session]:
+        if not self.path:
+            return None
+        try:
+            row = self._connect().execute(
+                "SELECT state FROM sessions WHERE account_id = ?", (account_id,)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Error loading session {account_id} from {path}: {error}",
+                           account_id=account_id, path=self.path, error=str(e))
+            return None
+        return Session.from_json(account_id, row[0]) if row else None
+
+    def save(self, session: Session):
+        """Writes a session through to SQLite. Anonymous sessions are never written."""
+        if not self.path or session.account_id == ANONYMOUS:
+            return
+        state = session.to_json()
+        with self._lock:
+            try:
+                connection = self._connect()
+                with connection:
+                    connection.execute(UPSERT, (session.account_id, session.updated_at, state))
+            except sqlite3.Error as e:
+                logger.warning("Error saving session {account_id} to {path}: {error}",
+                               account_id=session.account_id, path=self.path, error=str(e))
+
+    def adopt(self, session: Session, account_id: str) -> Session:
+        """
+        Returns the stored session for `account_id`, updated with what an
+        anonymous session learned before the conversation named the account.
+        """
+        stored = self.get(account_id)
+        if session is not stored:
+            stored.merge(session)
+            self.save(stored)
+        return stored
+
+    def clear(self):
+        """Forgets the sessions held in memory; stored sessions are loaded again on next use."""
+        with self._lock:
+            self._sessions.clear()
+
+
+SESSIONS = SessionStore(os.getenv("SESSION_STORE_PATH", DEFAULT_SESSION_STORE_PATH) or None)
@@ -0,0 +1,106 @@
+import json
+from functools import lru_cache
+from typing import Iterable, List, Optional, TypedDict, Union
+
+import base58
+from nacl.exceptions import BadSignatureError
+from nacl.signing import SigningKey
+
+from src.quote_log import QUOTE_LOG
+
+ED25519_PREFIX = "ed25519:"
+
+
+class AcceptQuote(TypedDict):
+    nonce: str
+    recipient: str
+    message: str
+
+
+class Commitment(TypedDict):
+    standard: str
+    payload: Union[AcceptQuote, str]
+    signature: str
+    public_key: str
+
+
+def decode_key(key: str) -> bytes:
+    """'ed25519:<base58>' -> raw key bytes"""
+    return base58.b58decode(key[len(ED25519_PREFIX):] if key.startswith(ED25519_PREFIX) else key)
+
+
+def encode_key(key: bytes) -> str:
+    """raw key bytes -> 'ed25519:<base58>'"""
+    return ED25519_PREFIX + base58.b58encode(key).decode("utf-8")
+
+
+def canonical_bytes(payload: Union[dict, str]) -> bytes:
+    """The exact bytes that get signed and published for a payload, i.e. its json.dumps encoding."""
+    return (payload if isinstance(payload, str) else json.dumps(payload)).encode("utf-8")
+
+
+class IntentSigner:
+    """
+    Signs intent payloads as raw_ed25519 commitments with one account's
+    full-access key.
+
+    The key is decoded, and checked against the expected public key, once
+    when the signer is built; every signature afterwards reuses the prepared
+    ed25519 key and serializes its payload exactly once.
+    """
+
+    def __init__(self, account_id: str, private_key: str, public_key: Optional[str] = None):
+        """
+        Args:
+            account_id: NEAR account id that signs the intents
+            private_key: 'ed25519:<base58>' secret key (64 byte secret + public, or the 32 byte seed)
+            public_key: Expected 'ed25519:<base58>' public key, if known
+
+        Raises:
+            ValueError: If the key pair does not verify, or does not match public_key
+        """
+        self.account_id = account_id
+        self._signing_key = SigningKey(decode_key(private_key)[:32])
+        verify_key = self._signing_key.verify_key
+        self.public_key = encode_key(bytes(verify_key))
+        if public_key is not None and decode_key(public_key) != bytes(verify_key):
+            raise ValueError(f"FA_PRIV_KEY does not belong to public key {public_key}")
+        try:
+            verify_key.verify(self._signing_key.sign(b"self-check"))
+        except BadSignatureError:
+            raise ValueError("FA_PRIV_KEY does not produce valid ed25519 signatures")
+
+    def sign_bytes(self, message: bytes) -> str:
+        """Returns the 'ed25519:<base58>' signature of message."""
+        return encode_key(self._signing_key.sign(message).signature)
+
+    def sign(self, payload: Union[dict, str], record: bool = True) -> Commitment:
+        """
+        Signs one payload.
+
+        Args:
+            payload: Quote dict, or its already serialized JSON string
+            record: Whether to record the commitment in the quote log
+
+        Returns:
+            Commitment: raw_ed25519 commitment whose payload is the signed JSON string
+        """
+        message = canonical_bytes(payload)
+        commitment = Commitment(
+            standard="raw_ed25519",
+            payload=message.decode("utf-8"),
+            signature=self.sign_bytes(message),
+            public_key=self.public_key)
+        if record:
+            QUOTE_LOG.record_commitment(commitment)
+        return commitment
+
+    def sign_many(self, payloads: Iterable[Union[dict, str]], record: bool = True) -> List[Commitment]:
+        """Signs many payloads in one call, e.g. the swaps of every goal a watcher tick triggered."""
+        return [self.sign(payload, record) for payload in payloads]
+
+
+@lru_cache(maxsize=None)
+def get_signer(account_id: str, private_key: str, public_key: Optional[str] = None) -> IntentSigner:
+    """Returns the signer for an account's key, building it on first use."""
+    return IntentSigner(account_id, private_key, public_key)
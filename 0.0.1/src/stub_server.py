@@ -0,0 +1,282 @@
+"""
+Local stand-in for the solver relay, NEAR RPC and price APIs, for
+benchmarking and regression-testing the network paths in src/utils.py
+without touching mainnet.
+
+Run standalone with:
+    python -m src.stub_server --port 8545 --latency 0.05 --jitter 0.02
+
+then point the agent at it with SOLVER_RELAY_URL, FASTNEAR_RPC_URL,
+NEAR_RPC_URL, COINBASE_API_URL and COINGECKO_API_URL (see stub_env()).
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+import base58
+
+STUB_PRICES = {
+    "NEAR": 5.0,
+    "BTC": 100000.0,
+    "ETH": 3500.0,
+    "SOL": 200.0,
+    "USDC": 1.0,
+    "USDT": 1.0,
+}
+STUB_COINGECKO_IDS = {
+    "near": "NEAR",
+    "bitcoin": "BTC",
+    "ethereum": "ETH",
+    "solana": "SOL",
+    "usd-coin": "USDC",
+    "tether": "USDT",
+}
+STUB_ACCOUNT_BALANCE = "330429280000000000000000000"
+STUB_BLOCK_HASH = base58.b58encode(hashlib.sha256(b"stub-block").digest()).decode("utf-8")
+
+
+class StubServer:
+    """
+    Threaded HTTP server speaking the JSON-RPC shapes of the solver relay
+    (`quote`, `publish_intent`, `publish_intents`) and NEAR RPC (`query` view_account /
+    view_access_key / call_function, `status`, `block`, `broadcast_tx_*`,
+    `send_tx`), plus the Coinbase and CoinGecko price endpoints.
+
+    Every request waits `latency` seconds plus up to `jitter` seconds, and
+    fails with an HTTP 503 with probability `error_rate`.
+    """
+
+    def __init__(self,
+                 host: str = "127.0.0.1",
+                 port: int = 0,
+                 latency: float = 0.0,
+                 jitter: float = 0.0,
+                 error_rate: float = 0.0,
+                 quote_count: int = 3,
+                 seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.quote_count = quote_count
+        self.requests = Counter()
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def env(self) -> Dict[str, str]:
+        """Environment variables that point every utils.py endpoint at this server."""
+        return stub_env(self.url)
+
+    def _delay(self) -> float:
+        with self._random_lock:
+            return self.latency + self._random.uniform(0, self.jitter)
+
+    def _should_fail(self) -> bool:
+        with self._random_lock:
+            return self._random.random() < self.error_rate
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # headers and body go out in separate writes; without this, Nagle's
+            # algorithm adds a delayed-ACK stall to every keep-alive response
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                stub._respond(self, lambda: stub._handle_get(self.path))
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                stub._respond(self, lambda: stub._handle_rpc(body))
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def _respond(self, handler: BaseHTTPRequestHandler, build):
+        delay = self._delay()
+        if delay:
+            time.sleep(delay)
+        if self._should_fail():
+            self.requests["error"] += 1
+            status, payload = 503, {"error": "stub injected failure"}
+        else:
+            status, payload = build()
+        body = json.dumps(payload).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _handle_get(self, path: str):
+        parts = urlsplit(path)
+        if parts.path.startswith("/v2/prices/"):
+            self.requests["coinbase_price"] += 1
+            symbol = parts.path.split("/")[3].split("-")[0].upper()
+            if symbol not in STUB_PRICES:
+                return 404, {"errors": [{"id": "not_found"}]}
+            return 200, {"data": {"base": symbol, "currency": "USD", "amount": str(STUB_PRICES[symbol])}}
+        if parts.path == "/v2/exchange-rates":
+            self.requests["coinbase_rates"] += 1
+            return 200, {"data": {"currency": "USD",
+                                  "rates": {symbol: str(1 / price) for symbol, price in STUB_PRICES.items()}}}
+        if parts.path == "/api/v3/simple/price":
+            self.requests["coingecko_price"] += 1
+            ids = parse_qs(parts.query).get("ids", [""])[0].split(",")
+            return 200, {coin_id: {"usd": STUB_PRICES[STUB_COINGECKO_IDS[coin_id]]}
+                         for coin_id in ids if coin_id in STUB_COINGECKO_IDS}
+        return 404, {"error": f"unknown path {parts.path}"}
+
+    def _handle_rpc(self, body: dict):
+        method = body.get("method")
+        params = body.get("params")
+        self.requests[method] += 1
+        handler = getattr(self, f"_rpc_{method}", None)
+        if handler is None:
+            return 200, self._rpc_error(body, f"unknown method {method}")
+        return 200, {"jsonrpc": "2.0", "id": body.get("id"), "result": handler(params)}
+
+    @staticmethod
+    def _rpc_error(body: dict, message: str) -> dict:
+        return {"jsonrpc": "2.0", "id": body.get("id"),
+                "error": {"name": "HANDLER_ERROR", "cause": {"name": "UNKNOWN", "info": {}}, "message": message}}
+
+    def _rpc_quote(self, params):
+        request = params[0]
+        amount_in = int(request["exact_amount_in"])
+        expiration_time = (datetime.now(timezone.utc) + timedelta(milliseconds=request.get("min_deadline_ms", 60000))
+                           ).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+        quotes = []
+        for solver in range(self.quote_count):
+            amount_out = amount_in * (1000 - solver) // 1000
+            quote_hash = base58.b58encode(hashlib.sha256(
+                f"{request['defuse_asset_identifier_in']}:{amount_in}:{solver}:{time.time_ns()}".encode()
+            ).digest()).decode("utf-8")
+            quotes.append({
+                "quote_hash": quote_hash,
+                "defuse_asset_identifier_in": request["defuse_asset_identifier_in"],
+                "defuse_asset_identifier_out": request["defuse_asset_identifier_out"],
+                "amount_in": str(amount_in),
+                "amount_out": str(amount_out),
+                "expiration_time": expiration_time,
+            })
+        return quotes
+
+    def _rpc_publish_intent(self, params):
+        return {"status": "OK", "intent_hash": self._hash(params)}
+
+    def _rpc_publish_intents(self, params):
+        return {"status": "OK", "intent_hashes": [self._hash(signed_data) for signed_data in params[0]["signed_datas"]]}
+
+    def _rpc_query(self, params):
+        request_type = params.get("request_type")
+        if request_type == "view_account":
+            return {"amount": STUB_ACCOUNT_BALANCE, "locked": "0", "code_hash": "11111111111111111111111111111111",
+                    "storage_usage": 182, "storage_paid_at": 0, "block_height": 1, "block_hash": STUB_BLOCK_HASH}
+        if request_type == "view_access_key":
+            return {"nonce": 1, "permission": "FullAccess", "block_height": 1, "block_hash": STUB_BLOCK_HASH}
+        if request_type == "call_function":
+            return {"result": list(json.dumps(STUB_ACCOUNT_BALANCE).encode("utf-8")), "logs": [],
+                    "block_height": 1, "block_hash": STUB_BLOCK_HASH}
+        return {}
+
+    def _rpc_status(self, params):
+        return {"chain_id": "mainnet",
+                "sync_info": {"latest_block_hash": STUB_BLOCK_HASH, "latest_block_height": 1}}
+
+    def _rpc_block(self, params):
+        return {"header": {"hash": STUB_BLOCK_HASH, "height": 1}}
+
+    def _rpc_broadcast_tx_async(self, params):
+        return self._hash(params)
+
+    def _rpc_broadcast_tx_commit(self, params):
+        tx_hash = self._hash(params)
+        outcome = {"id": tx_hash,
+                   "outcome": {"logs": [], "metadata": {}, "receipt_ids": [], "status": {"SuccessValue": ""},
+                               "tokens_burnt": "0", "gas_burnt": 0}}
+        return {"status": {"SuccessValue": ""},
+                "transaction": {"hash": tx_hash, "public_key": "", "receiver_id": "", "signature": "",
+                                "signer_id": "", "nonce": 1, "actions": []},
+                "transaction_outcome": outcome,
+                "receipts_outcome": [outcome]}
+
+    def _rpc_send_tx(self, params):
+        return self._rpc_broadcast_tx_commit(params)
+
+    @staticmethod
+    def _hash(params) -> str:
+        return base58.b58encode(hashlib.sha256(json.dumps(params).encode("utf-8")).digest()).decode("utf-8")
+
+
+def stub_env(url: str) -> Dict[str, str]:
+    """Environment variables that point every utils.py endpoint at a stub server URL."""
+    return {
+        "SOLVER_RELAY_URL": url,
+        "FASTNEAR_RPC_URL": url,
+        "NEAR_RPC_URL": url,
+        "COINBASE_API_URL": url,
+        "COINGECKO_API_URL": url,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local solver relay / NEAR RPC stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8545)
+    parser.add_argument("--latency", type=float, default=0.0, help="base latency per request, seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency per request, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability of an HTTP 503")
+    parser.add_argument("--quote-count", type=int, default=3, help="solver quotes returned per quote call")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = StubServer(args.host, args.port, args.latency, args.jitter, args.error_rate, args.quote_count, args.seed)
+    print(f"stub server listening on {server.url}")
+    for name, value in server.env().items():
+        print(f"export {name}={value}")
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Spans, counters and histograms for the network paths and agent tools, plus
+opt-in structured asynchronous logging.
+
+Metrics are exported at exit to METRICS_EXPORT_PATH, in Prometheus text
+format (or OTLP JSON when the path ends in .json), or on demand with
+METRICS.to_prometheus() / METRICS.to_otlp(). METRICS_ENABLED=0 turns
+instrumentation off: instrument() then returns functions undecorated and
+span() a shared no-op context manager, so the hot paths pay nothing.
+
+Importing this module leaves loguru's sinks alone; the command-line entry
+points call configure_logging() themselves.
+"""
+import asyncio
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+METRICS_EXPORT_PATH = os.getenv("METRICS_EXPORT_PATH")
+METRIC_PREFIX = "ft_allowance_"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# one JSON object per line instead of human-readable lines
+LOG_JSON = os.getenv("LOG_JSON", "0").lower() in ("1", "true", "yes")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # per bucket, not cumulative; the last slot counts values above every bound
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """Thread-safe in-process registry of counters and histograms, keyed by name and labels."""
+
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+
+    def count(self, name: str, value: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = LATENCY_BUCKETS, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def span(self, name: str, **labels):
+        """
+        Times a block into the `<name>_seconds` histogram, and counts it in
+        `<name>_failures_total` if it raises.
+        """
+        if not self.enabled:
+            return _NO_SPAN
+        return self._span(name, labels)
+
+    @contextmanager
+    def _span(self, name: str, labels: dict) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self.count(f"{name}_failures_total", error=type(e).__name__, **labels)
+            raise
+        finally:
+            self.observe(f"{name}_seconds", time.perf_counter() - start, **labels)
+
+    def instrument(self, name: str, **labels):
+        """Decorator that wraps every call of a sync or async function in span(name, **labels)."""
+        def decorate(fn):
+            if not self.enabled:
+                return fn
+            if asyncio.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(name, **labels):
+                        return await fn(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name, **labels):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def _snapshot(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (histogram.buckets, list(histogram.counts), histogram.sum, histogram.count)
+                          for key, histogram in self._histograms.items()}
+        return counters, histograms
+
+    def to_prometheus(self) -> str:
+        """Renders every metric in the Prometheus text exposition format."""
+        counters, histograms = self._snapshot()
+        lines = []
+        typed = set()
+        for (name, labels), value in sorted(counters.items()):
+            metric = METRIC_PREFIX + name
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_format_labels(labels)} {value:g}")
+        for (name, labels), (buckets, counts, total, count) in sorted(histograms.items()):
+            metric = METRIC_PREFIX + name
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{metric}_bucket{_format_labels(labels + (('le', f'{bound:g}'),))} {cumulative}")
+            lines.append(f"{metric}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {total:g}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def to_otlp(self) -> dict:
+        """Renders every metric as an OTLP/JSON ExportMetricsServiceRequest."""
+        counters, histograms = self._snapshot()
+        now = str(time.time_ns())
+        metrics: Dict[str, dict] = {}
+        for (name, labels), value in sorted(counters.items()):
+            metric = metrics.setdefault(name, {
+                "name": METRIC_PREFIX + name,
+                "sum": {"aggregationTemporality": 2, "isMonotonic": True, "dataPoints": []}})
+            metric["sum"]["dataPoints"].append(
+                {"attributes": _otlp_attributes(labels), "timeUnixNano": now, "asDouble": value})
+        for (name, labels), (buckets, counts, total, count) in sorted(histograms.items()):
+            metric = metrics.setdefault(name, {
+                "name": METRIC_PREFIX + name,
+                "histogram": {"aggregationTemporality": 2, "dataPoints": []}})
+            metric["histogram"]["dataPoints"].append({
+                "attributes": _otlp_attributes(labels), "timeUnixNano": now,
+                "count": str(count), "sum": total,
+                "bucketCounts": [str(bucket_count) for bucket_count in counts],
+                "explicitBounds": list(buckets)})
+        return {"resourceMetrics": [{
+            "resource": {"attributes": _otlp_attributes((("service.name", "ft-allowance-agent"),))},
+            "scopeMetrics": [{"scope": {"name": "src.telemetry"}, "metrics": list(metrics.values())}]}]}
+
+    def export(self, path: Optional[str] = METRICS_EXPORT_PATH):
+        """Writes every metric to `path`: OTLP JSON for .json paths, Prometheus text otherwise."""
+        if not path or not self.enabled:
+            return
+        body = json.dumps(self.to_otlp()) if path.endswith(".json") else self.to_prometheus()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _otlp_attributes(labels: Labels) -> List[dict]:
+    return [{"key": key, "value": {"stringValue": str(value)}} for key, value in labels]
+
+
+_NO_SPAN = nullcontext()
+
+METRICS = Metrics()
+span = METRICS.span
+count = METRICS.count
+observe = METRICS.observe
+instrument = METRICS.instrument
+
+if METRICS_EXPORT_PATH:
+    atexit.register(METRICS.export)
+
+
+_log_handler_id: Optional[int] = None
+_log_lock = threading.Lock()
+
+
+def configure_logging(level: str = LOG_LEVEL, json_lines: bool = LOG_JSON, sink=sys.stderr):
+    """
+    Sends loguru output through a background queue (enqueue=True), so that
+    logging never blocks a network path on terminal or file I/O.
+
+    Replaces loguru's default stderr sink, or the sink of a previous call,
+    and leaves any sink a host process added in place.
+    """
+    global _log_handler_id
+    with _log_lock:
+        try:
+            # loguru's default sink is handler 0
+            logger.remove(0 if _log_handler_id is None else _log_handler_id)
+        except ValueError:
+            pass
+        _log_handler_id = logger.add(sink, level=level, serialize=json_lines, enqueue=True,
+                                     format="{time:HH:mm:ss.SSS} {level} {name}:{function} {message} {extra}")
@@ -0,0 +1,229 @@
+import asyncio
+import os
+import ssl
+import threading
+import time
+import weakref
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.health import EndpointHealth, ProviderHealth
+from src.telemetry import count, span
+
+# each endpoint can be pointed elsewhere, e.g. at src/stub_server.py for benchmarks
+SOLVER_RELAY_URL = os.getenv("SOLVER_RELAY_URL", "https://solver-relay-v2.chaindefuser.com/rpc")
+FASTNEAR_RPC_URL = os.getenv("FASTNEAR_RPC_URL", "https://rpc.mainnet.fastnear.com")
+NEAR_RPC_URL = os.getenv("NEAR_RPC_URL", "https://rpc.mainnet.near.org")
+COINBASE_API_URL = os.getenv("COINBASE_API_URL", "https://api.coinbase.com")
+COINGECKO_API_URL = os.getenv("COINGECKO_API_URL", "https://api.coingecko.com")
+
+DEFAULT_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 10))
+DEFAULT_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 10.0))
+DEFAULT_RETRIES = int(os.getenv("HTTP_RETRIES", 2))
+DEFAULT_BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", 0.3))
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def host_key(url: str) -> str:
+    """Returns the scheme://host[:port] that connections to `url` are pooled by."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class Transport:
+    """
+    Keep-alive HTTP sessions shared by every network helper, one per host.
+
+    Sync callers go through a pooled `requests.Session` per host, async callers
+    through an `httpx.AsyncClient` per host and event loop. Both retry
+    connection errors and 429/5xx responses with exponential backoff.
+
+    Every request also goes through its host's circuit breaker in `health`,
+    and unless the caller sets one, its timeout adapts to the host's recent
+    latency (see src/health.py).
+    """
+
+    def __init__(self,
+                 pool_size: int = DEFAULT_POOL_SIZE,
+                 timeout: float = DEFAULT_TIMEOUT,
+                 retries: int = DEFAULT_RETRIES,
+                 backoff_factor: float = DEFAULT_BACKOFF_FACTOR):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, requests.Session] = {}
+        self._ssl_context: Optional[ssl.SSLContext] = None
+        self.health = ProviderHealth(timeout)
+        # httpx clients cannot be shared across event loops, so they are kept per loop
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]]" = \
+            weakref.WeakKeyDictionary()
+
+    def session(self, url: str) -> requests.Session:
+        """Returns the pooled session for the host of `url`, creating it on first use."""
+        key = host_key(url)
+        session = self._sessions.get(key)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(key)
+                if session is None:
+                    session = self._new_session()
+                    self._sessions[key] = session
+        return session
+
+    def _new_session(self) -> requests.Session:
+        retry = Retry(total=self.retries,
+                      backoff_factor=self.backoff_factor,
+                      status_forcelist=RETRY_STATUS_CODES,
+                      allowed_methods=None,
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1,
+                              pool_maxsize=self.pool_size,
+                              max_retries=retry)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Sends a request on the host's pooled session.
+
+        Raises:
+            CircuitOpenError: If the host's circuit is open
+        """
+        host = host_key(url)
+        health = self.health.endpoint(host)
+        health.check()
+        kwargs.setdefault("timeout", health.timeout())
+        start = time.perf_counter()
+        with span("http_request", host=host, method=method):
+            try:
+                response = self.session(url).request(method, url, **kwargs)
+            except Exception:
+                health.record_failure()
+                raise
+        _record_status(health, response.status_code, time.perf_counter() - start)
+        return response
+
+    def async_client(self, url: str) -> httpx.AsyncClient:
+        """Returns the pooled async client for the host of `url` on the running event loop."""
+        clients = self._async_clients.setdefault(asyncio.get_running_loop(), {})
+        key = host_key(url)
+        client = clients.get(key)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.pool_size,
+                                    max_keepalive_connections=self.pool_size),
+                timeout=self.timeout,
+                verify=self.ssl_context())
+            clients[key] = client
+        return client
+
+    def ssl_context(self) -> ssl.SSLContext:
+        """
+        One SSL context shared by every async client. Loading the CA bundle
+        costs tens of milliseconds, which would otherwise be paid by every
+        client created for a short-lived event loop.
+        """
+        if self._ssl_context is None:
+            self._ssl_context = httpx.create_ssl_context()
+        return self._ssl_context
+
+    async def arequest(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Sends a request on the pooled async client, retrying transport errors
+        and retryable status codes with exponential backoff.
+        """
+        client = self.async_client(url)
+        host = host_key(url)
+        health = self.health.endpoint(host)
+        with span("http_request", host=host, method=method):
+            for attempt in range(self.retries + 1):
+                # fail fast, rather than retry, once the circuit opens
+                health.check()
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, url, **{"timeout": health.timeout(), **kwargs})
+                except httpx.TransportError:
+                    health.record_failure()
+                    if attempt == self.retries:
+                        raise
+                except asyncio.CancelledError:
+                    health.record_cancelled()
+                    raise
+                except Exception:
+                    # e.g. httpx.DecodingError: not worth a retry, but still a failure
+                    health.record_failure()
+                    raise
+                else:
+                    _record_status(health, response.status_code, time.perf_counter() - start)
+                    if response.status_code not in RETRY_STATUS_CODES or attempt == self.retries:
+                        return response
+                count("http_retries_total", host=host)
+                await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+
+    async def aget(self, url: str, **kwargs) -> httpx.Response:
+        return await self.arequest("GET", url, **kwargs)
+
+    async def apost(self, url: str, **kwargs) -> httpx.Response:
+        return await self.arequest("POST", url, **kwargs)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+    async def aclose(self):
+        """Closes the async clients that belong to the running event loop."""
+        clients = self._async_clients.pop(asyncio.get_running_loop(), {})
+        for client in clients.values():
+            await client.aclose()
+
+
+def _record_status(health: EndpointHealth, status_code: int, latency: float):
+    if status_code in RETRY_STATUS_CODES:
+        health.record_failure()
+    else:
+        health.record_success(latency)
+
+
+_transport: Optional[Transport] = None
+
+
+def get_transport() -> Transport:
+    """Returns the module-wide Transport, creating it with the default settings on first use."""
+    global _transport
+    if _transport is None:
+        _transport = Transport()
+    return _transport
+
+
+def configure_transport(**options) -> Transport:
+    """
+    Replaces the module-wide Transport, e.g. to change pool size, timeout or retries.
+
+    Args:
+        **options: Keyword arguments for Transport
+
+    Returns:
+        Transport: The new module-wide transport
+    """
+    global _transport
+    if _transport is not None:
+        _transport.close()
+    _transport = Transport(**options)
+    return _transport
@@ -1,105 +1,215 @@
 import asyncio
-from typing import Union
 import json
-import requests
-from typing import NewType
-from py_near.account import Account
 import os
-import base64
-import base58
-
-import near_api
-from cryptography.hazmat.primitives.asymmetric import ed25519
-
-import secrets
-from typing import List, Tuple, Dict, Union, TypedDict, Union
-from py_near.transactions import create_function_call_action
-from dotenv import load_dotenv
+import weakref
+from functools import lru_cache
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Iterator, List, NewType, Optional, Tuple, TypedDict, Union
 
-from datetime import datetime, timedelta, timezone
-
-BASE_URL = "https://solver-relay-v2.chaindefuser.com/rpc"
+import httpx
+import requests
+from loguru import logger
+
+from src.amounts import Amount
+from src.assets import ASSETS
+from src.intents import get_intent_template
+from src.price_cache import FRESH, MISSING, PRICE_CACHE, STALE
+from src.quote_engine import (build_quote_request, collect_quotes, fan_out_quotes,
+                              fan_out_stablecoin_quotes, iter_quotes, run_sync, stream_quotes)
+from src.quote_log import QUOTE_LOG
+from src.router import ROUTER, Route
+from src.signer import Commitment, IntentSigner, get_signer
+from src.telemetry import COUNT_BUCKETS, count, instrument, observe, span
+from src.transport import (COINBASE_API_URL, COINGECKO_API_URL,
+                           FASTNEAR_RPC_URL, NEAR_RPC_URL, SOLVER_RELAY_URL, get_transport, host_key)
+
+if TYPE_CHECKING:
+    import near_api.providers
+
+BASE_URL = SOLVER_RELAY_URL
 TGAS = 1_000_000_000_000
 DEFAULT_ATTACHED_GAS = 100 * TGAS
 ONE_NEAR = 1_000_000_000_000_000_000_000_000
 
 
-ASSET_MAP = {
-    'USDC': {
-        'token_id': '17208628f84f5d6ad33f0da3bbbeb27ffcb398eac501a31bd6ad2011e36133a1',
-        'omft': 'eth-0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48.omft.near',
-        'decimals': 6,
-    },
-    'USDT': {
-        'token_id': 'nep141:usdt.tether-token.near',
-        'decimals': 6,
-    },
-    'NEAR': {
-        'token_id': 'wrap.near',
-        'decimals': 24,
-    }}
-
-load_dotenv()
-AccountId = os.getenv("ACCOUNT_ID")
-PrivKey = os.getenv("FA_PRIV_KEY")
-PubKey = os.getenv("FA_PUB_KEY")
-
-if AccountId is None or PrivKey is None or PubKey is None:
-    raise EnvironmentError(
-        "ACCOUNT_ID and FA_PRIV_KEY must be set in environment variables")
-acc = Account(AccountId, PrivKey)
-
-
-# TODO refactor to make use of ASSET_MAP
+def get_asset_map() -> Dict[str, dict]:
+    """Symbol -> token metadata from the asset registry, as currently loaded."""
+    return {symbol: {'token_id': asset.defuse_asset_id, 'decimals': asset.decimals}
+            for symbol, asset in ASSETS.assets().items()}
+
+
+# AccountId, PrivKey, PubKey and acc are resolved on first use (see __getattr__),
+# so importing this module needs neither signing keys nor py_near / near_api.
+# ASSET_MAP and STABLECOIN_TOKEN_OUT_TYPES are rebuilt on every access, so they
+# follow ASSETS.reload_if_changed()
+CREDENTIAL_NAMES = {"AccountId": "ACCOUNT_ID", "PrivKey": "FA_PRIV_KEY", "PubKey": "FA_PUB_KEY"}
+
+
+@lru_cache(maxsize=None)
+def get_credentials() -> Tuple[str, str, str]:
+    """
+    Reads the account id and full access key pair from the environment (or .env).
+
+    Returns:
+        tuple: (ACCOUNT_ID, FA_PRIV_KEY, FA_PUB_KEY)
+
+    Raises:
+        EnvironmentError: If any of them is not set
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
+    credentials = tuple(os.getenv(variable) for variable in CREDENTIAL_NAMES.values())
+    if None in credentials:
+        raise EnvironmentError(
+            "ACCOUNT_ID, FA_PRIV_KEY and FA_PUB_KEY must be set in environment variables")
+    return credentials
+
+
+# py_near binds an Account's RPC session and signer queue to the event loop
+# that first uses them, so every loop gets its own Account
+_near_accounts: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, object]" = weakref.WeakKeyDictionary()
+
+
+def get_near_account():
+    """
+    Returns the py_near Account that signs and submits transactions on the
+    running event loop, created on first use there. Called outside an event
+    loop, it returns a new Account for the caller to use on one loop only.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return _new_near_account()
+    account = _near_accounts.get(loop)
+    if account is None:
+        account = _near_accounts[loop] = _new_near_account()
+    return account
+
+
+def _new_near_account():
+    from py_near.account import Account
+    account_id, priv_key, _ = get_credentials()
+    return Account(account_id, priv_key, rpc_addr=NEAR_RPC_URL)
+
+
+def __getattr__(name: str):
+    if name in CREDENTIAL_NAMES:
+        return get_credentials()[list(CREDENTIAL_NAMES).index(name)]
+    if name == "acc":
+        return get_near_account()
+    if name == "ASSET_MAP":
+        return get_asset_map()
+    if name == "STABLECOIN_TOKEN_OUT_TYPES":
+        return stablecoin_token_out_types()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def get_usdc_token_out_type(token_in):
     # usdc address may vary per token_in_id, e.g. for token_in_id:
     # "nep141:eth.omft.near", USDC tokenOut should be
     # "nep141:eth-0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48.omft.near"
-
-    usdc_out = "nep141:17208628f84f5d6ad33f0da3bbbeb27ffcb398eac501a31bd6ad2011e36133a1"
-    if token_in == "nep141:eth.omft.near":
-        return "nep141:eth-0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48.omft.near"
-    elif token_in == "nep141:sol.omft.near":
-        return "nep141:eth-0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48.omft.near"
-    elif token_in == "nep141:wrap.near":
-        return usdc_out
-    else:
-        return usdc_out
+    return ASSETS.token_out(token_in, "USDC")
 
 
 def get_usdt_token_out_type(token_in):
+    return ASSETS.token_out(token_in, "USDT")
 
-    usdt_out = "nep141:usdt.tether-token.near"
-    if token_in == "nep141:eth.omft.near":
-        return "nep141:eth-0xdac17f958d2ee523a2206206994597c13d831ec7.omft.near"
-    elif token_in == "nep141:sol.omft.near":
-        return "nep141:eth-0xdac17f958d2ee523a2206206994597c13d831ec7.omft.near"
-    elif token_in == "nep141:wrap.near":
-        return usdt_out
-    else:
-        return usdt_out
 
+def stablecoin_token_out_types() -> Dict[str, callable]:
+    """Stablecoin symbol -> token_out resolver, for every stablecoin the registry currently routes to."""
+    return {stablecoin: (lambda token_in, stablecoin=stablecoin: ASSETS.token_out(token_in, stablecoin))
+            for stablecoin in ASSETS.stablecoins()}
 
 TokenAddress = NewType('TokenAddress', str)
-TokenQuantity = NewType('TokenQuantity', float)
+# quantities are integers in the token's smallest unit, see src/amounts.py
+TokenQuantity = NewType('TokenQuantity', int)
 TokenMap = list[tuple[TokenAddress, TokenQuantity]]
 QuoteID = NewType('QuoteID', str)
 USDValue = NewType('USDValue', float)
+TokenSymbol = NewType('TokenSymbol', str)
+PriceMap = Dict[TokenSymbol, USDValue]
 BestQuote = Tuple[QuoteID, USDValue]
 Quote = Dict[str, Union[float, TokenAddress]]
 QuoteTuples = List[Tuple[List[Quote], BestQuote]]
 
 
-def get_usdc_quotes(token_to_quantities: TokenMap) -> list:
-    # map to get quotes for each token_out_id
-    return list(map(lambda token_in: get_quotes([token_in], [
-                token_to_quantities[token_in]], get_usdc_token_out_type(token_in)), token_to_quantities.keys()))
+def get_usdc_quotes(token_to_quantities: TokenMap) -> QuoteTuples:
+    # fan out one quote request per token_in concurrently
+    return run_sync(get_usdc_quotes_async(token_to_quantities))
+
+
+def get_usdt_quotes(token_to_quantities: TokenMap) -> QuoteTuples:
+    # fan out one quote request per token_in concurrently
+    return run_sync(get_usdt_quotes_async(token_to_quantities))
+
 
+async def get_usdc_quotes_async(token_to_quantities: TokenMap) -> QuoteTuples:
+    return await fan_out_quotes(BASE_URL, [
+        (token_in, quantity, get_usdc_token_out_type(token_in))
+        for token_in, quantity in token_to_quantities.items()])
 
-def get_usdt_quotes(token_to_quantities: TokenMap) -> list:
-    # map to get quotes for each token_out_id
-    return list(map(lambda token_in: get_quotes([token_in], [
-                token_to_quantities[token_in]], get_usdt_token_out_type(token_in)), token_to_quantities.keys()))
+
+async def get_usdt_quotes_async(token_to_quantities: TokenMap) -> QuoteTuples:
+    return await fan_out_quotes(BASE_URL, [
+        (token_in, quantity, get_usdt_token_out_type(token_in))
+        for token_in, quantity in token_to_quantities.items()])
+
+
+def get_usdc_route(token_in: str, quantity: int) -> Optional[Route]:
+    """Splits selling `quantity` of token_in for USDC across quote sizes and solvers. See QuoteRouter.route."""
+    return run_sync(get_usdc_route_async(token_in, quantity))
+
+
+async def get_usdc_route_async(token_in: str, quantity: int) -> Optional[Route]:
+    return await ROUTER.route(token_in, get_usdc_token_out_type(token_in), quantity)
+
+
+async def get_stablecoin_quotes_async(token_to_quantities: TokenMap) -> Dict[str, QuoteTuples]:
+    """
+    Requests USDC and USDT quotes for every token in a single concurrent fan-out.
+
+    Args:
+        token_to_quantities: Map of token_in to quantity
+
+    Returns:
+        dict: 'USDC' and 'USDT' to one (quotes, best_quote) tuple per token_in
+    """
+    return await fan_out_stablecoin_quotes(BASE_URL, token_to_quantities, stablecoin_token_out_types())
+
+
+def _stablecoin_quote_requests(token_to_quantities: TokenMap, stablecoins: List[str]) -> list:
+    return [(token_in, quantity, ASSETS.token_out(token_in, stablecoin))
+            for stablecoin in stablecoins
+            for token_in, quantity in token_to_quantities.items()]
+
+
+async def stream_stablecoin_quotes(token_to_quantities: TokenMap,
+                                   stablecoins: List[str] = ("USDC", "USDT"),
+                                   target_amount_out: Optional[int] = None,
+                                   timeout: Optional[float] = None) -> AsyncIterator[dict]:
+    """
+    Yields unexpired stablecoin quotes for every token as they arrive.
+
+    Args:
+        token_to_quantities: Map of token_in to quantity
+        stablecoins: Stablecoin symbols to quote against
+        target_amount_out: Stop at the first quote whose amount_out reaches this
+        timeout: Stop after this many seconds
+
+    Yields:
+        dict: Quotes in the best-quote shape, ready to be signed
+    """
+    async for quote in stream_quotes(BASE_URL, _stablecoin_quote_requests(token_to_quantities, stablecoins),
+                                     target_amount_out, timeout):
+        yield quote
+
+
+def iter_stablecoin_quotes(token_to_quantities: TokenMap,
+                           stablecoins: List[str] = ("USDC", "USDT"),
+                           target_amount_out: Optional[int] = None,
+                           timeout: Optional[float] = None) -> Iterator[dict]:
+    """Synchronous generator counterpart of stream_stablecoin_quotes."""
+    return iter_quotes(BASE_URL, _stablecoin_quote_requests(token_to_quantities, stablecoins),
+                       target_amount_out, timeout)
 
 
 def get_near_account_balance(account_id: str) -> float:
@@ -112,24 +222,38 @@ def get_near_account_balance(account_id: str) -> float:
     Returns:
         float: Account balance in yoctoNEAR
     """
-    print(f"fetching account balance for {account_id}")
-    response = requests.post(
-        "https://rpc.mainnet.fastnear.com",
+    logger.debug("Fetching account balance for {account_id}", account_id=account_id)
+    response = get_transport().post(
+        FASTNEAR_RPC_URL,
         headers={"Content-Type": "application/json"},
-        json={
-            "jsonrpc": "2.0",
-            "id": "fastnear",
-            "method": "query",
-            "params": {
-                "request_type": "view_account",
-                "finality": "final",
-                "account_id": account_id
-            }
-        }
+        json=_view_account_request(account_id)
+    )
+    return response.json()["result"]["amount"]
+
+
+async def get_near_account_balance_async(account_id: str) -> float:
+    """Async variant of get_near_account_balance on the shared transport."""
+    logger.debug("Fetching account balance for {account_id}", account_id=account_id)
+    response = await get_transport().apost(
+        FASTNEAR_RPC_URL,
+        headers={"Content-Type": "application/json"},
+        json=_view_account_request(account_id)
     )
-    print(response.json())
     return response.json()["result"]["amount"]
 
+
+def _view_account_request(account_id: str) -> dict:
+    return {
+        "jsonrpc": "2.0",
+        "id": "fastnear",
+        "method": "query",
+        "params": {
+            "request_type": "view_account",
+            "finality": "final",
+            "account_id": account_id
+        }
+    }
+
 def fetch_usd_price(url: str, parse_price: callable) -> Union[float, bool]:
     """
     Fetches USD price from API endpoint and parses response.
@@ -143,17 +267,32 @@ def fetch_usd_price(url: str, parse_price: callable) -> Union[float, bool]:
         bool: False if request fails
     """
     try:
-        response = requests.get(url)
+        response = get_transport().get(url)
         response.raise_for_status()
         data = response.json()
         return parse_price(data)
     except requests.RequestException as e:
-        print(f'Error fetching price from {url}: {e}')
+        logger.warning("Error fetching price from {url}: {error}", url=url, error=str(e))
+        count("price_request_failures_total")
+        return False
+
+
+async def fetch_usd_price_async(url: str, parse_price: callable) -> Union[float, bool]:
+    """Async variant of fetch_usd_price on the shared transport."""
+    try:
+        response = await get_transport().aget(url)
+        response.raise_for_status()
+        data = response.json()
+        return parse_price(data)
+    except httpx.HTTPError as e:
+        logger.warning("Error fetching price from {url}: {error}", url=url, error=str(e))
+        count("price_request_failures_total")
         return False
 
 def fetch_coinbase(token: str) -> Union[float, bool]:
     """
-    Fetches USD price for a token from Coinbase API.
+    Fetches USD price for a token from Coinbase API, served from PRICE_CACHE
+    while the cached price is fresh.
 
     Args:
         token: Token symbol (e.g. 'BTC', 'ETH')
@@ -162,15 +301,19 @@ def fetch_coinbase(token: str) -> Union[float, bool]:
         float: USD price if successful
         bool: False if request fails
     """
-    url = f"https://api.coinbase.com/v2/prices/{token}-USD/buy"
-    print(f'fetching prices from  {url}')
+    url = f"{COINBASE_API_URL}/v2/prices/{token}-USD/buy"
 
-    return fetch_usd_price(url, lambda o: float(o['data']['amount']))
+    def fetch():
+        logger.debug("Fetching prices from {url}", url=url)
+        return fetch_usd_price(url, lambda o: float(o['data']['amount']))
+
+    return PRICE_CACHE.get_or_fetch("coinbase", token, fetch)
 
 
 def fetch_coingecko(token: str) -> Union[float, bool]:
     """
-    Fetches USD price for a token from CoinGecko API.
+    Fetches USD price for a token from CoinGecko API, served from PRICE_CACHE
+    while the cached price is fresh.
 
     Args:
         token: Token ID (e.g. 'bitcoin', 'ethereum')
@@ -179,9 +322,144 @@ def fetch_coingecko(token: str) -> Union[float, bool]:
         float: USD price if successful
         bool: False if request fails
     """
-    url = f"https://api.coingecko.com/api/v3/simple/price?ids={token}&vs_currencies=usd"
-    print(f'calling to fetch from  {url}')
-    return fetch_usd_price(url, lambda o: float(o[token]['usd']))
+    url = f"{COINGECKO_API_URL}/api/v3/simple/price?ids={token}&vs_currencies=usd"
+
+    def fetch():
+        logger.debug("Fetching prices from {url}", url=url)
+        return fetch_usd_price(url, lambda o: float(o[token]['usd']))
+
+    return PRICE_CACHE.get_or_fetch("coingecko", token, fetch)
+
+
+COINGECKO_MAX_IDS_PER_REQUEST = 100
+PRICE_PROVIDERS = ("coinbase", "coingecko")
+
+
+def fetch_coinbase_prices(symbols: List[str]) -> PriceMap:
+    """
+    Fetches USD prices for many tokens from Coinbase in a single request.
+
+    Args:
+        symbols: Token symbols (e.g. 'btc', 'eth')
+
+    Returns:
+        dict: Symbol to USD price, for the symbols Coinbase quoted
+    """
+    url = f"{COINBASE_API_URL}/v2/exchange-rates?currency=USD"
+    logger.debug("Fetching prices from {url}", url=url)
+    # rates are units of each currency per 1 USD
+    rates = fetch_usd_price(url, lambda o: o['data']['rates'])
+    if isinstance(rates, bool):
+        return {}
+
+    prices = {}
+    for symbol in symbols:
+        rate = rates.get(symbol.upper())
+        if rate and float(rate) > 0:
+            prices[TokenSymbol(symbol)] = USDValue(1 / float(rate))
+    PRICE_CACHE.put_many("coinbase", prices)
+    return prices
+
+
+def fetch_coingecko_prices(symbols: List[str]) -> PriceMap:
+    """
+    Fetches USD prices for many tokens from CoinGecko, batching up to
+    COINGECKO_MAX_IDS_PER_REQUEST ids per request.
+
+    Args:
+        symbols: Token symbols (e.g. 'btc', 'eth')
+
+    Returns:
+        dict: Symbol to USD price, for the symbols CoinGecko quoted
+    """
+    ids_to_symbols = {_coingecko_id(symbol): symbol for symbol in symbols}
+    ids = list(ids_to_symbols)
+
+    prices = {}
+    for start in range(0, len(ids), COINGECKO_MAX_IDS_PER_REQUEST):
+        batch = ids[start:start + COINGECKO_MAX_IDS_PER_REQUEST]
+        url = f"{COINGECKO_API_URL}/api/v3/simple/price?ids={','.join(batch)}&vs_currencies=usd"
+        logger.debug("Fetching prices from {url}", url=url)
+        data = fetch_usd_price(url, lambda o: o)
+        if isinstance(data, bool):
+            continue
+        for coin_id in batch:
+            if 'usd' in data.get(coin_id, {}):
+                prices[TokenSymbol(ids_to_symbols[coin_id])] = USDValue(float(data[coin_id]['usd']))
+    PRICE_CACHE.put_many("coingecko", prices)
+    return prices
+
+
+def _coingecko_id(symbol: str) -> str:
+    # CoinGecko looks prices up by coin id rather than by ticker symbol
+    asset = ASSETS.asset(symbol)
+    return asset.coingecko_id if asset and asset.coingecko_id else symbol
+
+
+def fetch_prices(symbols: List[str]) -> PriceMap:
+    """
+    Fetches USD prices for a list of tokens with as few provider requests as
+    possible: cached prices are reused, the rest are requested from Coinbase
+    in one call, and only the symbols Coinbase could not price fall back to
+    one batched CoinGecko call.
+
+    Args:
+        symbols: Token symbols (e.g. 'near', 'btc')
+
+    Returns:
+        dict: Lower-cased symbol to USD price. Symbols that no provider could
+        price are left out.
+    """
+    prices = {}
+    stale = []
+    missing = []
+    for symbol in dict.fromkeys(symbol.lower() for symbol in symbols):
+        # a fresh price from any provider beats a stale one from an earlier provider
+        state, price = MISSING, None
+        for provider in PRICE_PROVIDERS:
+            provider_state, provider_price = PRICE_CACHE.lookup(provider, symbol)
+            if provider_state == FRESH:
+                state, price = provider_state, provider_price
+                break
+            if provider_state == STALE and state == MISSING:
+                state, price = provider_state, provider_price
+        if state == MISSING:
+            missing.append(symbol)
+            continue
+        prices[TokenSymbol(symbol)] = price
+        if state == STALE:
+            stale.append(symbol)
+
+    if stale:
+        PRICE_CACHE.refresh_in_background(("batch", tuple(stale)), lambda: _fetch_prices_uncached(stale))
+    if missing:
+        prices.update(_fetch_prices_uncached(missing))
+    return prices
+
+
+def _fetch_prices_uncached(symbols: List[str]) -> PriceMap:
+    # Coinbase first; CoinGecko is asked for every symbol as well if Coinbase
+    # is slower than its p95, and whichever answers first wins
+    health = get_transport().health
+    hedged = []
+
+    def hedge_with_coingecko():
+        hedged.append(True)
+        return fetch_coingecko_prices(symbols)
+
+    prices = {}
+    for provider_prices in health.hedge(lambda: fetch_coinbase_prices(symbols), hedge_with_coingecko,
+                                        health.endpoint(host_key(COINBASE_API_URL)).hedge_delay()):
+        for symbol, price in provider_prices.items():
+            prices.setdefault(symbol, price)
+        if len(prices) == len(symbols):
+            break
+
+    failed = [symbol for symbol in symbols if symbol not in prices]
+    if failed and not hedged:
+        count("price_provider_fallbacks_total", len(failed), provider="coingecko")
+        prices.update(fetch_coingecko_prices(failed))
+    return prices
 
 def get_quotes(
         token_in_ids: list[str],
@@ -191,71 +469,104 @@ def get_quotes(
     best_usd_value = {"usd_value": 0}
 
     for token_id, quantity in zip(token_in_ids, token_quantities):
-        print(
-            f"looping through token_in:{token_id}, {quantity} token out {asset_identifier_out}")
         try:
-            response = requests.post(
-                f"{BASE_URL}",
-                json={
-                    "method": "quote",
-                    "params": [{
-                        "defuse_asset_identifier_in": token_id,
-                        "defuse_asset_identifier_out": asset_identifier_out,
-                        "exact_amount_in": str(quantity),
-                        "min_deadline_ms": 60000
-                    }],
-                    "id": "dontcare",
-                    "jsonrpc": "2.0"
-                }
-            )
+            with span("quote_request"):
+                response = get_transport().post(
+                    BASE_URL,
+                    json=build_quote_request(token_id, quantity, asset_identifier_out)
+                )
             if response.status_code == 200:
                 data = response.json().get("result", {})
                 if isinstance(data, list):
-                    for quote in data:
-                        usd_value = int(quote.get("amount_out", 0))
-                        quotes.append({
-                            "usd_value": usd_value,  # Assuming amount_out is in USD,
-                            "token_in": quote.get("defuse_asset_identifier_in"),
-                            "token_out": quote.get("defuse_asset_identifier_out"),
-                            "amount_in": quote.get("amount_in"),
-                            "amount_out": quote.get("amount_out"),
-                            "expiration_time": quote.get("expiration_time")
-                        })
-                        if usd_value > best_usd_value.get("usd_value"):
-                            best_usd_value = {
-                                "quote_hash": quote.get("quote_hash"),
-                                "amount_in": quote.get("amount_in"),
-                                "token_in": quote.get("defuse_asset_identifier_in"),
-                                "token_out": quote.get("defuse_asset_identifier_out"),
-                                "amount_out": quote.get("amount_out"),
-                                "usd_value": usd_value,
-                                "expiration_time": quote.get("expiration_time")}
+                    QUOTE_LOG.record_quotes(data)
+                    observe("quote_count", len(data), COUNT_BUCKETS)
+                best_usd_value = collect_quotes(data, quotes, best_usd_value)
         except requests.RequestException as e:
-            print(f"Error fetching quote for token {token_id}: {e}")
+            logger.warning("Error fetching quote for token {token_in}: {error}", token_in=token_id, error=str(e))
 
+    QUOTE_LOG.record_best_quote(best_usd_value)
     return quotes, best_usd_value
 
 
-def get_recommended_token_allocations(target_usd_amount: float):
+# example holdings for the demo in main(); recommendations for a user always use their own balances
+DEFAULT_TOKEN_BALANCES = {
+    "BTC": 0.08,
+    "ETH": 0.5,
+    "SOL": 4.2,
+    "NEAR": 330.42928
+}
+
+
+def get_recommended_token_allocations(target_usd_amount: float,
+                                      token_balances: Dict[str, float],
+                                      prices: Optional[PriceMap] = None,
+                                      slippage: Optional[Dict[str, float]] = None,
+                                      hold_preferences: Optional[Dict[str, float]] = None) -> Optional[Dict[str, float]]:
+    """
+    Recommends the quantities of each token to swap for stablecoins to realize
+    a USD target, solved locally from balances, live prices and quotes.
+
+    Args:
+        target_usd_amount: USD to realize in stablecoins
+        token_balances: Upper-cased symbol to quantity held, in whole tokens
+        prices: Symbol to USD price, fetched when not given
+        slippage: Symbol to fraction lost when selling, quoted when not given
+        hold_preferences: Symbol to extra cost of selling it, preferring to hold BTC by default
+
+    Returns:
+        dict: Symbol to quantity to sell, or None if the target cannot be reached
+    """
+    if prices is None:
+        prices = fetch_prices([symbol.lower() for symbol in token_balances])
+    if slippage is None:
+        slippage = get_quote_slippage(token_balances, prices)
+    from src.allocations import solve_allocations
+    allocations = solve_allocations(target_usd_amount, token_balances, prices, slippage, hold_preferences)
+    logger.info("Recommended allocations {allocations}", allocations=allocations)
+    return allocations
+
+
+def get_quote_slippage(token_balances: Dict[str, float], prices: PriceMap) -> Dict[str, float]:
+    """
+    Quotes selling each whole balance for USDC in one concurrent fan-out and
+    returns each token's slippage at that size.
+
+    Args:
+        token_balances: Upper-cased symbol to quantity held, in whole tokens
+        prices: Symbol to USD price
+
+    Returns:
+        dict: Upper-cased symbol to fraction lost when selling. Tokens that
+        could not be quoted are left out.
+    """
+    from src.allocations import quote_slippage
+    prices = {symbol.upper(): price for symbol, price in prices.items()}
+    token_to_quantities = {}
+    symbols = {}
+    for symbol, quantity in token_balances.items():
+        asset = ASSETS.asset(symbol)
+        if asset is None or not quantity or not prices.get(symbol.upper()):
+            continue
+        try:
+            token_to_quantities[asset.defuse_asset_id] = Amount.parse(quantity, asset.decimals).units
+        except ValueError as e:
+            logger.warning("Skipping slippage for {symbol}: {error}", symbol=symbol, error=str(e))
+            continue
+        symbols[asset.defuse_asset_id] = symbol
+    if not token_to_quantities:
+        return {}
     try:
-        params = {
-            'targetUsdAmount':target_usd_amount *1000000,
-            'tokenBalances': json.dumps({
-                "BTC": 0.08,
-                "ETH": 0.5,
-                "SOL": 4.2,
-                "NEAR": 330.42928
-            })
-        }
+        results = get_usdc_quotes(token_to_quantities)
+    except (httpx.HTTPError, ValueError) as e:
+        logger.warning("Error fetching quotes for slippage: {error}", error=str(e))
+        return {}
+    return {symbols[token_in]: quote_slippage(best_quote, prices[symbols[token_in].upper()])
+            for token_in, (_, best_quote) in zip(token_to_quantities, results) if best_quote}
 
-        response = requests.get("https://ft-allowance-allocations.hello-d1f.workers.dev/", params=params)
-        print(response.json())
-        return response.json() if response.status_code == 200 else None
-    except requests.RequestException as e:
-        print(f"Error fetching allocations: {e}")
-        return None
 
+@instrument("deposit_near")
 async def deposit_near(deposit_amount: int = ONE_NEAR):
+    from py_near.transactions import create_function_call_action
     deposit_action = create_function_call_action(
         method_name="near_deposit",
         args=json.dumps(
@@ -274,25 +585,12 @@ async def deposit_near(deposit_amount: int = ONE_NEAR):
         deposit=1)
 
     noWait = False
-    tr = await acc.sign_and_submit_tx("wrap.near", [deposit_action, transfer_action], noWait)
-    print(tr.logs)
+    tr = await get_near_account().sign_and_submit_tx("wrap.near", [deposit_action, transfer_action], noWait)
+    logger.info("Deposited {amount} yoctoNEAR into intents.near", amount=deposit_amount, logs=tr.logs)
 
     return tr
 
 
-class AcceptQuote(TypedDict):
-    nonce: str
-    recipient: str
-    message: str
-
-
-class Commitment(TypedDict):
-    standard: str
-    payload: Union[AcceptQuote, str]
-    signature: str
-    public_key: str
-
-
 class PublishIntent(TypedDict):
     signed_data: Commitment
     quote_hashes: List[str] = []
@@ -311,54 +609,146 @@ class Quote(TypedDict):
     intents: List[Intent]
 
 
+@lru_cache(maxsize=None)
+def get_near_provider() -> "near_api.providers.JsonProvider":
+    """Returns the NEAR RPC provider shared by every get_account() call."""
+    import near_api.providers
+    return near_api.providers.JsonProvider(NEAR_RPC_URL)
+
+
 def get_account():
-    near_provider = near_api.providers.JsonProvider(
-        'https://rpc.mainnet.near.org')
-    key_pair = near_api.signer.KeyPair(PrivKey)
-    signer = near_api.signer.Signer(AccountId, key_pair)
-    return near_api.account.Account(near_provider, signer, AccountId)
+    import near_api.account
+    import near_api.signer
+    account_id, priv_key, _ = get_credentials()
+    near_provider = get_near_provider()
+    key_pair = near_api.signer.KeyPair(priv_key)
+    signer = near_api.signer.Signer(account_id, key_pair)
+    return near_api.account.Account(near_provider, signer, account_id)
+
+
+def get_intent_signer() -> IntentSigner:
+    """Returns the signer for ACCOUNT_ID's key, decoded once and reused for every intent."""
+    return get_signer(*get_credentials())
 
 
 def sign_quote(quote: dict) -> Commitment:
-    quote_str = json.dumps(quote)
-    account = get_account()
-    signature = 'ed25519:' + \
-        base58.b58encode(account.signer.sign(
-            quote_str.encode('utf-8'))).decode('utf-8')
-    public_key = 'ed25519:' + \
-        base58.b58encode(account.signer.public_key).decode('utf-8')
-
-    # Ensure the signature is valid, else raise an exception
-    try:
-        check_pub_key = ed25519.Ed25519PublicKey.from_public_bytes(
-            account.signer.public_key)
-        check_pub_key.verify(base58.b58decode(
-            signature[8:]), json.dumps(quote).encode('utf-8'))
-        print("Signature is valid.")
-    except ed25519.InvalidSignature:
-        print("Invalid signature.")
+    return get_intent_signer().sign(quote)
+
+
+def sign_quotes(quotes: List[dict]) -> List[Commitment]:
+    """Signs many quotes in one call with the shared signer."""
+    return get_intent_signer().sign_many(quotes)
+
+
+def build_swap_intent(best_quote: dict) -> str:
+    """
+    Builds the intent that accepts a quote, with the referral fee split off
+    amount_out, from its token pair's precompiled template.
+
+    Args:
+        best_quote: Quote in the best-quote shape (token_in, amount_in, token_out, amount_out)
+
+    Returns:
+        str: The intent's JSON, exactly the bytes that get signed
+    """
+    template = get_intent_template(get_credentials()[0], best_quote["token_in"], best_quote["token_out"])
+    return template.render_quote(best_quote)
+
 
-    return Commitment(
-        standard="raw_ed25519",
-        payload=quote_str,
-        signature=signature,
-        public_key=public_key)
+def sign_swap_intents(best_quotes: List[dict]) -> List[PublishIntent]:
+    """Builds and signs the swap intent for each quote, ready for publish_intents."""
+    commitments = sign_quotes([build_swap_intent(best_quote) for best_quote in best_quotes])
+    return [PublishIntent(signed_data=commitment, quote_hashes=[best_quote.get("quote_hash")])
+            for commitment, best_quote in zip(commitments, best_quotes)]
 
 
+@instrument("publish_intent")
 def publish_intent(signed_intent):
-    """Publishes the signed intent to the solver bus."""
+    """Publishes the signed intent to the solver bus. Returns None if the request fails."""
     try:
-        rpc_request = {
-            "id": "dontcare",
-            "jsonrpc": "2.0",
-            "method": "publish_intent",
-            "params": [signed_intent]
-        }
-        response = requests.post(
-            "https://solver-relay-v2.chaindefuser.com/rpc", json=rpc_request)
+        response = get_transport().post(
+            BASE_URL, json=_publish_intent_request(signed_intent))
+    except requests.RequestException as e:
+        logger.warning("Error publishing intent: {error}", error=str(e))
+        return None
+    result = response.json()
+    QUOTE_LOG.record_publish_result(signed_intent, result)
+    return result
+
+
+@instrument("publish_intent")
+async def publish_intent_async(signed_intent):
+    """Async variant of publish_intent on the shared transport."""
+    try:
+        response = await get_transport().apost(
+            BASE_URL, json=_publish_intent_request(signed_intent))
+    except httpx.HTTPError as e:
+        logger.warning("Error publishing intent: {error}", error=str(e))
+        return None
+    result = response.json()
+    QUOTE_LOG.record_publish_result(signed_intent, result)
+    return result
+
+
+def _publish_intent_request(signed_intent) -> dict:
+    return {
+        "id": "dontcare",
+        "jsonrpc": "2.0",
+        "method": "publish_intent",
+        "params": [signed_intent]
+    }
+
+
+class PublishIntents(TypedDict):
+    signed_datas: List[Commitment]
+    quote_hashes: List[str]
+
+
+def bundle_intents(signed_intents: List[PublishIntent]) -> PublishIntents:
+    """Combines signed intents into the single publish_intents parameter, keeping every quote hash."""
+    return PublishIntents(
+        signed_datas=[signed_intent["signed_data"] for signed_intent in signed_intents],
+        quote_hashes=[quote_hash for signed_intent in signed_intents
+                      for quote_hash in signed_intent.get("quote_hashes") or []])
+
+
+@instrument("publish_intents")
+def publish_intents(signed_intents: List[PublishIntent]):
+    """Publishes many signed intents to the solver bus in one call."""
+    bundle = bundle_intents(signed_intents)
+    try:
+        response = get_transport().post(
+            BASE_URL, json=_publish_intents_request(bundle))
     except requests.RequestException as e:
-        print(f"Error publishing intent {e}")
-    return response.json()
+        logger.warning("Error publishing intents: {error}", error=str(e))
+        return None
+    result = response.json()
+    QUOTE_LOG.record_publish_result(bundle, result)
+    return result
+
+
+@instrument("publish_intents")
+async def publish_intents_async(signed_intents: List[PublishIntent]):
+    """Async variant of publish_intents on the shared transport."""
+    bundle = bundle_intents(signed_intents)
+    try:
+        response = await get_transport().apost(
+            BASE_URL, json=_publish_intents_request(bundle))
+    except httpx.HTTPError as e:
+        logger.warning("Error publishing intents: {error}", error=str(e))
+        return None
+    result = response.json()
+    QUOTE_LOG.record_publish_result(bundle, result)
+    return result
+
+
+def _publish_intents_request(bundle: PublishIntents) -> dict:
+    return {
+        "id": "dontcare",
+        "jsonrpc": "2.0",
+        "method": "publish_intents",
+        "params": [bundle]
+    }
 
 # testing logic that will be encapsulated in swap_near_for_usdc
 
@@ -371,52 +761,20 @@ async def main():
     # token_quantities =  {"nep141:wrap.near": 5  * ONE_NEAR, "nep141:sol.omft.near": one_sol, "nep141:eth.omft.near":one_eth}
     # target_usd_amount = 500
 
-    # print("USDT Quotes:", get_usdt_quotes({"nep141:wrap.near": 5  * ONE_NEAR}))
-    # print("USDC Quotes:", get_usdc_quotes({"nep141:wrap.near": 5  * ONE_NEAR}))
-
     # Get the best quotes for swapping some NEAR to USDT
     near_to_swap = 1 * ONE_NEAR
-    best_quote = get_usdc_quotes({"nep141:wrap.near": near_to_swap})[0][1]
-    print("best quote", best_quote)
+    best_quote = (await get_usdc_quotes_async({"nep141:wrap.near": near_to_swap}))[0][1]
+    logger.info("Best quote {best_quote}", best_quote=best_quote)
 
     # Deposit the required Near to intents.near to be able to execute the swap
     #await deposit_near(near_to_swap)
 
-    await get_recommended_token_allocations(3000)
-
-    # Create a publish_wnear_intent.json payload for the publish_intent call
-    deadline = (datetime.now(timezone.utc) + timedelta(minutes=2)
-                ).strftime('%Y-%m-%dT%H:%M:%S.000Z')
-
-    # Generate a random nonce
-    nonce_base64 = base64.b64encode(secrets.randbits(
-        256).to_bytes(32, byteorder='big')).decode('utf-8')
-
-    referral_fee_amount = str(
-        int(best_quote.get("amount_out")) // 100)  # 1% of amount_out
-    amount_out_less_fee = str(
-        int(best_quote.get("amount_out")) - int(referral_fee_amount))
-
-    # This is how you swap with a 1% fee to benevio-labs.near
-    payload = Quote(signer_id=AccountId,
-                    nonce=nonce_base64,
-                    verifying_contract="intents.near",
-                    deadline=deadline,
-                    intents=[{"intent": "token_diff",
-                              "diff": {best_quote.get("token_in"): "-" + str(best_quote.get("amount_in")),
-                                       best_quote.get("token_out"): amount_out_less_fee},
-                              "referral": "benevio-labs.near"},
-                             {"intent": "transfer",
-                              "receiver_id": "benevio-labs.near",
-                              "tokens": {best_quote.get("token_out"): referral_fee_amount,
-                                         },
-                              "memo": "referral_fee"}])
-
-    signed_quote = sign_quote(payload)
-    signed_intent = PublishIntent(signed_data=signed_quote, quote_hashes=[
-                                  best_quote.get("quote_hash")])
-
-    #print(publish_intent(signed_intent))
+    get_recommended_token_allocations(3000, DEFAULT_TOKEN_BALANCES)
+
+    # This is how you swap with a 1% fee to benevio-labs.near (see src/intents.py);
+    # publish_intent(signed_intent) would execute it
+    signed_intent = sign_swap_intents([best_quote])[0]
+    logger.info("Signed swap intent {signed_intent}", signed_intent=signed_intent)
 
 
 #asyncio.run(main())
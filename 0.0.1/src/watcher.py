@@ -0,0 +1,307 @@
+"""
+Watches many portfolios' growth and allowance goals outside of chat turns.
+
+Run standalone with:
+    python -m src.watcher watches.json --interval 30
+
+where watches.json is a list of
+    {"portfolio_id": "...", "account_id": "alice.near", "growth_target_usd": 25000, "allowance_usd": 500}
+
+When a goal is reached, the agent's swap recommendation for the allowance is
+computed and stored in the user's session (src/sessions.py), where the
+user's next chat turn picks it up.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from collections import defaultdict, deque
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from loguru import logger
+
+from src.balances import BALANCES, NATIVE_NEAR, symbol_balances
+from src.assets import ASSETS
+from src.telemetry import configure_logging, count, observe, span
+
+DEFAULT_MAX_PORTFOLIOS = 10_000
+DEFAULT_LATENCY_SAMPLES = 1024
+DEFAULT_BALANCE_REFRESH_TICKS = 10
+WATCHER_COUNT_BUCKETS = (0, 1, 10, 100, 1000, 10000)
+
+# symbol -> USD price
+PriceSource = Callable[[List[str]], Awaitable[Dict[str, float]]]
+# account ids -> account id -> symbol -> quantity in whole tokens
+BalanceSource = Callable[[List[str]], Awaitable[Dict[str, Dict[str, Optional[float]]]]]
+
+
+class WatchedPortfolio:
+    """One user's holdings and goals, with its USD value kept up to date incrementally."""
+
+    __slots__ = ("portfolio_id", "account_id", "growth_target_usd", "allowance_usd",
+                 "holdings", "value_usd", "triggered")
+
+    def __init__(self, portfolio_id: str, account_id: str, growth_target_usd: float, allowance_usd: float):
+        self.portfolio_id = portfolio_id
+        self.account_id = account_id
+        self.growth_target_usd = growth_target_usd
+        self.allowance_usd = allowance_usd
+        # symbol -> quantity in whole tokens
+        self.holdings: Dict[str, float] = {}
+        self.value_usd = 0.0
+        self.triggered = False
+
+
+Trigger = Callable[[WatchedPortfolio], Awaitable[None]]
+
+
+async def fetch_prices_source(symbols: List[str]) -> Dict[str, float]:
+    # imported on first use, keeping the watcher cheap to import
+    from src.utils import fetch_prices
+    prices = await asyncio.to_thread(fetch_prices, [symbol.lower() for symbol in symbols])
+    return {symbol.upper(): price for symbol, price in prices.items()}
+
+
+async def fetch_balances_source(account_ids: List[str]) -> Dict[str, Dict[str, Optional[float]]]:
+    tokens = [NATIVE_NEAR] + [asset.defuse_asset_id for asset in ASSETS.assets().values()]
+    balances = await BALANCES.fetch(account_ids, tokens)
+    # balances that could not be fetched stay None, so the watcher keeps the last known holding
+    return {account_id: {symbol: float(amount) if amount is not None else None
+                         for symbol, amount in symbol_balances(account_balances).items()}
+            for account_id, account_balances in balances.items()}
+
+
+async def print_trigger(portfolio: WatchedPortfolio):
+    """Only logs that a goal was reached."""
+    logger.info("Growth goal reached for {account_id}: portfolio worth {value_usd:,.2f} USD >= {target_usd:,.2f} USD, "
+                "ready to swap {allowance_usd:,.2f} USD into stablecoins",
+                account_id=portfolio.account_id, value_usd=portfolio.value_usd,
+                target_usd=portfolio.growth_target_usd, allowance_usd=portfolio.allowance_usd)
+
+
+async def recommend_swaps_trigger(portfolio: WatchedPortfolio):
+    """
+    Runs the agent's swap recommendation for the portfolio's allowance, as
+    the recommend swaps command would, and stores it in the account's
+    session so that the user's next chat turn serves it without recomputing.
+    Nothing is signed or published without the user.
+    """
+    # imported on first use, keeping the watcher cheap to import
+    from src.sessions import SESSIONS
+    from src.utils import get_recommended_token_allocations
+
+    await print_trigger(portfolio)
+    recommendation = await asyncio.to_thread(get_recommended_token_allocations,
+                                             portfolio.allowance_usd, dict(portfolio.holdings))
+    session = SESSIONS.get(portfolio.account_id)
+    session.set_goals(f"{portfolio.growth_target_usd:g}", f"{portfolio.allowance_usd:g}")
+    session.set_recommendation(recommendation)
+    SESSIONS.save(session)
+    count("watcher_recommendations_total", reachable=str(recommendation is not None).lower())
+
+
+class GoalWatcher:
+    """
+    Tracks many portfolios against their growth targets and calls `on_trigger`
+    when a portfolio's USD value first reaches its target.
+
+    Each tick fetches prices for the union of held symbols in one batched call
+    and, every `balance_refresh_ticks` ticks, balances for every account in one
+    concurrent pass. Only portfolios holding a token whose price or quantity
+    changed are revalued, by applying the delta to their running total. A
+    triggered portfolio re-arms once its value falls back below the target.
+    """
+
+    def __init__(self,
+                 on_trigger: Trigger = recommend_swaps_trigger,
+                 price_source: PriceSource = fetch_prices_source,
+                 balance_source: Optional[BalanceSource] = fetch_balances_source,
+                 max_portfolios: int = DEFAULT_MAX_PORTFOLIOS,
+                 balance_refresh_ticks: int = DEFAULT_BALANCE_REFRESH_TICKS,
+                 latency_samples: int = DEFAULT_LATENCY_SAMPLES):
+        self.on_trigger = on_trigger
+        self.price_source = price_source
+        self.balance_source = balance_source
+        self.max_portfolios = max_portfolios
+        self.balance_refresh_ticks = balance_refresh_ticks
+        self.portfolios: Dict[str, WatchedPortfolio] = {}
+        self.prices: Dict[str, float] = {}
+        # symbol -> ids of the portfolios holding it
+        self._holders: Dict[str, Set[str]] = defaultdict(set)
+        self._ticks = 0
+        self._tick_latencies = deque(maxlen=latency_samples)
+        self._running = False
+
+    def watch(self,
+              portfolio_id: str,
+              account_id: str,
+              growth_target_usd: float,
+              allowance_usd: float,
+              holdings: Optional[Dict[str, float]] = None) -> WatchedPortfolio:
+        """
+        Starts watching a portfolio, or updates the goals of one already watched.
+
+        Raises:
+            OverflowError: If the watcher already holds max_portfolios portfolios
+        """
+        portfolio = self.portfolios.get(portfolio_id)
+        if portfolio is None:
+            if len(self.portfolios) >= self.max_portfolios:
+                raise OverflowError(f"Already watching the maximum of {self.max_portfolios} portfolios")
+            portfolio = self.portfolios[portfolio_id] = WatchedPortfolio(
+                portfolio_id, account_id, growth_target_usd, allowance_usd)
+        portfolio.growth_target_usd = growth_target_usd
+        portfolio.allowance_usd = allowance_usd
+        if holdings:
+            for symbol, quantity in holdings.items():
+                self._set_holding(portfolio, symbol.upper(), quantity)
+        return portfolio
+
+    def unwatch(self, portfolio_id: str):
+        portfolio = self.portfolios.pop(portfolio_id, None)
+        if portfolio is None:
+            return
+        for symbol in portfolio.holdings:
+            holders = self._holders[symbol]
+            holders.discard(portfolio_id)
+            if not holders:
+                del self._holders[symbol]
+
+    def _set_holding(self, portfolio: WatchedPortfolio, symbol: str, quantity: float) -> bool:
+        previous = portfolio.holdings.get(symbol, 0.0)
+        if quantity == previous:
+            return False
+        portfolio.value_usd += (quantity - previous) * self.prices.get(symbol, 0.0)
+        if quantity:
+            portfolio.holdings[symbol] = quantity
+            self._holders[symbol].add(portfolio.portfolio_id)
+        else:
+            portfolio.holdings.pop(symbol, None)
+            self._holders[symbol].discard(portfolio.portfolio_id)
+        return True
+
+    def apply_prices(self, prices: Dict[str, float]) -> Set[str]:
+        """
+        Revalues the portfolios holding a token whose price changed.
+
+        Returns:
+            set: Ids of the portfolios whose value changed
+        """
+        dirty = set()
+        for symbol, price in prices.items():
+            symbol = symbol.upper()
+            previous = self.prices.get(symbol, 0.0)
+            if price == previous:
+                continue
+            self.prices[symbol] = price
+            delta = price - previous
+            for portfolio_id in self._holders.get(symbol, ()):
+                portfolio = self.portfolios[portfolio_id]
+                portfolio.value_usd += portfolio.holdings[symbol] * delta
+                dirty.add(portfolio_id)
+        return dirty
+
+    def apply_balances(self, balances: Dict[str, Dict[str, Optional[float]]]) -> Set[str]:
+        """
+        Updates holdings from account balances, revaluing only changed tokens.
+        A None quantity could not be fetched and leaves the holding as it is.
+
+        Returns:
+            set: Ids of the portfolios whose value changed
+        """
+        by_account = defaultdict(list)
+        for portfolio in self.portfolios.values():
+            by_account[portfolio.account_id].append(portfolio)
+
+        dirty = set()
+        for account_id, symbols in balances.items():
+            for portfolio in by_account.get(account_id, ()):
+                for symbol in set(portfolio.holdings) | set(symbols):
+                    quantity = symbols.get(symbol, 0.0)
+                    if quantity is None:
+                        continue
+                    if self._set_holding(portfolio, symbol, quantity):
+                        dirty.add(portfolio.portfolio_id)
+        return dirty
+
+    async def _check(self, portfolio_ids: Iterable[str]):
+        for portfolio_id in portfolio_ids:
+            portfolio = self.portfolios.get(portfolio_id)
+            if portfolio is None:
+                continue
+            reached = portfolio.value_usd >= portfolio.growth_target_usd
+            if reached and not portfolio.triggered:
+                portfolio.triggered = True
+                count("watcher_triggers_total")
+                await self.on_trigger(portfolio)
+            elif not reached:
+                portfolio.triggered = False
+
+    async def tick(self):
+        """
+        Refreshes prices (and periodically balances) and fires triggers for
+        crossed goals. Each tick is timed into the watcher_tick_seconds
+        histogram, and counted in watcher_tick_failures_total if it raises.
+        """
+        start = time.perf_counter()
+        with span("watcher_tick"):
+            dirty = set()
+            if self.balance_source is not None and self._ticks % self.balance_refresh_ticks == 0:
+                account_ids = list({portfolio.account_id for portfolio in self.portfolios.values()})
+                if account_ids:
+                    dirty |= self.apply_balances(await self.balance_source(account_ids))
+            if self._holders:
+                dirty |= self.apply_prices(await self.price_source(list(self._holders)))
+            observe("watcher_revalued_portfolios", len(dirty), WATCHER_COUNT_BUCKETS)
+            await self._check(dirty)
+            self._ticks += 1
+        self._tick_latencies.append(time.perf_counter() - start)
+
+    async def run(self, interval: float = 30.0):
+        """Ticks every `interval` seconds until stop() is called."""
+        self._running = True
+        while self._running:
+            started = time.monotonic()
+            try:
+                await self.tick()
+            except Exception as e:
+                # already counted in watcher_tick_failures_total by the tick's span
+                logger.warning("Watcher tick failed: {error}", error=repr(e))
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    def stop(self):
+        self._running = False
+
+    def tick_latency(self) -> Dict[str, float]:
+        """Tick latency in seconds over the most recent ticks: last, p50, p99 and count."""
+        samples = sorted(self._tick_latencies)
+        if not samples:
+            return {"count": 0}
+        return {
+            "count": len(samples),
+            "last": self._tick_latencies[-1],
+            "p50": statistics.median(samples),
+            "p99": samples[min(len(samples) - 1, int(round(0.99 * (len(samples) - 1))))],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch portfolios for their growth goals")
+    parser.add_argument("watches", help="JSON file with a list of portfolios to watch")
+    parser.add_argument("--interval", type=float, default=30.0, help="seconds between ticks")
+    parser.add_argument("--log-only", action="store_true",
+                        help="only log reached goals instead of computing swap recommendations")
+    args = parser.parse_args()
+
+    configure_logging()
+    watcher = GoalWatcher(on_trigger=print_trigger if args.log_only else recommend_swaps_trigger)
+    with open(args.watches) as f:
+        for watch in json.load(f):
+            watcher.watch(watch.get("portfolio_id", watch["account_id"]), watch["account_id"],
+                          float(watch["growth_target_usd"]), float(watch.get("allowance_usd", 0)))
+    asyncio.run(watcher.run(args.interval))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import pytest
+
+from src.allocations import solve_allocations
+
+PRICES = {"near": 5.0, "eth": 2000.0, "btc": 60000.0, "sol": 100.0}
+
+
+def test_cheapest_tokens_are_sold_first():
+    balances = {"NEAR": 100.0, "ETH": 1.0, "SOL": 10.0}
+    slippage = {"NEAR": 0.03, "ETH": 0.01, "SOL": 0.02}
+    allocations = solve_allocations(1000.0, balances, PRICES, slippage, hold_preferences={})
+    assert list(allocations) == ["ETH"]
+    assert allocations["ETH"] == pytest.approx(1000.0 / (2000.0 * 0.99))
+
+    allocations = solve_allocations(2500.0, balances, PRICES, slippage, hold_preferences={})
+    # all of ETH, then SOL, the next cheapest
+    assert list(allocations) == ["ETH", "SOL"]
+    assert allocations["ETH"] == 1.0
+
+
+def test_only_the_last_token_is_sold_partially():
+    balances = {"NEAR": 100.0, "SOL": 10.0}
+    slippage = {"NEAR": 0.0, "SOL": 0.1}
+    allocations = solve_allocations(700.0, balances, PRICES, slippage, hold_preferences={})
+    assert allocations["NEAR"] == 100.0
+    # 200 USD still needed, at 90 USD received per SOL
+    assert allocations["SOL"] == pytest.approx(200.0 / 90.0)
+
+
+def test_hold_preference_defers_selling_btc():
+    balances = {"BTC": 1.0, "NEAR": 1000.0}
+    slippage = {"BTC": 0.0, "NEAR": 0.02}
+    # by slippage alone BTC is cheaper, but the default preference holds it
+    assert list(solve_allocations(1000.0, balances, PRICES, slippage)) == ["NEAR"]
+    assert list(solve_allocations(1000.0, balances, PRICES, slippage, hold_preferences={})) == ["BTC"]
+    # BTC is still sold once the cheaper tokens run out
+    allocations = solve_allocations(10000.0, balances, PRICES, slippage)
+    assert list(allocations) == ["NEAR", "BTC"]
+    assert allocations["NEAR"] == 1000.0
+
+
+def test_unreachable_target_is_none():
+    balances = {"NEAR": 10.0, "SOL": 1.0}
+    assert solve_allocations(1000.0, balances, PRICES) is None
+    # tokens without a price cannot be sold either
+    assert solve_allocations(10.0, {"XYZ": 1000.0}, PRICES) is None
+    assert solve_allocations(10.0, {}, PRICES) is None
+
+
+def test_zero_target_sells_nothing():
+    assert solve_allocations(0, {"NEAR": 10.0}, PRICES) == {}
+
+
+def test_ties_are_broken_by_symbol():
+    prices = {"aaa": 1.0, "bbb": 1.0, "ccc": 1.0}
+    balances = {"CCC": 10.0, "AAA": 10.0, "BBB": 10.0}
+    allocations = solve_allocations(15.0, balances, prices, hold_preferences={})
+    assert allocations == {"AAA": 10.0, "BBB": 5.0}
+    assert list(allocations) == ["AAA", "BBB"]
@@ -0,0 +1,80 @@
+from decimal import Decimal
+
+import pytest
+
+from src.amounts import Amount, format_units, parse_units
+
+U128_MAX = 2 ** 128 - 1
+
+
+@pytest.mark.parametrize("text, decimals, units", [
+    ("1.5", 24, 15 * 10 ** 23),
+    ("330.42928", 24, 330_429_280_000_000_000_000_000_000),
+    ("0.000001", 6, 1),
+    (".5", 1, 5),
+    ("2.", 6, 2_000_000),
+    ("-0.25", 2, -25),
+    ("+3", 0, 3),
+    ("1.500000000", 2, 150),
+    ("0", 18, 0),
+])
+def test_parse_units(text, decimals, units):
+    assert parse_units(text, decimals) == units
+
+
+def test_parse_units_rejects_digits_beyond_the_tokens_precision():
+    with pytest.raises(ValueError):
+        parse_units("0.0000001", 6)
+
+
+def test_parse_units_of_an_int_scales_it():
+    assert parse_units(2, 6) == 2_000_000
+
+
+@pytest.mark.parametrize("units, decimals, text", [
+    (0, 24, "0"),
+    (10 ** 24, 24, "1"),
+    (15 * 10 ** 23, 24, "1.5"),
+    (1, 24, "0.000000000000000000000001"),
+    (-5, 1, "-0.5"),
+    (U128_MAX, 24, "340282366920938.463463374607431768211455"),
+])
+def test_format_units(units, decimals, text):
+    assert format_units(units, decimals) == text
+    assert parse_units(text, decimals) == units
+
+
+@pytest.mark.parametrize("units, fee_bps, fee", [
+    (1_000_000, 100, 10_000),
+    # rounds the fee down
+    (199, 100, 1),
+    (99, 100, 0),
+    (0, 100, 0),
+    (12345, 0, 0),
+    (12345, 10_000, 12345),
+    (U128_MAX, 100, U128_MAX // 100),
+])
+def test_split_fee(units, fee_bps, fee):
+    fee_amount, rest = Amount(units, 6).split_fee(fee_bps)
+    assert fee_amount.units == fee
+    assert fee_amount + rest == Amount(units, 6)
+
+
+def test_usd_value_is_exact_for_u128_amounts():
+    assert Amount(U128_MAX, 24).usd_value("2") == Decimal("680564733841876.926926749214863536422910")
+
+
+def test_amounts_with_different_decimals_do_not_mix():
+    with pytest.raises(ValueError):
+        Amount(1, 6) + Amount(1, 24)
+    with pytest.raises(TypeError):
+        Amount(1, 6) + 1
+    assert Amount(1, 6) != Amount(1, 24)
+
+
+def test_parse_float_without_binary_rounding():
+    # int(330.42928 * 10 ** 24) is off by billions of yoctoNEAR
+    assert parse_units(330.42928, 24) == 330_429_280_000_000_000_000_000_000
+    assert parse_units(0.1, 18) == 10 ** 17
+    assert parse_units(1e-07, 8) == 10
+    assert Amount.parse(1.5, 6).units == 1_500_000
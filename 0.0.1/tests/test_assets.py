@@ -0,0 +1,55 @@
+import json
+import os
+
+import pytest
+
+from src.assets import AssetRegistry
+
+REGISTRY = {
+    "tokens": {"NEAR": {"defuse_asset_id": "nep141:wrap.near", "decimals": 24},
+               "USDC": {"defuse_asset_id": "nep141:usdc.near", "decimals": 6}},
+    "stablecoins": {"USDC": {"default": "USDC"}},
+}
+
+
+def write(path, text, mtime):
+    path.write_text(text)
+    os.utime(path, (mtime, mtime))
+
+
+def test_reload_picks_up_edits(tmp_path):
+    path = tmp_path / "assets.json"
+    write(path, json.dumps(REGISTRY), 1000)
+    registry = AssetRegistry(str(path))
+    assert registry.decimals("NEAR") == 24
+
+    edited = json.loads(json.dumps(REGISTRY))
+    edited["tokens"]["ETH"] = {"defuse_asset_id": "nep141:eth.omft.near", "decimals": 18}
+    write(path, json.dumps(edited), 2000)
+    assert registry.reload_if_changed()
+    assert registry.decimals("ETH") == 18
+    assert not registry.reload_if_changed()
+
+
+def test_malformed_reload_keeps_the_previous_index(tmp_path):
+    path = tmp_path / "assets.json"
+    write(path, json.dumps(REGISTRY), 1000)
+    registry = AssetRegistry(str(path))
+
+    # half-written file
+    write(path, json.dumps(REGISTRY)[:40], 2000)
+    registry.reload_if_changed()
+    assert registry.decimals("NEAR") == 24
+    # not parsed again until the file changes
+    assert not registry.reload_if_changed()
+
+    write(path, json.dumps({"tokens": {}}), 3000)
+    registry.reload_if_changed()
+    assert registry.token_out("nep141:wrap.near", "USDC") == "nep141:usdc.near"
+
+
+def test_first_load_of_a_malformed_registry_raises(tmp_path):
+    path = tmp_path / "assets.json"
+    write(path, "{", 1000)
+    with pytest.raises(ValueError):
+        AssetRegistry(str(path))
@@ -0,0 +1,44 @@
+import asyncio
+import json
+
+from src.amounts import Amount
+from src.balances import NATIVE_NEAR, BalanceService, symbol_balances
+
+WNEAR = "nep141:wrap.near"
+
+
+class FlakyBalanceService(BalanceService):
+    """Answers from a fixed block, failing every ft_balance_of call while `failing` is set."""
+
+    def __init__(self):
+        super().__init__(rpc_url="http://rpc.test")
+        self.failing = True
+        self.calls = 0
+
+    async def _rpc(self, method, params):
+        if method == "block":
+            return {"header": {"height": 100}}
+        self.calls += 1
+        if params["request_type"] == "view_account":
+            return {"amount": str(5 * 10 ** 24)}
+        if self.failing:
+            raise ValueError("rpc unavailable")
+        return {"result": list(json.dumps(str(2 * 10 ** 24)).encode("utf-8"))}
+
+
+def test_failed_balances_are_none_and_not_cached():
+    service = FlakyBalanceService()
+    balances = asyncio.run(service.fetch(["user.near"], [NATIVE_NEAR, WNEAR]))["user.near"]
+    assert balances == {NATIVE_NEAR: 5 * 10 ** 24, WNEAR: None}
+
+    # same block: the native balance comes from the cache, the failed one is asked for again
+    service.failing = False
+    service.calls = 0
+    balances = asyncio.run(service.fetch(["user.near"], [NATIVE_NEAR, WNEAR]))["user.near"]
+    assert balances == {NATIVE_NEAR: 5 * 10 ** 24, WNEAR: 2 * 10 ** 24}
+    assert service.calls == 1
+
+
+def test_symbol_balances_keep_unknown_balances_unknown():
+    assert symbol_balances({NATIVE_NEAR: 5 * 10 ** 24, WNEAR: 2 * 10 ** 24}) == {"NEAR": Amount(7 * 10 ** 24, 24)}
+    assert symbol_balances({NATIVE_NEAR: 5 * 10 ** 24, WNEAR: None}) == {"NEAR": None}
@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+from src.completion import buffer_chunks, stream_completion
+
+TEXT = "First paragraph.\n\nSecond paragraph."
+
+
+class Env:
+    def __init__(self):
+        self.replies = []
+        self.calls = []
+
+    def add_reply(self, message):
+        self.replies.append(message)
+
+
+class StreamingEnv(Env):
+    def completions(self, messages, model="", stream=False, **kwargs):
+        self.calls.append(stream)
+        return ({"choices": [{"delta": {"content": word + " "}}]} for word in TEXT.split(" "))
+
+
+class AggregatingEnv(Env):
+    """Like near.ai environments that collect the stream into one ModelResponse."""
+
+    def completions(self, messages, model="", stream=False, **kwargs):
+        self.calls.append(stream)
+        message = SimpleNamespace(role="assistant", content=TEXT)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")])
+
+
+class CompletionOnlyEnv(Env):
+    def completion(self, messages, **kwargs):
+        assert not kwargs
+        self.calls.append(False)
+        return TEXT
+
+
+def test_streamed_completion_is_replied_per_paragraph():
+    env = StreamingEnv()
+    assert stream_completion(env, []) == TEXT
+    assert env.calls == [True]
+    assert env.replies == ["First paragraph.", "Second paragraph."]
+
+
+def test_aggregated_completion_is_one_reply():
+    env = AggregatingEnv()
+    assert stream_completion(env, []) == TEXT
+    assert env.calls == [True]
+    assert env.replies == [TEXT]
+
+
+def test_completion_only_env_is_not_asked_to_stream():
+    env = CompletionOnlyEnv()
+    assert stream_completion(env, []) == TEXT
+    assert env.calls == [False]
+    assert env.replies == [TEXT]
+
+
+def test_long_paragraph_is_cut_at_a_space():
+    pieces = list(buffer_chunks(["word " * 30], flush_chars=22))
+    assert all(len(piece) <= 22 for piece in pieces)
+    assert " ".join(pieces).split() == ["word"] * 30
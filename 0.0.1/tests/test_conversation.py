@@ -0,0 +1,45 @@
+from src.conversation import ConversationState, ConversationStore
+
+COMMANDS = ["show growth goal"]
+
+
+def user(content):
+    return {"role": "user", "content": content}
+
+
+def test_update_parses_only_new_messages():
+    messages = [user("near: alice.near"), user("portfolio: 20000")]
+    state = ConversationState(COMMANDS).update(messages)
+    assert (state.near_account_id, state.growth_goal) == ("alice.near", "20000")
+
+    messages.append(user("allowance: 500"))
+    messages.append(user("show growth goal"))
+    state.update(messages)
+    assert state.allowance_goal == "500"
+    assert state.command == "show growth goal"
+
+
+def test_edited_conversation_starts_over():
+    state = ConversationState(COMMANDS).update([user("near: alice.near"), user("portfolio: 20000")])
+    state.update([user("near: bob.near"), user("hello"), user("again")])
+    assert state.near_account_id == "bob.near"
+    assert state.growth_goal is None
+
+
+def test_store_shares_state_per_thread():
+    store = ConversationStore(max_entries=2)
+    state = store.get("thread-1", COMMANDS).update([user("near: alice.near")])
+    assert store.get("thread-1", COMMANDS) is state
+    assert store.get("thread-2", COMMANDS) is not state
+    # without a thread id nothing is shared
+    assert store.get(None, COMMANDS) is not store.get(None, COMMANDS)
+
+
+def test_store_evicts_least_recently_used():
+    store = ConversationStore(max_entries=2)
+    first = store.get("thread-1")
+    store.get("thread-2")
+    store.get("thread-1")
+    store.get("thread-3")
+    assert store.get("thread-1") is first
+    assert len(store._states) == 2
@@ -0,0 +1,130 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from src.health import CLOSED, HALF_OPEN, OPEN, CircuitOpenError, EndpointHealth
+from src.quote_engine import QuoteEngine
+from src.transport import get_transport, host_key
+
+RESET_TIMEOUT = 0.05
+
+
+def open_circuit(endpoint: EndpointHealth):
+    for _ in range(endpoint.failure_threshold):
+        endpoint.record_failure()
+    assert endpoint.state == OPEN
+
+
+def test_one_probe_after_reset_timeout():
+    endpoint = EndpointHealth("http://relay.test", default_timeout=1.0, reset_timeout=RESET_TIMEOUT)
+    open_circuit(endpoint)
+    assert not endpoint.allow()
+    time.sleep(RESET_TIMEOUT)
+    assert endpoint.allow()
+    assert endpoint.state == HALF_OPEN
+    assert not endpoint.allow()
+    endpoint.record_success(0.01)
+    assert endpoint.state == CLOSED
+
+
+def test_failed_probe_opens_the_circuit_again():
+    endpoint = EndpointHealth("http://relay.test", default_timeout=1.0, reset_timeout=RESET_TIMEOUT)
+    open_circuit(endpoint)
+    time.sleep(RESET_TIMEOUT)
+    assert endpoint.allow()
+    endpoint.record_failure()
+    assert endpoint.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        endpoint.check()
+
+
+def test_cancelled_probe_lets_the_next_request_probe():
+    endpoint = EndpointHealth("http://relay.test", default_timeout=1.0, reset_timeout=RESET_TIMEOUT)
+    open_circuit(endpoint)
+    time.sleep(RESET_TIMEOUT)
+    assert endpoint.allow()
+    endpoint.record_cancelled()
+    assert endpoint.allow()
+    assert endpoint.state == HALF_OPEN
+
+
+def test_probe_that_never_reports_back_is_replaced():
+    endpoint = EndpointHealth("http://relay.test", default_timeout=1.0, reset_timeout=RESET_TIMEOUT)
+    open_circuit(endpoint)
+    time.sleep(RESET_TIMEOUT)
+    assert endpoint.allow()
+    assert not endpoint.allow()
+    time.sleep(RESET_TIMEOUT)
+    assert endpoint.allow()
+
+
+def test_cancelled_requests_do_not_count_as_failures():
+    endpoint = EndpointHealth("http://relay.test", default_timeout=1.0)
+    for _ in range(endpoint.failure_threshold * 2):
+        endpoint.record_cancelled()
+    assert endpoint.state == CLOSED
+
+
+class HangingRelayClient:
+    async def post(self, url, json):
+        await asyncio.sleep(60)
+
+
+def test_quote_probe_cancelled_mid_request_frees_the_circuit():
+    relay_url = "http://cancelled-probe.test/rpc"
+    endpoint = get_transport().health.endpoint(host_key(relay_url))
+    endpoint.reset_timeout = RESET_TIMEOUT
+    open_circuit(endpoint)
+    time.sleep(RESET_TIMEOUT)
+
+    async def cancel_probe():
+        engine = QuoteEngine(relay_url, client=HangingRelayClient())
+        probe = asyncio.ensure_future(engine.fetch_quote("near", 1, "usdc"))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+    asyncio.run(cancel_probe())
+    assert endpoint.state == OPEN
+    assert endpoint.allow()
+
+
+class NotJsonRelayClient:
+    async def post(self, url, json):
+        return httpx.Response(200, content=b"<html>bad gateway</html>")
+
+
+def test_unreadable_quote_response_counts_as_a_failure():
+    relay_url = "http://not-json.test/rpc"
+    endpoint = get_transport().health.endpoint(host_key(relay_url))
+
+    async def fetch():
+        engine = QuoteEngine(relay_url, client=NotJsonRelayClient())
+        return await engine.fetch_quote("near", 1, "usdc")
+
+    for _ in range(endpoint.failure_threshold):
+        assert asyncio.run(fetch())[0] == []
+    assert endpoint.state == OPEN
+
+
+def test_undecodable_response_counts_as_a_failure(monkeypatch):
+    url = "http://undecodable.test/"
+    transport = get_transport()
+    endpoint = transport.health.endpoint(host_key(url))
+
+    def handler(request):
+        raise httpx.DecodingError("bad gzip", request=request)
+
+    monkeypatch.setattr(transport, "async_client",
+                        lambda url: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    async def request():
+        with pytest.raises(httpx.DecodingError):
+            await transport.aget(url)
+
+    for _ in range(endpoint.failure_threshold):
+        asyncio.run(request())
+    assert endpoint.state == OPEN
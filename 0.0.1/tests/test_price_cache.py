@@ -0,0 +1,120 @@
+import threading
+import time
+
+from src.price_cache import FRESH, MISSING, STALE, PriceCache
+
+
+def test_lookup_classifies_entries_by_age():
+    cache = PriceCache(ttl=60, max_stale=900, path=None)
+    now = time.time()
+    cache.put("coinbase", "NEAR", 5.0, fetched_at=now - 10)
+    cache.put("coinbase", "btc", 95000.0, fetched_at=now - 120)
+    cache.put("coinbase", "eth", 3500.0, fetched_at=now - 1000)
+
+    assert cache.lookup("coinbase", "near") == (FRESH, 5.0)
+    assert cache.lookup("coinbase", "BTC") == (STALE, 95000.0)
+    assert cache.lookup("coinbase", "eth") == (MISSING, None)
+    assert cache.lookup("coingecko", "near") == (MISSING, None)
+
+
+def test_fresh_entry_is_served_without_fetching():
+    cache = PriceCache(ttl=60, path=None)
+    cache.put("coinbase", "near", 5.0)
+
+    def fetch():
+        raise AssertionError("a fresh price must not be fetched")
+
+    assert cache.get_or_fetch("coinbase", "near", fetch) == 5.0
+
+
+def test_stale_entry_is_served_while_revalidating():
+    cache = PriceCache(ttl=60, max_stale=900, path=None)
+    cache.put("coinbase", "near", 5.0, fetched_at=time.time() - 120)
+    release = threading.Event()
+    fetched = threading.Event()
+
+    def fetch():
+        release.wait(5)
+        fetched.set()
+        return 5.5
+
+    # the stale price comes back at once, the fetch runs in the background
+    assert cache.get_or_fetch("coinbase", "near", fetch) == 5.0
+    assert cache.get_or_fetch("coinbase", "near", fetch) == 5.0
+    release.set()
+    assert fetched.wait(5)
+    deadline = time.time() + 5
+    while cache.lookup("coinbase", "near") != (FRESH, 5.5) and time.time() < deadline:
+        time.sleep(0.01)
+    assert cache.lookup("coinbase", "near") == (FRESH, 5.5)
+
+
+def test_stale_entry_is_refreshed_once_at_a_time():
+    cache = PriceCache(ttl=60, max_stale=900, path=None)
+    cache.put("coinbase", "near", 5.0, fetched_at=time.time() - 120)
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return 5.5
+
+    for _ in range(5):
+        cache.get_or_fetch("coinbase", "near", fetch)
+    release.set()
+    cache._executor.shutdown(wait=True)
+    assert len(calls) == 1
+
+
+def test_missing_entry_is_fetched_and_failures_are_not_cached():
+    cache = PriceCache(ttl=60, path=None)
+    assert cache.get_or_fetch("coinbase", "near", lambda: False) is False
+    assert cache.get("coinbase", "near") is None
+    assert cache.get_or_fetch("coinbase", "near", lambda: 5.0) == 5.0
+    assert cache.lookup("coinbase", "near") == (FRESH, 5.0)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PriceCache(max_entries=2, path=None)
+    cache.put("coinbase", "near", 5.0)
+    cache.put("coinbase", "btc", 95000.0)
+    cache.get("coinbase", "near")
+    cache.put("coinbase", "eth", 3500.0)
+
+    assert cache.get("coinbase", "btc") is None
+    assert cache.get("coinbase", "near") is not None
+    assert cache.get("coinbase", "eth") is not None
+
+
+def test_entries_persist_across_instances(tmp_path):
+    path = str(tmp_path / "prices.json")
+    cache = PriceCache(path=path)
+    cache.put_many("coinbase", {"NEAR": 5.0, "btc": 95000.0})
+
+    reloaded = PriceCache(path=path)
+    assert reloaded.lookup("coinbase", "near") == (FRESH, 5.0)
+    assert reloaded.lookup("coinbase", "btc") == (FRESH, 95000.0)
+
+
+def test_unreadable_cache_file_is_ignored(tmp_path):
+    path = tmp_path / "prices.json"
+    path.write_text("{not json")
+    assert PriceCache(path=str(path)).get("coinbase", "near") is None
+
+
+def test_fetch_prices_prefers_a_fresh_price_from_any_provider(monkeypatch):
+    from src import utils
+
+    cache = PriceCache(ttl=60, max_stale=900, path=None)
+    now = time.time()
+    cache.put("coinbase", "near", 5.0, fetched_at=now - 120)
+    cache.put("coingecko", "near", 5.2, fetched_at=now - 10)
+    cache.put("coinbase", "btc", 95000.0, fetched_at=now - 120)
+    refreshed = []
+    monkeypatch.setattr(cache, "refresh_in_background", lambda key, fetch: refreshed.append(key))
+    monkeypatch.setattr(utils, "PRICE_CACHE", cache)
+
+    assert utils.fetch_prices(["NEAR", "btc"]) == {"near": 5.2, "btc": 95000.0}
+    # only the symbol without a fresh price anywhere is revalidated
+    assert refreshed == [("batch", ("btc",))]
@@ -0,0 +1,31 @@
+from src.quote_log import QuoteLog
+
+
+def test_records_are_queryable_after_flush(tmp_path):
+    log = QuoteLog(str(tmp_path / "quotes.sqlite3"))
+    log.record_quotes([{"quote_hash": "q1", "defuse_asset_identifier_in": "near",
+                        "defuse_asset_identifier_out": "usdc", "amount_in": "1", "amount_out": "900"},
+                       {"quote_hash": "q2", "defuse_asset_identifier_in": "near",
+                        "defuse_asset_identifier_out": "usdc", "amount_in": "1", "amount_out": "1000"}])
+    assert log.flush(timeout=5)
+    assert log.best_amount_out("near", "usdc")["quote_hash"] == "q2"
+    assert [row["kind"] for row in log.find("q1")] == ["quote"]
+
+
+def test_unopenable_database_disables_the_log(tmp_path):
+    # a directory cannot be opened as a database
+    log = QuoteLog(str(tmp_path))
+    log.record_commitment({"signature": "ed25519:x"})
+    assert log.flush(timeout=5) is False
+    assert not log.enabled
+    assert log.best_amount_out_by_pair() == {}
+    assert log.find("q1") == []
+
+
+def test_queue_is_bounded(tmp_path):
+    log = QuoteLog(str(tmp_path / "quotes.sqlite3"), max_queue=3)
+    # pretend the writer is running but never drains, so every row stays queued
+    log._writer = object()
+    for _ in range(10):
+        log.record_commitment({"signature": "ed25519:x"})
+    assert log._queue.qsize() == 3
@@ -0,0 +1,89 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+from src.quote_engine import QuoteEngine
+
+RELAY_URL = "http://relay.test/rpc"
+
+
+def relay_quote(token_in: str, amount_out: int, expires_in: float = 60.0) -> dict:
+    expiration_time = (datetime.now(timezone.utc) + timedelta(seconds=expires_in)).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    return {"quote_hash": f"{token_in}-{amount_out}", "defuse_asset_identifier_in": token_in,
+            "defuse_asset_identifier_out": "usdc", "amount_in": "1", "amount_out": str(amount_out),
+            "expiration_time": expiration_time}
+
+
+class FakeRelayClient:
+    """Answers each token_in after its own delay with its own quotes, and remembers cancellations."""
+
+    def __init__(self, responses):
+        # token_in -> (delay in seconds, raw quotes)
+        self.responses = responses
+        self.cancelled = []
+
+    async def post(self, url, json):
+        token_in = json["params"][0]["defuse_asset_identifier_in"]
+        delay, quotes = self.responses[token_in]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(token_in)
+            raise
+        return httpx.Response(200, json={"result": quotes})
+
+
+def stream(client, requests, **options):
+    async def collect():
+        engine = QuoteEngine(RELAY_URL, client=client)
+        return [quote async for quote in engine.stream_quotes(requests, **options)]
+    return asyncio.run(collect())
+
+
+def test_quotes_arrive_in_completion_order():
+    client = FakeRelayClient({"slow": (0.05, [relay_quote("slow", 10)]),
+                              "fast": (0.0, [relay_quote("fast", 20)])})
+    quotes = stream(client, [("slow", 1, "usdc"), ("fast", 1, "usdc")])
+    assert [quote["token_in"] for quote in quotes] == ["fast", "slow"]
+    assert quotes[0]["quote_hash"] == "fast-20"
+
+
+def test_expired_quotes_are_dropped():
+    client = FakeRelayClient({"near": (0.0, [relay_quote("near", 10, expires_in=-1),
+                                             relay_quote("near", 20)])})
+    quotes = stream(client, [("near", 1, "usdc")])
+    assert [quote["amount_out"] for quote in quotes] == ["20"]
+
+
+def test_stream_stops_at_target_and_cancels_pending_requests():
+    client = FakeRelayClient({"fast": (0.0, [relay_quote("fast", 100), relay_quote("fast", 200)]),
+                              "slow": (5.0, [relay_quote("slow", 300)])})
+    quotes = stream(client, [("fast", 1, "usdc"), ("slow", 1, "usdc")], target_amount_out=100)
+    assert [quote["amount_out"] for quote in quotes] == ["100"]
+    assert client.cancelled == ["slow"]
+
+
+def test_stream_stops_at_timeout_with_the_quotes_that_arrived():
+    client = FakeRelayClient({"fast": (0.0, [relay_quote("fast", 100)]),
+                              "slow": (5.0, [relay_quote("slow", 300)])})
+    quotes = stream(client, [("fast", 1, "usdc"), ("slow", 1, "usdc")], timeout=0.1)
+    assert [quote["token_in"] for quote in quotes] == ["fast"]
+    assert client.cancelled == ["slow"]
+
+
+def test_closing_the_stream_early_cancels_pending_requests():
+    client = FakeRelayClient({"fast": (0.0, [relay_quote("fast", 100)]),
+                              "slow": (5.0, [relay_quote("slow", 300)])})
+
+    async def first_quote():
+        engine = QuoteEngine(RELAY_URL, client=client)
+        quotes = engine.stream_quotes([("fast", 1, "usdc"), ("slow", 1, "usdc")])
+        quote = await quotes.__anext__()
+        await quotes.aclose()
+        # let the cancellation reach the request
+        await asyncio.sleep(0)
+        return quote
+
+    assert asyncio.run(first_quote())["token_in"] == "fast"
+    assert client.cancelled == ["slow"]
@@ -0,0 +1,43 @@
+from src.router import best_split
+
+
+def leg(size, amount_out, quote_hash):
+    return size, amount_out, {"quote_hash": quote_hash, "amount_out": str(amount_out)}
+
+
+def hashes(quotes):
+    return sorted(quote["quote_hash"] for quote in quotes)
+
+
+def test_single_quote_when_it_pays_most():
+    legs = [leg(4, 1000, "whole"), leg(2, 480, "half-a"), leg(2, 490, "half-b"), leg(1, 240, "quarter")]
+    assert hashes(best_split(legs, 4)) == ["whole"]
+
+
+def test_split_beats_the_single_best_quote():
+    # the whole amount moves the price; two solvers taking half each pay more
+    legs = [leg(4, 900, "whole"), leg(2, 480, "half-a"), leg(2, 470, "half-b")]
+    assert hashes(best_split(legs, 4)) == ["half-a", "half-b"]
+
+
+def test_split_mixes_sizes():
+    legs = [leg(4, 900, "whole"), leg(2, 460, "half"), leg(1, 245, "quarter-a"), leg(1, 240, "quarter-b")]
+    assert hashes(best_split(legs, 4)) == ["half", "quarter-a", "quarter-b"]
+
+
+def test_each_quote_is_used_at_most_once():
+    # one excellent quarter cannot be accepted four times
+    legs = [leg(4, 900, "whole"), leg(1, 300, "quarter")]
+    assert hashes(best_split(legs, 4)) == ["whole"]
+
+
+def test_ties_go_to_fewer_legs():
+    legs = [leg(1, 250, "quarter-a"), leg(1, 250, "quarter-b"), leg(2, 500, "half"), leg(4, 1000, "whole")]
+    assert hashes(best_split(legs, 4)) == ["whole"]
+    legs = [leg(1, 250, "quarter-a"), leg(1, 250, "quarter-b"), leg(2, 500, "half-a"), leg(2, 500, "half-b")]
+    assert hashes(best_split(legs, 4)) == ["half-a", "half-b"]
+
+
+def test_none_when_no_combination_covers_every_part():
+    assert best_split([leg(2, 500, "half"), leg(1, 250, "quarter")], 4) is None
+    assert best_split([], 4) is None
@@ -0,0 +1,30 @@
+from src.sessions import Session
+
+PRICES = {"near": 5.0, "btc": 60000.0}
+
+
+def test_fresh_prices_cover_the_requested_symbols():
+    session = Session("alice.near")
+    session.set_prices(PRICES)
+    assert session.fresh_prices(ttl=60) == PRICES
+    assert session.fresh_prices(ttl=60, symbols=["near", "btc"]) == PRICES
+    # a symbol the session never fetched has to be fetched
+    assert session.fresh_prices(ttl=60, symbols=["near", "sol"]) is None
+
+
+def test_fresh_prices_expire():
+    session = Session("alice.near")
+    assert session.fresh_prices(ttl=60) is None
+    session.set_prices(PRICES)
+    assert session.fresh_prices(ttl=0) is None
+
+
+def test_recommendation_made_before_balances_and_prices_survives_their_first_set():
+    # as stored by the goal watcher, which has neither in the agent's form
+    session = Session("alice.near")
+    session.set_recommendation({"NEAR": 10.0})
+    session.set_balances({"near": 10 ** 24})
+    session.set_prices(PRICES)
+    assert session.has_recommendation()
+    session.set_balances({"near": 2 * 10 ** 24})
+    assert not session.has_recommendation()
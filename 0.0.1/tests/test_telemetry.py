@@ -0,0 +1,22 @@
+import io
+
+from loguru import logger
+
+from src import telemetry
+
+
+def test_configure_logging_keeps_host_sinks():
+    host, ours = io.StringIO(), io.StringIO()
+    host_id = logger.add(host, format="{message}")
+    try:
+        telemetry.configure_logging(sink=ours)
+        # calling it again replaces only its own sink
+        telemetry.configure_logging(sink=ours)
+        logger.info("hello")
+        logger.complete()
+        assert host.getvalue() == "hello\n"
+        assert ours.getvalue().count("hello") == 1
+    finally:
+        logger.remove(host_id)
+        logger.remove(telemetry._log_handler_id)
+        telemetry._log_handler_id = None
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from src.telemetry import METRICS
+from src.watcher import GoalWatcher
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def make_watcher(prices, triggered):
+    async def price_source(symbols):
+        return prices
+
+    async def on_trigger(portfolio):
+        triggered.append(portfolio.portfolio_id)
+
+    return GoalWatcher(on_trigger=on_trigger, price_source=price_source, balance_source=None)
+
+
+def test_trigger_fires_once_per_crossing_and_rearms():
+    prices = {"NEAR": 5.0}
+    triggered = []
+    watcher = make_watcher(prices, triggered)
+    watcher.watch("p1", "alice.near", 1000.0, 100.0, {"NEAR": 150.0})
+
+    run(watcher.tick())
+    assert triggered == []
+    prices["NEAR"] = 7.0
+    run(watcher.tick())
+    run(watcher.tick())
+    assert triggered == ["p1"]
+    prices["NEAR"] = 5.0
+    run(watcher.tick())
+    prices["NEAR"] = 7.0
+    run(watcher.tick())
+    assert triggered == ["p1", "p1"]
+
+
+def test_ticks_and_failures_are_exported_as_metrics():
+    METRICS.clear()
+    watcher = make_watcher({"NEAR": 5.0}, [])
+    watcher.watch("p1", "alice.near", 1000.0, 100.0, {"NEAR": 150.0})
+    run(watcher.tick())
+
+    async def failing_source(symbols):
+        raise ValueError("price provider down")
+
+    watcher.price_source = failing_source
+    with pytest.raises(ValueError):
+        run(watcher.tick())
+
+    exported = METRICS.to_prometheus()
+    assert "ft_allowance_watcher_tick_seconds_count 2" in exported
+    assert 'ft_allowance_watcher_tick_failures_total{error="ValueError"} 1' in exported